@@ -0,0 +1,629 @@
+from __future__ import annotations
+import asyncio
+import contextvars
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import closing
+
+import codec
+from ai_stream import TaskStreamParser, iter_completion_deltas
+
+
+class ProviderError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures. While open the
+    provider is skipped; after `reset_timeout` seconds a single trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, *, clock=time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._clock() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._clock() - self._opened_at >= self.reset_timeout and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """Give back a trial call that was allowed but never made (or was cancelled)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+
+
+class LatencyWindow:
+    """Recent successful call latencies, used to pick the hedging delay."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> float | None:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, max(0, int(round(pct * (len(ordered) - 1)))))
+        return ordered[idx]
+
+
+class CallTicket:
+    """
+    Settles one call exactly once: a call the chain gave up on at its deadline is
+    counted as a failure then, and its late finish no longer counts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._settled = False
+
+    def settle(self) -> bool:
+        """True for the first caller only."""
+        with self._lock:
+            if self._settled:
+                return False
+            self._settled = True
+            return True
+
+
+class Provider:
+    """Base class: subclasses implement generate() and optionally stream()."""
+
+    name = "provider"
+    model = ""
+    inline = False  # inline providers are cheap and run on the caller's thread
+
+    def __init__(self, *, deadline: float = 30.0, breaker: CircuitBreaker | None = None):
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyWindow()
+        self.calls = 0
+        self.failures = 0
+
+    def generate(self, prompt: str, **context) -> list[dict]:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, **context) -> Iterator[dict]:
+        yield from self.generate(prompt, **context)
+
+    async def agenerate(self, prompt: str, *, client=None, **context) -> list[dict]:
+        """
+        generate() for asyncio callers; `client` is an httpx.AsyncClient. Providers
+        without a native version run generate() on a thread (inline ones run in place).
+        """
+        if self.inline:
+            return self.generate(prompt, **context)
+        return await asyncio.to_thread(contextvars.copy_context().run, self.generate, prompt, **context)
+
+    def call(self, prompt: str, *, ticket: CallTicket | None = None, **context) -> list[dict]:
+        """generate() with latency, deadline and circuit-breaker bookkeeping."""
+        self.calls += 1
+        started = time.monotonic()
+        try:
+            tasks = self.generate(prompt, **context)
+            if not tasks:
+                raise ProviderError(f"{self.name} returned no tasks.")
+        except Exception:
+            if ticket is None or ticket.settle():
+                self._failed()
+            raise
+        if ticket is None or ticket.settle():
+            self._finished(time.monotonic() - started)
+        return tasks
+
+    async def acall(self, prompt: str, *, client=None, **context) -> list[dict]:
+        """call() for the async chain, which enforces the deadline by cancelling."""
+        self.calls += 1
+        started = time.monotonic()
+        try:
+            tasks = await self.agenerate(prompt, client=client, **context)
+            if not tasks:
+                raise ProviderError(f"{self.name} returned no tasks.")
+        except asyncio.CancelledError:
+            # Another provider won, or the chain already counted the overrun.
+            self.breaker.release()
+            raise
+        except Exception:
+            self._failed()
+            raise
+        self._finished(time.monotonic() - started)
+        return tasks
+
+    def call_stream(self, prompt: str, **context) -> Iterator[dict]:
+        self.calls += 1
+        started = time.monotonic()
+        sent = 0
+        try:
+            for task in self.stream(prompt, **context):
+                if time.monotonic() - started > self.deadline:
+                    raise ProviderError(f"{self.name} exceeded its {self.deadline:g}s deadline.")
+                sent += 1
+                yield task
+            if not sent:
+                raise ProviderError(f"{self.name} returned no tasks.")
+        except GeneratorExit:
+            # The client went away. Tasks that got out count as a success; otherwise
+            # hand back the half-open trial so the circuit isn't stuck waiting on it.
+            if sent:
+                self.breaker.record_success()
+            else:
+                self.breaker.release()
+            raise
+        except Exception:
+            self._failed()
+            raise
+        self._finished(time.monotonic() - started)
+
+    def _failed(self) -> None:
+        self.failures += 1
+        self.breaker.record_failure()
+
+    def _finished(self, elapsed: float) -> None:
+        if elapsed > self.deadline:
+            # The caller already gave up on us; count it against the circuit.
+            self._failed()
+            return
+        self.breaker.record_success()
+        self.latency.add(elapsed)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "deadline_seconds": self.deadline,
+            "calls": self.calls,
+            "failures": self.failures,
+            "p50_seconds": self.latency.percentile(0.5),
+            "p95_seconds": self.latency.percentile(0.95),
+            "p99_seconds": self.latency.percentile(0.99),
+        }
+
+
+class OpenAICompatibleProvider(Provider):
+    """Any /chat/completions endpoint speaking the OpenAI wire format (Groq, vLLM, llama.cpp, Ollama)."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        url: str,
+        model: str,
+        system_instruction: str,
+        sanitize: Callable[[object], list[dict]],
+        api_key: str | None = None,
+        temperature: float = 0.4,
+        max_tokens: int = 800,
+        http_hooks: dict | None = None,
+        inject_headers: Callable[[dict], dict] | None = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.name = name
+        self.url = url
+        self.model = model
+        self.api_key = api_key
+        self.system_instruction = system_instruction
+        self.sanitize = sanitize
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.http_hooks = http_hooks  # requests event hooks, e.g. {"response": [record_latency]}
+        self.inject_headers = inject_headers  # adds per-call headers, e.g. a trace's traceparent
+
+    def _body(self, prompt: str, *, stream: bool = False) -> dict:
+        body = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self.system_instruction},
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+        }
+        if stream:
+            body["stream"] = True
+        return body
+
+    def _headers(self) -> dict:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        if self.inject_headers is not None:
+            self.inject_headers(headers)
+        return headers
+
+    def generate(self, prompt: str, **context) -> list[dict]:
+        import requests
+
+        response = requests.post(
+            self.url,
+            headers=self._headers(),
+            data=codec.dumps_bytes(self._body(prompt)),
+            timeout=self.deadline,
+            hooks=self.http_hooks,
+        )
+        return self._tasks_from_response(response.status_code, response.text)
+
+    async def agenerate(self, prompt: str, *, client=None, **context) -> list[dict]:
+        if client is None:
+            return await super().agenerate(prompt, **context)
+        response = await client.post(
+            self.url, headers=self._headers(), content=codec.dumps_bytes(self._body(prompt)), timeout=self.deadline,
+        )
+        return self._tasks_from_response(response.status_code, response.text)
+
+    def _tasks_from_response(self, status_code: int, body: str) -> list[dict]:
+        if status_code != 200:
+            try:
+                detail = codec.loads(body)
+            except ValueError:
+                detail = body
+            raise ProviderError(f"{self.name} HTTP {status_code}: {detail}")
+
+        payload = codec.loads(body)
+        choices = payload.get("choices") or []
+        if not choices:
+            raise ProviderError(f"{self.name} response contained no choices.")
+        content = choices[0].get("message", {}).get("content", "")
+        if not isinstance(content, str) or not content.strip():
+            raise ProviderError(f"{self.name} response did not contain message content.")
+
+        text = _strip_code_fence(content)
+        try:
+            parsed = codec.loads(text)
+        except ValueError as exc:
+            raise ProviderError(f"{self.name} returned invalid JSON: {exc}") from exc
+
+        tasks = self.sanitize(parsed)
+        if not tasks:
+            raise ProviderError(f"{self.name} response did not contain any tasks.")
+        return tasks
+
+    def stream(self, prompt: str, **context) -> Iterator[dict]:
+        import requests
+
+        end = time.monotonic() + self.deadline
+        with requests.post(
+            self.url,
+            headers=self._headers(),
+            data=codec.dumps_bytes(self._body(prompt, stream=True)),
+            timeout=(min(5.0, self.deadline), self.deadline),
+            stream=True,
+            hooks=self.http_hooks,
+        ) as response:
+            if response.status_code != 200:
+                raise ProviderError(f"{self.name} HTTP {response.status_code}: {response.text[:200]}")
+            parser = TaskStreamParser()
+            for delta in iter_completion_deltas(self._lines_until(response, end)):
+                for raw in parser.feed(delta):
+                    yield from self.sanitize([raw])
+                if parser.done:
+                    break
+
+    def _lines_until(self, response, end: float) -> Iterator[str]:
+        """
+        response.iter_lines(), but give up at `end`. The socket's read timeout is
+        cut to the time left before every line, so a provider that stops sending
+        mid-stream is dropped at the deadline instead of a full read timeout later.
+        """
+        import requests
+
+        sock = _response_socket(response)
+        lines = response.iter_lines(decode_unicode=True)
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise ProviderError(f"{self.name} exceeded its {self.deadline:g}s deadline.")
+            if sock is not None:
+                try:
+                    sock.settimeout(remaining)
+                except OSError:
+                    sock = None  # closed once the body ended; the rest is already buffered
+            try:
+                line = next(lines)
+            except StopIteration:
+                return
+            except requests.exceptions.ConnectionError as exc:
+                # iter_content reports a read timeout as a ConnectionError.
+                if time.monotonic() >= end:
+                    raise ProviderError(f"{self.name} exceeded its {self.deadline:g}s deadline.") from exc
+                raise
+            yield line
+
+
+class HeuristicProvider(Provider):
+    """
+    The local rule-based planner; never hedged, never behind a thread. It is the
+    only provider that uses request context (e.g. `existing_blocks`).
+    """
+
+    name = "heuristic"
+    inline = True
+
+    def __init__(self, generate: Callable[..., list[dict]], **kwargs):
+        super().__init__(**kwargs)
+        self._generate = generate
+
+    def generate(self, prompt: str, **context) -> list[dict]:
+        return self._generate(prompt, **context)
+
+
+class ProviderChain:
+    """
+    Try remote providers in order, each under its own deadline and circuit breaker,
+    then the inline providers. With hedging on, if the running provider has not
+    answered by its `hedge_percentile` latency the next remote provider is started
+    too and the first valid answer wins. The whole chain is bounded by
+    `total_deadline`, after which only inline providers are consulted.
+    """
+
+    def __init__(
+        self,
+        providers: list[Provider],
+        *,
+        hedge: bool = False,
+        hedge_percentile: float = 0.95,
+        hedge_min_delay: float = 0.5,
+        hedge_default_delay: float = 3.0,
+        total_deadline: float = 30.0,
+        max_workers: int = 16,
+    ):
+        self.providers = providers
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.total_deadline = total_deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai-provider")
+        self.hedges = 0
+        self.budget_exhausted = 0
+
+    @property
+    def remote(self) -> list[Provider]:
+        return [p for p in self.providers if not p.inline]
+
+    @property
+    def primary(self) -> Provider | None:
+        """The first remote provider: the one the chain answers from when all is well."""
+        remote = self.remote
+        return remote[0] if remote else None
+
+    def _hedge_delay(self, provider: Provider) -> float:
+        observed = provider.latency.percentile(self.hedge_percentile) if len(provider.latency) >= 20 else None
+        delay = observed if observed is not None else self.hedge_default_delay
+        return min(provider.deadline, max(self.hedge_min_delay, delay))
+
+    def _next_allowed(self, queue: list[Provider], errors: list[str]) -> Provider | None:
+        """
+        Pop the next provider whose circuit lets a call through. allow() is only asked
+        here, right before a launch: in the half-open state it hands out the single
+        trial call, which a provider that is never started would hold forever.
+        """
+        while queue:
+            provider = queue.pop(0)
+            if provider.breaker.allow():
+                return provider
+            errors.append(f"{provider.name}: circuit open")
+        return None
+
+    def generate(self, prompt: str, **context) -> tuple[list[dict], str]:
+        """Return (tasks, provider_name) from the first provider with a valid answer."""
+        errors: list[str] = []
+        queue = self.remote
+        budget_end = time.monotonic() + self.total_deadline
+        pending: dict[Future, tuple[Provider, float, CallTicket]] = {}
+
+        def launch() -> None:
+            provider = self._next_allowed(queue, errors)
+            if provider is None:
+                return
+            ticket = CallTicket()
+            fut = self._executor.submit(contextvars.copy_context().run, provider.call, prompt, ticket=ticket, **context)
+            pending[fut] = (provider, time.monotonic(), ticket)
+
+        while queue or pending:
+            now = time.monotonic()
+            if now >= budget_end:
+                self.budget_exhausted += 1
+                errors.append(f"total deadline of {self.total_deadline:g}s exhausted")
+                break
+            if not pending:
+                launch()
+                continue
+            wake = min(budget_end, *(started + p.deadline for p, started, _ in pending.values()))
+            hedge_at = None
+            if self.hedge and queue:
+                oldest, started, _ = min(pending.values(), key=lambda item: item[1])
+                hedge_at = started + self._hedge_delay(oldest)
+                wake = min(wake, hedge_at)
+            done, _ = wait(list(pending), timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+            for fut in done:
+                provider, _, _ = pending.pop(fut)
+                try:
+                    tasks = fut.result()
+                except Exception as exc:
+                    errors.append(f"{provider.name}: {exc}")
+                    continue
+                for other, (loser, _, _) in pending.items():
+                    if other.cancel():
+                        loser.breaker.release()
+                return tasks, provider.name
+            now = time.monotonic()
+            for fut, (provider, started, ticket) in list(pending.items()):
+                if now - started >= provider.deadline:
+                    pending.pop(fut)
+                    # A running thread cannot be stopped (its HTTP timeout ends it), but the
+                    # overrun counts against the circuit now rather than whenever it returns.
+                    if fut.cancel():
+                        provider.breaker.release()
+                    elif ticket.settle():
+                        provider._failed()
+                    errors.append(f"{provider.name}: deadline of {provider.deadline:g}s exceeded")
+            if not done and hedge_at is not None and now >= hedge_at and queue and pending:
+                self.hedges += 1
+                launch()
+
+        return self._inline_fallback(prompt, errors, **context)
+
+    async def agenerate(self, prompt: str, *, client=None, **context) -> tuple[list[dict], str]:
+        """generate() for asyncio callers: same order, hedging and deadlines, with tasks instead of threads."""
+        errors: list[str] = []
+        queue = self.remote
+        budget_end = time.monotonic() + self.total_deadline
+        pending: dict[asyncio.Future, tuple[Provider, float]] = {}
+
+        def launch() -> None:
+            provider = self._next_allowed(queue, errors)
+            if provider is None:
+                return
+            pending[asyncio.ensure_future(provider.acall(prompt, client=client, **context))] = (provider, time.monotonic())
+
+        try:
+            while queue or pending:
+                now = time.monotonic()
+                if now >= budget_end:
+                    self.budget_exhausted += 1
+                    errors.append(f"total deadline of {self.total_deadline:g}s exhausted")
+                    break
+                if not pending:
+                    launch()
+                    continue
+                wake = min(budget_end, *(started + p.deadline for p, started in pending.values()))
+                hedge_at = None
+                if self.hedge and queue:
+                    oldest, started = min(pending.values(), key=lambda item: item[1])
+                    hedge_at = started + self._hedge_delay(oldest)
+                    wake = min(wake, hedge_at)
+                done, _ = await asyncio.wait(list(pending), timeout=max(0.0, wake - now),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    provider, _ = pending.pop(fut)
+                    try:
+                        tasks = fut.result()
+                    except Exception as exc:
+                        errors.append(f"{provider.name}: {exc}")
+                        continue
+                    return tasks, provider.name
+                now = time.monotonic()
+                for fut, (provider, started) in list(pending.items()):
+                    if now - started >= provider.deadline:
+                        pending.pop(fut)
+                        fut.cancel()
+                        provider._failed()
+                        errors.append(f"{provider.name}: deadline of {provider.deadline:g}s exceeded")
+                if not done and hedge_at is not None and now >= hedge_at and queue and pending:
+                    self.hedges += 1
+                    launch()
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+        return self._inline_fallback(prompt, errors, **context)
+
+    def _inline_fallback(self, prompt: str, errors: list[str], **context) -> tuple[list[dict], str]:
+        for provider in self.providers:
+            if not provider.inline:
+                continue
+            try:
+                return provider.call(prompt, **context), provider.name
+            except Exception as exc:
+                errors.append(f"{provider.name}: {exc}")
+        raise ProviderError("; ".join(errors) or "No AI providers configured.")
+
+    def stream(self, prompt: str, **context) -> Iterator[tuple[dict, str]]:
+        """
+        Yield (task, provider_name) from the first provider that produces a task.
+        A provider failing before its first task falls through to the next one;
+        failing after that raises, since the client already has partial output.
+        """
+        errors: list[str] = []
+        for provider in self.providers:
+            if not provider.inline and not provider.breaker.allow():
+                errors.append(f"{provider.name}: circuit open")
+                continue
+            sent = 0
+            try:
+                # closing(): a disconnect closes the provider's stream right away, so
+                # its breaker bookkeeping doesn't wait for garbage collection.
+                with closing(provider.call_stream(prompt, **context)) as tasks:
+                    for task in tasks:
+                        sent += 1
+                        yield task, provider.name
+                return
+            except Exception as exc:
+                if sent:
+                    raise
+                errors.append(f"{provider.name}: {exc}")
+        raise ProviderError("; ".join(errors) or "No AI providers configured.")
+
+    def stats(self) -> dict:
+        return {
+            "hedging": self.hedge,
+            "hedges": self.hedges,
+            "budget_exhausted": self.budget_exhausted,
+            "total_deadline_seconds": self.total_deadline,
+            "providers": {p.name: p.stats() for p in self.providers},
+        }
+
+
+def _response_socket(response):
+    """The socket a streamed requests response reads from, or None if it can't be reached."""
+    sock = getattr(getattr(response.raw, "connection", None), "sock", None)
+    if sock is None:
+        # A connection that closes after this response hands its socket over to the
+        # response's file object (http.client), so look for it there.
+        sock = getattr(getattr(getattr(getattr(response.raw, "_fp", None), "fp", None), "raw", None), "_sock", None)
+    return sock
+
+
+def _strip_code_fence(text: str) -> str:
+    trimmed = text.strip()
+    if trimmed.startswith("```"):
+        trimmed = re.sub(r"^```(?:json)?", "", trimmed, flags=re.IGNORECASE)
+        if trimmed.endswith("```"):
+            trimmed = trimmed[:-3]
+    return trimmed.strip()
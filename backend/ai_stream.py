@@ -0,0 +1,112 @@
+from __future__ import annotations
+from typing import Iterable, Iterator
+
+import codec
+
+
+class TaskStreamParser:
+    """
+    Incrementally pull task objects out of a streamed `{"tasks":[{...},{...}]}` reply.
+
+    Feed text as it arrives; every object that closes inside the first JSON array
+    is decoded and returned straight away, so callers can forward the first task
+    long before the model has finished writing the last one. Anything before the
+    array (code fences, the `"tasks":` key) and after it is ignored.
+    """
+
+    def __init__(self):
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buf: list[str] = []
+        self.text: list[str] = []
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, chunk: str) -> list[dict]:
+        found: list[dict] = []
+        if not chunk:
+            return found
+        self.text.append(chunk)
+        for ch in chunk:
+            if self._done:
+                break
+            if self._in_string:
+                if self._depth:
+                    self._buf.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+                if self._depth:
+                    self._buf.append(ch)
+                continue
+            if not self._in_array:
+                if ch == "[":
+                    self._in_array = True
+                continue
+            if not self._depth:
+                if ch == "{":
+                    self._depth = 1
+                    self._buf = [ch]
+                elif ch == "]":
+                    self._done = True
+                continue
+            self._buf.append(ch)
+            if ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if not self._depth:
+                    try:
+                        item = codec.loads("".join(self._buf))
+                    except ValueError:
+                        item = None
+                    if isinstance(item, dict):
+                        found.append(item)
+                    self._buf = []
+        return found
+
+    def full_text(self) -> str:
+        return "".join(self.text)
+
+
+def iter_sse_data(lines: Iterable[str | bytes]) -> Iterator[str]:
+    """Yield the `data:` payloads of a server-sent event stream until `[DONE]`."""
+    for raw in lines:
+        line = raw.decode("utf-8", "replace") if isinstance(raw, bytes) else raw
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        if data:
+            yield data
+
+
+def iter_completion_deltas(lines: Iterable[str | bytes]) -> Iterator[str]:
+    """Yield content deltas from an OpenAI-compatible chat completion stream."""
+    for data in iter_sse_data(lines):
+        try:
+            payload = codec.loads(data)
+        except ValueError:
+            continue
+        if isinstance(payload, dict) and payload.get("error"):
+            raise RuntimeError(f"Stream error: {payload['error']}")
+        for choice in payload.get("choices") or []:
+            delta = (choice.get("delta") or {}).get("content")
+            if isinstance(delta, str) and delta:
+                yield delta
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {codec.dumps(data)}\n\n"
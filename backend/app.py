@@ -1,38 +1,90 @@
 from __future__ import annotations
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, g, has_app_context, has_request_context, request, jsonify, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import (
-    JWTManager, create_access_token, jwt_required, get_jwt_identity
+    JWTManager, create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request
 )
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
+import click
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import inspect, text
+from sqlalchemy import bindparam, delete, event, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import wraps
 import re
-import json
+import contextvars
 import os
+import random
 import secrets
 import string
-import requests
-
-app = Flask(__name__)
-CORS(app)
+import threading
+import time
+import unicodedata
+from urllib.parse import urlsplit
+
+from ai_providers import CircuitBreaker, HeuristicProvider, OpenAICompatibleProvider, Provider, ProviderChain
+from ai_stream import sse_event
+from capture import TrafficRecorder
+import codec
+import compression
+from caching import AsyncSingleFlight, SingleFlight, SizedLRU, TTLCache
+import metrics
+import profile_blob
+from profiler import ProfileStore, StackSampler
+from slowlog import structured_logger
+from tracing import tracer_from_env
+from writebuffer import WriteCoalescer
+from sqlcount import QueryLog, statement_shape
+from planner import TIME_RE, plan_tasks, vocabulary
+from ratelimit import RateLimiter, retry_after_header, store_from_url
+
+api = Blueprint("api", __name__)
 
 # -------------------- Config --------------------
 BASEDIR = os.path.abspath(os.path.dirname(__file__))
-DB_URI = "sqlite:///users.db"
-app.config["SQLALCHEMY_DATABASE_URI"] = DB_URI
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-# JWT
-app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY", "super-secret-key")
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=7)
+DB_URI = os.environ.get("DATABASE_URL", "sqlite:///users.db")
+# Defaults for create_app(); anything passed to it wins.
+DEFAULT_CONFIG = {
+    "SQLALCHEMY_DATABASE_URI": DB_URI,
+    "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+    "JWT_SECRET_KEY": os.environ.get("JWT_SECRET_KEY", "super-secret-key"),
+    "JWT_ACCESS_TOKEN_EXPIRES": timedelta(days=7),
+    # Create missing tables/columns when the app is built. Turn off when a deploy step runs
+    # `flask --app app migrate` once instead of every worker doing it on start.
+    "AUTO_MIGRATE": os.environ.get("AUTO_MIGRATE", "1").strip().lower() not in ("0", "false", "no"),
+}
 
-db = SQLAlchemy(app)
-jwt = JWTManager(app)
+db = SQLAlchemy()
+jwt = JWTManager()
 
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
 GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama-3.1-8b-instant")
+GROQ_API_URL = os.environ.get("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+# Optional OpenAI-compatible server (vLLM, llama.cpp, Ollama...) used as a second AI provider.
+LOCAL_LLM_URL = os.environ.get("LOCAL_LLM_URL")
+LOCAL_LLM_MODEL = os.environ.get("LOCAL_LLM_MODEL", "local")
+
+# Sanitized LLM task lists keyed by (model, normalized prompt).
+AI_TASK_CACHE = TTLCache(
+    max_entries=int(os.environ.get("AI_CACHE_MAX_ENTRIES", "512")),
+    ttl=float(os.environ.get("AI_CACHE_TTL_SECONDS", "3600")),
+)
+# Concurrent identical prompts share one in-flight generation instead of each starting their own.
+AI_SINGLE_FLIGHT = SingleFlight()
+AI_ASYNC_SINGLE_FLIGHT = AsyncSingleFlight()  # the same, for /ai/tasks under asgi.py
+AI_COALESCE_WAIT_SECONDS = float(os.environ.get("AI_COALESCE_WAIT_SECONDS", "35"))
+# /ai/tasks/batch fans out over a shared pool so one big batch cannot monopolise the providers.
+AI_BATCH_MAX_ITEMS = int(os.environ.get("AI_BATCH_MAX_ITEMS", "21"))
+AI_BATCH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("AI_BATCH_CONCURRENCY", "4")),
+    thread_name_prefix="ai-batch",
+)
 
 def _load_google_client_ids() -> set[str]:
     """
@@ -49,6 +101,100 @@ def _load_google_client_ids() -> set[str]:
 
 GOOGLE_CLIENT_IDS = _load_google_client_ids()
 
+# Rate limiting: in-process buckets by default, RATE_LIMIT_STORAGE_URL=redis://... to share across workers.
+RATE_LIMITER = RateLimiter(
+    store_from_url(os.environ.get("RATE_LIMIT_STORAGE_URL")),
+    enabled=os.environ.get("RATE_LIMIT_ENABLED", "1").strip().lower() not in ("0", "false", "no"),
+)
+RATE_LIMIT_TRUST_PROXY = os.environ.get("RATE_LIMIT_TRUST_PROXY", "").strip().lower() in ("1", "true", "yes")
+
+# Prometheus metrics on /metrics. Under several workers point METRICS_MULTIPROC_DIR at a
+# directory shared by them (and emptied on deploy) so any worker can report the totals.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+METRICS = metrics.Registry(
+    multiprocess_dir=os.environ.get("METRICS_MULTIPROC_DIR") or None,
+    flush_interval=float(os.environ.get("METRICS_FLUSH_SECONDS", "5")),
+)
+# DB_QUERY_DEBUG=1 adds X-DB-Queries/X-DB-Time headers and warns when one statement shape
+# repeats DB_N_PLUS_ONE_THRESHOLD times in a request (a likely N+1 loop).
+DB_QUERY_DEBUG = os.environ.get("DB_QUERY_DEBUG", "").strip().lower() in ("1", "true", "yes")
+DB_N_PLUS_ONE_THRESHOLD = int(os.environ.get("DB_N_PLUS_ONE_THRESHOLD", "5"))
+# Requests slower than SLOW_REQUEST_MS and statements slower than SLOW_QUERY_MS are written
+# as JSON lines to SLOW_LOG_FILE (stderr by default) from a background thread; 0 disables.
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_MS", "1000")) / 1000
+SLOW_QUERY_SECONDS = float(os.environ.get("SLOW_QUERY_MS", "200")) / 1000
+SLOW_LOG = structured_logger("stepsync.slow", path=os.environ.get("SLOW_LOG_FILE") or None)
+# Tracing: TRACE_EXPORT is a JSON-lines file path or an OTLP/HTTP endpoint
+# (http://host:4318/v1/traces). Incoming W3C `traceparent` headers are continued.
+TRACER = tracer_from_env(
+    os.environ.get("TRACE_EXPORT"),
+    sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", "1")),
+)
+# Sampling profiler: requests carrying `X-Profile: $PROFILER_TOKEN`, plus a random
+# PROFILER_SAMPLE_RATE fraction of traffic. Nothing is hooked in when both are unset.
+PROFILER_TOKEN = os.environ.get("PROFILER_TOKEN") or None
+PROFILER_SAMPLE_RATE = float(os.environ.get("PROFILER_SAMPLE_RATE", "0"))
+PROFILER_INTERVAL = float(os.environ.get("PROFILER_INTERVAL_MS", "5")) / 1000
+PROFILE_STORE = ProfileStore(
+    os.environ.get("PROFILER_DIR") or os.path.join(BASEDIR, "instance", "profiles"),
+    fmt=os.environ.get("PROFILER_FORMAT", "speedscope"),
+    max_files=int(os.environ.get("PROFILER_MAX_FILES", "50")),
+    max_bytes=int(os.environ.get("PROFILER_MAX_MB", "200")) * 1024 * 1024,
+)
+# Traffic capture for `python -m loadtest replay`: one sanitized JSON line per request in
+# CAPTURE_FILE (".gz" compresses; "{pid}" gives each worker its own file). Usernames and
+# free text are pseudonymized with CAPTURE_SECRET, which `loadtest snapshot` must reuse.
+# CAPTURE_SAMPLE_RATE keeps that fraction of users, with all of their requests.
+CAPTURE = TrafficRecorder(
+    os.environ.get("CAPTURE_FILE") or None,
+    secret=(os.environ.get("CAPTURE_SECRET") or secrets.token_hex(16)).encode(),
+    sample_rate=float(os.environ.get("CAPTURE_SAMPLE_RATE", "1")),
+    keep_words=vocabulary(),
+)
+
+# users.profile_data encoding for new writes: "json" or "columnar", compressed once it
+# reaches PROFILE_COMPRESS_MIN_BYTES (0 = never). Every format is always readable, so
+# roll out readers first; `flask convert-profiles` rewrites existing rows.
+PROFILE_BLOB_FORMAT = os.environ.get("PROFILE_BLOB_FORMAT", "json").strip().lower()
+PROFILE_COMPRESS_MIN_BYTES = int(os.environ.get("PROFILE_COMPRESS_MIN_BYTES", "0"))
+PROFILE_COMPRESS_LEVEL = int(os.environ.get("PROFILE_COMPRESS_LEVEL", "3"))
+
+# Response compression: JSON bodies of at least COMPRESS_MIN_BYTES go out in the first of
+# COMPRESS_ENCODINGS the client accepts (zstd and br need the zstandard/brotli packages).
+# GET responses carry a content-hash ETag, and compressed bodies are kept per ETag in a
+# COMPRESS_CACHE_MB LRU, so an unchanged schedule is compressed once, not on every poll.
+COMPRESS_ENABLED = os.environ.get("COMPRESS_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_ENCODINGS = tuple(
+    name for name in os.environ.get("COMPRESS_ENCODINGS", ",".join(compression.PREFERENCE)).replace(" ", "").lower().split(",")
+    if name in compression.available()
+)
+COMPRESS_LEVELS = {
+    name: int(os.environ.get(f"COMPRESS_LEVEL_{name.upper()}", str(level)))
+    for name, level in compression.DEFAULT_LEVELS.items()
+}
+# An empty entry records that compressing that body did not make it smaller.
+COMPRESSED_BODIES = SizedLRU(
+    max_bytes=int(float(os.environ.get("COMPRESS_CACHE_MB", "32")) * 1024 * 1024),
+    entry_overhead=128,
+)
+
+# Single-schedule block add/edit/delete go through a per-user write buffer: edits are
+# applied in arrival order, and those that arrive while the previous save for the same
+# user is running are merged into one read-modify-write and one commit. A
+# PROFILE_WRITE_WINDOW_MS window holds each batch open that long to gather a burst.
+# PROFILE_WRITE_MODE=async answers 202 as soon as the edit is queued and saves it from
+# PROFILE_WRITE_WORKERS background threads: faster, but a failed or lost write (e.g. a
+# restart) is only logged. PROFILE_WRITE_COALESCE=0 saves every edit on its own.
+PROFILE_WRITE_COALESCE = os.environ.get("PROFILE_WRITE_COALESCE", "1").strip().lower() not in ("0", "false", "no")
+PROFILE_WRITE_WINDOW_SECONDS = float(os.environ.get("PROFILE_WRITE_WINDOW_MS", "0")) / 1000
+PROFILE_WRITE_MAX_BATCH = int(os.environ.get("PROFILE_WRITE_MAX_BATCH", "64"))
+PROFILE_WRITE_ASYNC = os.environ.get("PROFILE_WRITE_MODE", "sync").strip().lower() == "async"
+PROFILE_WRITE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("PROFILE_WRITE_WORKERS", "2")),
+    thread_name_prefix="profile-write",
+)
+
 # -------------------- Models --------------------
 class User(db.Model):
     __tablename__ = "users"
@@ -59,7 +205,7 @@ class User(db.Model):
     password     = db.Column(db.String(200), nullable=False)  # hashed
     auth_provider = db.Column(db.String(20), nullable=False, default="password")  # "password" | "google"
     account_type = db.Column(db.Text, nullable=False)         # "parent" | "child"
-    profile_data = db.Column(db.Text)                         # JSON string
+    profile_data = db.Column(db.Text)                         # see profile_blob.py
     family_id    = db.Column(db.String(20), nullable=True)
     family_joined_at = db.Column(db.DateTime, nullable=True)
 
@@ -111,7 +257,25 @@ class RoutineTemplateEntry(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-with app.app_context():
+class BlockState(db.Model):
+    """
+    `completed`/`hidden` set through /profile/block/complete, laid over the stored
+    profile on read. The next full rewrite of the profile folds them in and deletes them;
+    "pos:" rows it did not read follow their block to its new index.
+    """
+    __tablename__ = "block_states"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    date = db.Column(db.String(10), nullable=False)
+    block_key = db.Column(db.String(80), nullable=False)  # "tag:<family_tag>" | "pos:<index>"
+    title = db.Column(db.Text, nullable=True)             # "pos:" rows only apply while the title matches
+    completed = db.Column(db.Boolean, nullable=True)
+    hidden = db.Column(db.Boolean, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __table_args__ = (db.UniqueConstraint("user_id", "date", "block_key", name="uq_block_states_key"),)
+
+def _migrate_schema() -> None:
+    """Create tables and add columns older databases lack. Needs an app context."""
     db.create_all()
     _insp = inspect(db.engine)
     user_columns = {col["name"] for col in _insp.get_columns("users")}
@@ -145,6 +309,374 @@ with app.app_context():
         with db.engine.begin() as conn:
             conn.execute(text("ALTER TABLE family_leave_requests ADD COLUMN child_local_time TEXT"))
 
+# -------------------- Metrics --------------------
+HTTP_REQUESTS = METRICS.counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+HTTP_LATENCY = METRICS.histogram("http_request_duration_seconds", "Time to produce a response.", ("method", "route"))
+HTTP_IN_FLIGHT = METRICS.gauge("http_requests_in_flight", "Requests currently being handled.", ("method", "route"))
+DB_TIME = METRICS.histogram("http_request_db_seconds", "SQL time spent per request.", ("route",))
+DB_STATEMENTS = METRICS.histogram(
+    "http_request_db_statements", "SQL statements executed per request.", ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+PROFILE_BLOB_BYTES = METRICS.histogram(
+    "profile_blob_bytes", "Size of profile_data JSON blobs read and written.", ("op",),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+OUTBOUND_LATENCY = METRICS.histogram("outbound_http_duration_seconds", "Outbound HTTP time to response headers.", ("host",))
+OUTBOUND_REQUESTS = METRICS.counter("outbound_http_requests_total", "Outbound HTTP responses by host and status.", ("host", "status"))
+COMPRESS_BYTES = METRICS.counter(
+    "http_response_compress_bytes_total", "JSON response bytes before (identity) and after compression.",
+    ("route", "encoding", "stage"),
+)
+COMPRESS_CPU = METRICS.counter(
+    "http_response_compress_cpu_seconds_total", "CPU time spent compressing responses (cache misses).", ("route", "encoding"),
+)
+COMPRESS_CACHE_LOOKUPS = METRICS.counter("http_response_compress_cache_lookups_total", "Compressed body cache lookups.", ("result",))
+COMPRESS_CACHE_BYTES = METRICS.gauge("http_response_compress_cache_bytes", "Bytes held in the compressed body cache.")
+PROFILE_WRITE_OPS = METRICS.counter("profile_write_ops_total", "Buffered profile edits applied, by outcome.", ("result",))
+PROFILE_WRITE_BATCHES = METRICS.counter("profile_write_batches_total", "Profile read-modify-write rounds that applied buffered edits.")
+PROFILE_WRITE_BATCH_SIZE = METRICS.histogram(
+    "profile_write_batch_size", "Buffered edits merged into one profile write.", buckets=(1, 2, 3, 5, 8, 13, 21, 34, 64),
+)
+AI_CACHE_LOOKUPS = METRICS.counter("ai_cache_lookups_total", "AI task cache lookups.", ("result",))
+AI_CACHE_ENTRIES = METRICS.gauge("ai_cache_entries", "Entries held in the AI task cache.")
+
+def _route_label() -> str:
+    # Route templates, never raw paths, so label cardinality stays bounded.
+    return request.url_rule.rule if request.url_rule else "<unmatched>"
+
+@api.before_app_request
+def _metrics_begin():
+    g.request_started = time.perf_counter()
+    g.queries = QueryLog()
+    g.http_time = 0.0
+    g.profile_bytes = {"read": 0, "write": 0}
+    if METRICS_ENABLED:
+        METRICS.start_flusher()
+        HTTP_IN_FLIGHT.labels(request.method, _route_label()).inc()
+        g.metrics_in_flight = True
+
+@api.after_app_request
+def _metrics_record(response):
+    if "request_started" not in g:
+        return response
+    queries: QueryLog = g.queries
+    elapsed = time.perf_counter() - g.request_started
+    if METRICS_ENABLED:
+        route = _route_label()
+        HTTP_REQUESTS.labels(request.method, route, response.status_code).inc()
+        HTTP_LATENCY.labels(request.method, route).observe(elapsed)
+        DB_TIME.labels(route).observe(queries.total_time)
+        DB_STATEMENTS.labels(route).observe(queries.count)
+    if DB_QUERY_DEBUG:
+        response.headers["X-DB-Queries"] = str(queries.count)
+        response.headers["X-DB-Time"] = f"{queries.total_time * 1000:.2f}ms"
+        for shape, count in queries.repeated(DB_N_PLUS_ONE_THRESHOLD):
+            current_app.logger.warning("Possible N+1 on %s %s: %d x %s", request.method, _route_label(), count, shape)
+    if SLOW_REQUEST_SECONDS > 0 and elapsed >= SLOW_REQUEST_SECONDS:
+        _log_slow_request(response, elapsed, queries)
+    return response
+
+def _caller_username() -> str | None:
+    """JWT identity of the caller, if any, without requiring the route to be protected."""
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+def _request_identity() -> tuple[str | None, int | None, str | None]:
+    """(username, user id, family id) for the caller; only called for slow requests."""
+    ident = _caller_username()
+    if not ident:
+        return None, None, None
+    row = db.session.query(User.id, User.family_id).filter_by(username=ident).first()
+    return (ident, row.id, row.family_id) if row else (ident, None, None)
+
+def _log_slow_request(response, elapsed: float, queries: QueryLog) -> None:
+    username, user_id, family_id = _request_identity()
+    SLOW_LOG.warning("slow request", extra={"context": {
+        "event": "slow_request",
+        "method": request.method,
+        "route": _route_label(),
+        "status": response.status_code,
+        "duration_ms": round(elapsed * 1000, 2),
+        "user": username,
+        "user_id": user_id,
+        "family_id": family_id,
+        "db_statements": queries.count,
+        "db_time_ms": round(queries.total_time * 1000, 2),
+        "http_time_ms": round(g.http_time * 1000, 2),
+        "profile_bytes_read": g.profile_bytes["read"],
+        "profile_bytes_written": g.profile_bytes["write"],
+        "slowest_sql": [
+            {"ms": round(seconds * 1000, 2), "sql": statement_shape(sql)[:500]}
+            for sql, seconds in queries.slowest(3)
+        ],
+    }})
+
+@api.teardown_app_request
+def _metrics_end(exc):
+    if g.pop("metrics_in_flight", False):
+        HTTP_IN_FLIGHT.labels(request.method, _route_label()).dec()
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _db_before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _db_after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    in_request = has_request_context() and "queries" in g
+    if in_request:
+        g.queries.record(statement, elapsed)
+    if TRACER.enabled:
+        TRACER.record("db.query", elapsed, kind="client", **{"db.statement": statement[:500]})
+    if SLOW_QUERY_SECONDS > 0 and elapsed >= SLOW_QUERY_SECONDS:
+        SLOW_LOG.warning("slow query", extra={"context": {
+            "event": "slow_query",
+            "route": _route_label() if in_request else None,
+            "duration_ms": round(elapsed * 1000, 2),
+            "sql": statement_shape(statement)[:500],
+        }})
+
+def _note_profile_blob(op: str, size: int) -> None:
+    if METRICS_ENABLED:
+        PROFILE_BLOB_BYTES.labels(op).observe(size)
+    if has_request_context() and "profile_bytes" in g:
+        g.profile_bytes[op] += size
+
+@event.listens_for(User.profile_data, "set")
+def _profile_blob_written(target, value, oldvalue, initiator):
+    if value:
+        _note_profile_blob("write", len(value))
+
+def _record_outbound(response, *args, **kwargs):
+    """requests response hook: latency per host, and per-request outbound time for the slow log."""
+    _note_outbound(response.request.method, response.url, response.status_code, response.elapsed.total_seconds())
+    return response
+
+def _note_outbound(method: str, url: str, status: int, elapsed: float) -> None:
+    host = urlsplit(url).hostname or "unknown"
+    if METRICS_ENABLED:
+        OUTBOUND_LATENCY.labels(host).observe(elapsed)
+        OUTBOUND_REQUESTS.labels(host, status).inc()
+    if has_request_context() and "http_time" in g:
+        g.http_time += elapsed
+    if TRACER.enabled:
+        TRACER.record(
+            f"http {method} {host}", elapsed, kind="client",
+            **{"http.url": url.split("?", 1)[0], "http.status_code": status},
+        )
+
+HTTP_HOOKS = {"response": [_record_outbound]}
+_OUTBOUND = threading.local()
+
+def _outbound_session():
+    """
+    Keep-alive session for Google calls, created on first use. `requests` is only
+    imported here and by the AI providers, so workers that never call out skip it.
+    """
+    session = getattr(_OUTBOUND, "session", None)
+    if session is None or _OUTBOUND.pid != os.getpid():
+        import requests
+        session = requests.Session()
+        session.hooks["response"].append(_record_outbound)
+        _OUTBOUND.session, _OUTBOUND.pid = session, os.getpid()
+    return session
+
+def _outbound_errors() -> type[Exception]:
+    import requests
+    return requests.RequestException
+
+def _collect_ai_cache_metrics() -> None:
+    stats = AI_TASK_CACHE.stats()
+    AI_CACHE_LOOKUPS.labels("hit").set(stats["hits"])
+    AI_CACHE_LOOKUPS.labels("miss").set(stats["misses"])
+    AI_CACHE_ENTRIES.set(stats["size"])
+
+METRICS.on_collect(_collect_ai_cache_metrics)
+
+def _collect_compress_cache_metrics() -> None:
+    stats = COMPRESSED_BODIES.stats()
+    COMPRESS_CACHE_LOOKUPS.labels("hit").set(stats["hits"])
+    COMPRESS_CACHE_LOOKUPS.labels("miss").set(stats["misses"])
+    COMPRESS_CACHE_BYTES.set(stats["bytes"])
+
+METRICS.on_collect(_collect_compress_cache_metrics)
+
+# -------------------- Profiling --------------------
+def _should_profile() -> bool:
+    token = request.headers.get("X-Profile")
+    if token and PROFILER_TOKEN and secrets.compare_digest(token, PROFILER_TOKEN):
+        return True
+    return PROFILER_SAMPLE_RATE > 0 and random.random() < PROFILER_SAMPLE_RATE
+
+def _profile_begin():
+    if _should_profile():
+        g.profile_name = f"{request.method} {_route_label()}"
+        g.profile_file = PROFILE_STORE.filename(g.profile_name)
+        g.profiler = StackSampler(interval=PROFILER_INTERVAL).start()
+
+def _profile_header(response):
+    if "profile_file" in g:
+        response.headers["X-Profile-Id"] = g.profile_file
+    return response
+
+def _profile_end(exc):
+    sampler: StackSampler | None = g.pop("profiler", None)
+    if sampler is None:
+        return
+    sampler.stop()
+    filename, name = g.profile_file, g.profile_name
+    logger = current_app.logger
+
+    def save() -> None:
+        try:
+            PROFILE_STORE.save(filename, sampler, name=name)
+        except OSError as err:
+            logger.warning("Could not write profile %s: %s", filename, err)
+
+    # Stacks are already captured; write them off the request thread.
+    threading.Thread(target=save, name="profile-writer", daemon=True).start()
+
+# -------------------- Tracing --------------------
+def _trace_begin():
+    span = TRACER.start_trace(
+        f"{request.method} {_route_label()}",
+        request.headers.get("traceparent"),
+        **{"http.method": request.method, "http.route": _route_label()},
+    )
+    if span is not None:
+        g.trace_span = span
+        g.trace_token = TRACER.activate(span)
+
+def _trace_header(response):
+    span = g.get("trace_span")
+    if span is not None:
+        span.set("http.status_code", response.status_code)
+        response.headers["traceresponse"] = span.traceparent
+    return response
+
+def _trace_end(exc):
+    span = g.pop("trace_span", None)
+    if span is not None:
+        if exc is not None:
+            span.error = f"{type(exc).__name__}: {exc}"
+        TRACER.finish(span, g.pop("trace_token", None))
+
+# -------------------- Traffic capture --------------------
+def _capture_request(response):
+    if request.url_rule is None or request.method == "OPTIONS" or request.path == "/metrics":
+        return response
+    elapsed = time.perf_counter() - g.request_started if "request_started" in g else 0.0
+    body = request.get_json(silent=True)
+    username = _caller_username()
+    if not username and isinstance(body, dict):
+        username = body.get("username")  # login and signup
+    CAPTURE.record(
+        started=time.time() - elapsed,
+        username=username if isinstance(username, str) else None,
+        method=request.method,
+        route=_route_label(),
+        path=request.path,
+        query=request.args.to_dict(),
+        body=body,
+        status=response.status_code,
+        duration=elapsed,
+    )
+    return response
+
+# -------------------- Response compression --------------------
+def _compress_response(response):
+    if response.is_streamed or response.direct_passthrough or response.mimetype != "application/json":
+        return response
+    data = response.get_data()
+    compressible = len(data) >= COMPRESS_MIN_BYTES and "Content-Encoding" not in response.headers
+    if compressible:
+        response.vary.add("Accept-Encoding")
+    cacheable = request.method == "GET" and response.status_code == 200
+    if cacheable:
+        # Weak, because the identity and compressed bodies share it.
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+    if not compressible:
+        return response
+    encoding = compression.negotiate(request.headers.get("Accept-Encoding"), COMPRESS_ENCODINGS)
+    if encoding is None:
+        return response
+    key = (response.get_etag()[0], encoding) if cacheable else None
+    body = COMPRESSED_BODIES.get(key) if key else None
+    route = _route_label()
+    if body is None:
+        started = time.thread_time()
+        body = compression.compress(data, encoding, COMPRESS_LEVELS[encoding])
+        if METRICS_ENABLED:
+            COMPRESS_CPU.labels(route, encoding).inc(time.thread_time() - started)
+        if len(body) >= len(data):
+            body = b""
+        if key:
+            COMPRESSED_BODIES.set(key, body)
+    if not body:
+        return response
+    if METRICS_ENABLED:
+        COMPRESS_BYTES.labels(route, encoding, "identity").inc(len(data))
+        COMPRESS_BYTES.labels(route, encoding, "encoded").inc(len(body))
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+# -------------------- Outbound steps --------------------
+# Views that mostly wait on other services are written as generators: they yield
+# a step and are sent its result. Under WSGI the step runs right here on the
+# worker thread; asgi.py awaits it instead, so the request holds no thread while
+# Google or the model answers. Don't yield with unflushed writes in the session:
+# asgi.py rolls it back to hand the connection back to the pool while it waits.
+ASYNC_VIEWS_ENVIRON_KEY = "stepsync.async_views"
+
+@dataclass(frozen=True)
+class HttpGet:
+    """Result: (status, parsed JSON or None), or None when the request failed."""
+    url: str
+    params: dict | None = None
+    headers: dict | None = None
+    timeout: float = 8.0
+
+@dataclass(frozen=True)
+class GenerateTasks:
+    """Result: (tasks, source) as returned by _ai_generate_tasks()."""
+    prompt: str
+    existing_blocks: list[dict] | None = None
+
+def _run_step(step):
+    if isinstance(step, GenerateTasks):
+        return _ai_generate_tasks(step.prompt, step.existing_blocks)
+    try:
+        resp = _outbound_session().get(step.url, params=step.params, headers=step.headers, timeout=step.timeout)
+    except _outbound_errors():
+        return None
+    try:
+        return resp.status_code, resp.json()
+    except ValueError:
+        return resp.status_code, None
+
+def _outbound_view(fn):
+    """Runs a generator view's steps inline, unless asgi.py is driving the request."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        flow = fn(*args, **kwargs)
+        if request.environ.get(ASYNC_VIEWS_ENVIRON_KEY):
+            return flow
+        result = None
+        try:
+            while True:
+                result = _run_step(flow.send(result))
+        except StopIteration as stop:
+            return stop.value
+    return wrapper
+
 # -------------------- Helpers --------------------
 def _default_preferences() -> dict:
     return {"theme": "system"}
@@ -166,7 +698,32 @@ def _require_not_past(date_str: str) -> None:
     if datetime.strptime(date_str, "%Y-%m-%d").date() < today:
         raise ValueError("Date must not be in the past.")
 
-def _safe_profile_dict(text_json: str | None) -> dict:
+@TRACER.traced("password.hash")
+def _hash_password(password: str) -> str:
+    return generate_password_hash(password)
+
+@TRACER.traced("password.verify")
+def _password_matches(hashed: str, password: str) -> bool:
+    return check_password_hash(hashed, password)
+
+@TRACER.traced("profile.serialize")
+def _dump_profile(profile: dict, fmt: str | None = None) -> str:
+    return profile_blob.encode(
+        profile,
+        fmt=fmt or PROFILE_BLOB_FORMAT,
+        compress_min_bytes=PROFILE_COMPRESS_MIN_BYTES,
+        compress_level=PROFILE_COMPRESS_LEVEL,
+    )
+
+@TRACER.traced("profile.parse")
+def _safe_profile_dict(text_json: str | None, block_fields: list[str] | None = None,
+                       counts: dict[str, str] | None = None) -> dict:
+    """
+    The stored profile, repaired. Blocks have at least `block_fields` (plus "date"), maybe
+    more, and the `counts` keys (see profile_blob.decode).
+    """
+    if text_json:
+        _note_profile_blob("read", len(text_json))
     if not text_json:
         return {
             "schedule_blocks": [],
@@ -174,7 +731,9 @@ def _safe_profile_dict(text_json: str | None) -> dict:
             "favorites": _default_favorites(),
         }
     try:
-        data = json.loads(text_json)
+        if block_fields is not None and "date" not in block_fields:
+            block_fields = [*block_fields, "date"]
+        data = profile_blob.decode(text_json, block_fields=block_fields, counts=counts)
         if not isinstance(data, dict):
             return {
                 "schedule_blocks": [],
@@ -226,8 +785,253 @@ def _safe_profile_dict(text_json: str | None) -> dict:
 def _default_favorites() -> dict:
     return {"templates": [], "routines": []}
 
+def _user_profile(user: 'User', block_fields: list[str] | None = None, *, date: str | None = None,
+                  counts: dict[str, str] | None = None) -> dict:
+    """
+    `user`'s profile with their block_states applied. Read through this before rewriting
+    profile_data: the rewrite then carries those states and their rows are deleted on
+    flush. `date` only applies that day's states, for read-only views of one day.
+    """
+    if block_fields is not None:
+        block_fields = [*block_fields, *(f for f in ("title", "family_tag") if f not in block_fields)]
+    prof = _safe_profile_dict(user.profile_data, block_fields, counts)
+    if user.id is None:
+        return prof
+    query = select(
+        BlockState.id, BlockState.date, BlockState.block_key, BlockState.title,
+        BlockState.completed, BlockState.hidden, BlockState.updated_at,
+    ).where(BlockState.user_id == user.id)
+    if date:
+        query = query.where(BlockState.date == date)
+    states = db.session.execute(query).all()
+    if not date:
+        user._block_states_read = [(row.id, row.updated_at) for row in states]
+    if states:
+        _apply_block_states(prof["schedule_blocks"], states)
+    return prof
+
+def _apply_block_states(blocks: list[dict], states) -> None:
+    by_tag: dict[tuple[str, str], object] = {}
+    for state in states:
+        kind, _, ref = state.block_key.partition(":")
+        if kind == "tag":
+            by_tag[(state.date, ref)] = state
+            continue
+        try:
+            blk = blocks[int(ref)]
+        except (ValueError, IndexError):
+            continue
+        if blk.get("date") == state.date and (
+            state.title is None or (blk.get("title") or "").strip() == state.title
+        ):
+            _set_block_flags(blk, state)
+    if by_tag:
+        for blk in blocks:
+            state = by_tag.get((blk.get("date"), blk.get("family_tag") or ""))
+            if state is not None:
+                _set_block_flags(blk, state)
+
+def _set_block_flags(blk: dict, state) -> None:
+    if state.completed is not None:
+        blk["completed"] = state.completed
+    if state.hidden is not None:
+        blk["hidden"] = state.hidden
+
+def _save_block_state(user_id: int, date_str: str, key: str, title: str | None, flags: dict) -> None:
+    values = dict(flags, title=title, updated_at=datetime.utcnow())
+    match = (BlockState.user_id == user_id, BlockState.date == date_str, BlockState.block_key == key)
+    if db.session.execute(update(BlockState).where(*match).values(**values)).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(BlockState(user_id=user_id, date=date_str, block_key=key, **values))
+    except IntegrityError:
+        # Another request inserted the row first.
+        db.session.execute(update(BlockState).where(*match).values(**values))
+
+@event.listens_for(Session, "after_flush")
+def _fold_block_states(session, flush_context):
+    # A rewritten profile already carries the states it was read with (see _user_profile).
+    # Rows changed since that read stay for the next one. This runs after the profile
+    # UPDATE, so no other writer can add a row between here and the commit.
+    for obj in session.dirty:
+        if not isinstance(obj, User) or getattr(obj, "_block_states_read", None) is None:
+            continue
+        history = inspect(obj).attrs.profile_data.history
+        if not history.has_changes():
+            continue
+        seen, obj._block_states_read = obj._block_states_read, None
+        table = BlockState.__table__
+        conn = session.connection()
+        if seen:
+            conn.execute(
+                delete(table).where(table.c.id == bindparam("sid"), table.c.updated_at == bindparam("seen_at")),
+                [{"sid": pk, "seen_at": stamp} for pk, stamp in seen],
+            )
+        old = history.deleted[0] if history.deleted else obj.profile_data
+        _move_position_states(conn, obj.id, old, obj.profile_data)
+
+def _move_position_states(conn, user_id: int, old_data: str | None, new_data: str | None) -> None:
+    """
+    Point the "pos:" rows a rewrite kept at their block's index in the new profile (the
+    same occurrence of that date and title), and drop the ones whose block is gone.
+    """
+    table = BlockState.__table__
+    rows = conn.execute(
+        select(table).where(table.c.user_id == user_id, table.c.block_key.like("pos:%"))
+    ).all()
+    if not rows:
+        return
+
+    def label(blk: dict) -> tuple:
+        return blk.get("date"), (blk.get("title") or "").strip()
+
+    old_blocks = _safe_profile_dict(old_data, ["title"])["schedule_blocks"]
+    new_blocks = old_blocks if new_data == old_data else _safe_profile_dict(new_data, ["title"])["schedule_blocks"]
+    new_index: dict[tuple, list[int]] = {}
+    for idx, blk in enumerate(new_blocks):
+        new_index.setdefault(label(blk), []).append(idx)
+    occurrence, counts = [], {}
+    for blk in old_blocks:
+        occurrence.append(counts.get(label(blk), 0))
+        counts[label(blk)] = occurrence[-1] + 1
+
+    gone, moved = [], []
+    for row in rows:
+        ref = row.block_key.partition(":")[2]
+        pos = int(ref) if ref.isdigit() else -1
+        blk = old_blocks[pos] if 0 <= pos < len(old_blocks) else None
+        if blk is None or blk.get("date") != row.date or row.title not in (None, label(blk)[1]):
+            gone.append(row.id)
+            continue
+        targets = new_index.get(label(blk), [])
+        nth = occurrence[pos]
+        if nth >= len(targets):
+            gone.append(row.id)
+        elif targets[nth] != pos:
+            gone.append(row.id)
+            moved.append({**{k: v for k, v in row._mapping.items() if k != "id"}, "block_key": f"pos:{targets[nth]}"})
+    # Delete before re-inserting: two blocks that swapped places would collide otherwise.
+    if gone:
+        conn.execute(delete(table).where(table.c.id.in_(gone)))
+    if moved:
+        conn.execute(table.insert(), moved)
+
+@dataclass
+class _ProfileEdit:
+    """A buffered schedule change: `change(prof)` edits the profile in place and returns (body, status)."""
+    change: Callable[[dict], tuple[dict, int]]
+    app: Flask
+
+def _run_profile_edits(user: 'User', edits: list[_ProfileEdit]) -> tuple[dict, list[tuple[dict, int]]]:
+    """
+    Apply `edits` in order to one read of `user`'s profile. An edit that answers with
+    an error status must leave the profile as it found it. One that raises may have
+    changed it halfway, so the profile is read again and the edits before it replayed
+    (their answers are not out yet); copying the profile per edit would cost more than
+    the reads the batch saves.
+    """
+    failed: set[int] = set()
+    while True:
+        prof = _user_profile(user)
+        results = []
+        for idx, edit in enumerate(edits):
+            if idx in failed:
+                results.append(({"error": "Edit failed"}, 500))
+                continue
+            try:
+                results.append(edit.change(prof))
+            except Exception:
+                current_app.logger.exception("Profile edit for user %s failed", user.id)
+                failed.add(idx)
+                break
+        else:
+            return prof, results
+
+def _apply_profile_edits(user_id: int, edits: list[_ProfileEdit]) -> list[tuple[dict, int]]:
+    """One read of the profile, every edit in order, then one write and one commit."""
+    if not has_app_context():
+        with edits[0].app.app_context():
+            return _apply_profile_edits(user_id, edits)
+    background = not has_request_context()
+    # The caller's session may hold this user from before an earlier batch committed.
+    user = db.session.get(User, user_id, populate_existing=True, with_for_update=True)
+    if user is None:
+        return [({"error": "User not found"}, 404)] * len(edits)
+    prof, results = _run_profile_edits(user, edits)
+    applied = sum(status < 400 for _, status in results)
+    if applied:
+        user.profile_data = _dump_profile(prof)
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if METRICS_ENABLED:
+                PROFILE_WRITE_OPS.labels("failed").inc(len(edits))
+            if background:
+                current_app.logger.exception("Queued profile edits for user %s were lost", user_id)
+            raise
+    if METRICS_ENABLED:
+        PROFILE_WRITE_BATCHES.inc()
+        PROFILE_WRITE_BATCH_SIZE.observe(len(edits))
+        PROFILE_WRITE_OPS.labels("applied").inc(applied)
+        PROFILE_WRITE_OPS.labels("rejected").inc(len(edits) - applied)
+    if background:
+        for body, status in results:
+            if status >= 400:
+                current_app.logger.warning("Queued profile edit for user %s rejected (%s): %s", user_id, status, body)
+    return results
+
+PROFILE_WRITES = WriteCoalescer(
+    _apply_profile_edits,
+    window=PROFILE_WRITE_WINDOW_SECONDS,
+    max_batch=PROFILE_WRITE_MAX_BATCH,
+    executor=PROFILE_WRITE_EXECUTOR,
+)
+
+def _submit_profile_edit(schedule_user: 'User', change: Callable[[dict], tuple[dict, int]], *,
+                         wait: bool = False) -> tuple[dict, int]:
+    """
+    Run `change` against `schedule_user`'s profile through the write buffer and return
+    the (body, status) to answer with. `change` runs on whichever thread saves the batch,
+    so it must only touch the profile it is given and values it captured.
+
+    Every rewrite of profile_data goes through here, so edits to one user are saved in
+    order. `wait=True` waits for the result even in async mode; use it when the caller
+    needs the outcome. Anything the caller has pending is committed first: waiting on
+    another thread's batch while holding SQLite's write lock would stall that batch.
+    Changes that span several users go through _profiles_held() instead.
+    """
+    edit = _ProfileEdit(change, current_app._get_current_object())
+    if not PROFILE_WRITE_COALESCE:
+        return _apply_profile_edits(schedule_user.id, [edit])[0]
+    if PROFILE_WRITE_ASYNC and not wait:
+        PROFILE_WRITES.submit(schedule_user.id, edit, wait=False)
+        return {"message": "Queued"}, 202
+    db.session.commit()
+    return PROFILE_WRITES.submit(schedule_user.id, edit)
+
+@contextmanager
+def _profiles_held(users) -> Iterator[None]:
+    """
+    Keep buffered edits for `users` waiting while the block rewrites their profiles
+    directly, so a change spanning several schedules commits (or fails) as one. Enter
+    it before writing anything in this transaction: taking a key can wait on another
+    thread's batch, which needs SQLite's write lock. Commit inside the block.
+    """
+    users = [u for u in users if u is not None and u.id is not None]
+    with PROFILE_WRITES.hold(u.id for u in users):
+        try:
+            # Batches saved before the keys were taken may be newer than this session's copy.
+            for user in users:
+                db.session.refresh(user, ["profile_data"])
+            yield
+        except BaseException:
+            db.session.rollback()
+            raise
+
 def _user_favorites(user: 'User') -> dict:
-    prof = _safe_profile_dict(user.profile_data)
+    prof = _user_profile(user)
     favs = prof.get("favorites") or _default_favorites()
     return {
         "templates": [str(t) for t in favs.get("templates", []) if str(t).strip()],
@@ -235,15 +1039,50 @@ def _user_favorites(user: 'User') -> dict:
     }
 
 def _update_user_favorites(user: 'User', *, templates: list[str] | None = None, routines: list[str] | None = None) -> dict:
-    prof = _safe_profile_dict(user.profile_data)
-    favs = prof.get("favorites") or _default_favorites()
-    if templates is not None:
-        favs["templates"] = [str(t) for t in templates if str(t).strip()]
-    if routines is not None:
-        favs["routines"] = [str(r) for r in routines if str(r).strip()]
-    prof["favorites"] = favs
-    user.profile_data = json.dumps(prof)
-    return favs.copy()
+    def change(prof: dict) -> tuple[dict, int]:
+        favs = prof.get("favorites") or _default_favorites()
+        if templates is not None:
+            favs["templates"] = [str(t) for t in templates if str(t).strip()]
+        if routines is not None:
+            favs["routines"] = [str(r) for r in routines if str(r).strip()]
+        prof["favorites"] = favs
+        return favs.copy(), 200
+
+    body, status = _submit_profile_edit(user, change, wait=True)
+    if status >= 400:
+        raise RuntimeError(body.get("error") or "Edit failed")
+    return body
+
+def _client_ip() -> str:
+    if RATE_LIMIT_TRUST_PROXY and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr or "unknown"
+
+def _rate_limited(name: str, default: str, *, per: str = "ip"):
+    """
+    Token-bucket limit for a route. `per="user"` keys on the JWT identity, so it
+    must sit below @jwt_required(); `per="ip"` keys on the client address.
+    When limits are stacked, each one is charged before the next is checked, so
+    put the tightest outermost.
+    """
+    RATE_LIMITER.rule(name, default)
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if per == "user":
+                key = f"user:{get_jwt_identity() or _client_ip()}"
+            else:
+                key = f"ip:{_client_ip()}"
+            decision = RATE_LIMITER.hit(name, key)
+            if not decision.allowed:
+                retry_after = retry_after_header(decision.retry_after)
+                resp = jsonify({"error": "Too many requests. Please try again later.", "retry_after": int(retry_after)})
+                resp.status_code = 429
+                resp.headers["Retry-After"] = retry_after
+                return resp
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
 
 def _rand_family_id(n: int = 10) -> str:
     alphabet = string.ascii_letters + string.digits
@@ -261,7 +1100,7 @@ def _serialize_template_entry(entry: TaskTemplateEntry, viewer: str, viewer_is_m
     steps: list[str] = []
     if entry.steps_json:
         try:
-            data = json.loads(entry.steps_json)
+            data = codec.loads(entry.steps_json)
             if isinstance(data, list):
                 steps = [str(s) for s in data if str(s).strip()]
         except Exception:
@@ -340,7 +1179,7 @@ def _schedule_owner(user: 'User') -> tuple['User', bool]:
 
 def _routine_tasks_from_json(blob: str) -> list[dict]:
     try:
-        data = json.loads(blob or "[]")
+        data = codec.loads(blob or "[]")
         if isinstance(data, list):
             return [
                 {
@@ -419,10 +1258,11 @@ def _family_parents(family: 'Family') -> list['User']:
     return [m for m in members if m.account_type.lower() == "parent"]
 
 def _clear_user_tasks(user: 'User') -> None:
-    profile = _safe_profile_dict(user.profile_data)
+    """Empty `user`'s schedule; call it under _profiles_held() and commit with the rest."""
+    profile = _user_profile(user)
     if profile.get("schedule_blocks"):
         profile["schedule_blocks"] = []
-        user.profile_data = json.dumps(profile)
+        user.profile_data = _dump_profile(profile)
 
 def _detach_user_from_family(user: 'User') -> None:
     user.family_id = None
@@ -454,7 +1294,8 @@ def _promote_existing_tasks_to_family(family: 'Family') -> None:
     owner = _family_owner(family)
     if not owner:
         return
-    prof = _safe_profile_dict(owner.profile_data)
+
+    prof = _user_profile(owner)
     updated = False
     for block in prof["schedule_blocks"]:
         tag = (block.get("family_tag") or "").strip()
@@ -464,7 +1305,7 @@ def _promote_existing_tasks_to_family(family: 'Family') -> None:
         block["family_tag"] = tag
         updated = True
     if updated:
-        owner.profile_data = json.dumps(prof)
+        owner.profile_data = _dump_profile(prof)
     for child in _family_children(family):
         _sync_family_blocks_to_member(child, family)
 
@@ -472,14 +1313,14 @@ def _sync_family_blocks_to_member(member: 'User', family: 'Family') -> None:
     owner = _family_owner(family)
     if not owner:
         return
-    owner_prof = _safe_profile_dict(owner.profile_data)
+    owner_prof = _user_profile(owner)
     owner_blocks = [
         block for block in owner_prof["schedule_blocks"]
         if (block.get("family_tag") or "").strip()
     ]
     if not owner_blocks:
         return
-    member_prof = _safe_profile_dict(member.profile_data)
+    member_prof = _user_profile(member)
     existing_tags = {
         (block.get("family_tag") or "").strip()
         for block in member_prof["schedule_blocks"]
@@ -494,7 +1335,7 @@ def _sync_family_blocks_to_member(member: 'User', family: 'Family') -> None:
         existing_tags.add(tag)
         changed = True
     if changed:
-        member.profile_data = json.dumps(member_prof)
+        member.profile_data = _dump_profile(member_prof)
 
 def _handle_parent_leave(user: 'User', family: 'Family') -> str:
     was_master = family.creator_username == user.username
@@ -516,22 +1357,22 @@ def _handle_parent_leave(user: 'User', family: 'Family') -> str:
     return message
 
 def _append_block_to_user(user: 'User', block: dict) -> None:
-    prof = _safe_profile_dict(user.profile_data)
+    prof = _user_profile(user)
     prof["schedule_blocks"].append(dict(block))
-    user.profile_data = json.dumps(prof)
+    user.profile_data = _dump_profile(prof)
 
 def _update_block_with_tag(user: 'User', tag: str, new_block: dict) -> bool:
     tag = (tag or "").strip()
     if not tag:
         return False
-    prof = _safe_profile_dict(user.profile_data)
+    prof = _user_profile(user)
     updated = False
     for idx, blk in enumerate(prof["schedule_blocks"]):
         if (blk.get("family_tag") or "").strip() == tag:
             prof["schedule_blocks"][idx] = dict(new_block)
             updated = True
     if updated:
-        user.profile_data = json.dumps(prof)
+        user.profile_data = _dump_profile(prof)
     return updated
 
 def _remove_family_tag_from_user(user: 'User', tag: str, date_str: str | None = None) -> bool:
@@ -539,7 +1380,7 @@ def _remove_family_tag_from_user(user: 'User', tag: str, date_str: str | None =
     if not tag:
         return False
     date_str = _coerce_date(date_str) or _today_iso()
-    prof = _safe_profile_dict(user.profile_data)
+    prof = _user_profile(user)
     blocks = prof["schedule_blocks"]
     new_blocks = [
         b for b in blocks
@@ -551,7 +1392,7 @@ def _remove_family_tag_from_user(user: 'User', tag: str, date_str: str | None =
     if len(new_blocks) == len(blocks):
         return False
     prof["schedule_blocks"] = new_blocks
-    user.profile_data = json.dumps(prof)
+    user.profile_data = _dump_profile(prof)
     return True
 
 def _resolve_schedule_user(user: 'User', target_child: str | None):
@@ -569,20 +1410,28 @@ def _resolve_schedule_user(user: 'User', target_child: str | None):
     owner, _ = _schedule_owner(user)
     return owner
 
-def _verify_google_id_token(id_token: str) -> dict | None:
-    if not id_token:
+def _google_json(step: HttpGet):
+    result = yield step
+    if not result or result[0] != 200 or not isinstance(result[1], dict):
         return None
-    try:
-        resp = requests.get(
-            "https://oauth2.googleapis.com/tokeninfo",
-            params={"id_token": id_token},
-            timeout=8,
-        )
-    except requests.RequestException:
+    return result[1]
+
+def _google_identity(id_token: str, access_token: str):
+    """Outbound-step generator: the verified Google profile for either credential, or None."""
+    info = (yield from _verify_google_id_token(id_token)) if id_token else None
+    if not info and access_token:
+        info = yield from _verify_google_access_token(access_token)
+    return info
+
+def _verify_google_id_token(id_token: str):
+    if not id_token:
         return None
-    if resp.status_code != 200:
+    data = yield from _google_json(HttpGet(
+        "https://oauth2.googleapis.com/tokeninfo",
+        params={"id_token": id_token},
+    ))
+    if not data:
         return None
-    data = resp.json()
     aud = data.get("aud", "")
     if GOOGLE_CLIENT_IDS and aud not in GOOGLE_CLIENT_IDS:
         return None
@@ -590,22 +1439,22 @@ def _verify_google_id_token(id_token: str) -> dict | None:
         return None
     return data
 
-def _verify_google_access_token(access_token: str) -> dict | None:
-    info = _fetch_google_token_info(access_token)
+def _verify_google_access_token(access_token: str):
+    info = yield from _fetch_google_token_info(access_token)
     if not info:
         return None
     aud = info.get("aud", "")
     if GOOGLE_CLIENT_IDS and aud not in GOOGLE_CLIENT_IDS:
         return None
     if info.get("email_verified") not in ("true", True, 1, "1"):
-        profile = _fetch_google_userinfo(access_token)
+        profile = yield from _fetch_google_userinfo(access_token)
     else:
         profile = info
     if not profile:
         return None
     email = (profile.get("email") or "").strip().lower()
     if not email:
-        fallback = _fetch_google_userinfo(access_token)
+        fallback = yield from _fetch_google_userinfo(access_token)
         if fallback:
             email = (fallback.get("email") or "").strip().lower()
             profile.update(fallback)
@@ -614,41 +1463,21 @@ def _verify_google_access_token(access_token: str) -> dict | None:
     profile["email"] = email
     return profile
 
-def _fetch_google_token_info(access_token: str) -> dict | None:
+def _fetch_google_token_info(access_token: str):
     if not access_token:
         return None
-    try:
-        resp = requests.get(
-            "https://oauth2.googleapis.com/tokeninfo",
-            params={"access_token": access_token},
-            timeout=8,
-        )
-    except requests.RequestException:
-        return None
-    if resp.status_code != 200:
-        return None
-    try:
-        return resp.json()
-    except ValueError:
-        return None
+    return (yield from _google_json(HttpGet(
+        "https://oauth2.googleapis.com/tokeninfo",
+        params={"access_token": access_token},
+    )))
 
-def _fetch_google_userinfo(access_token: str) -> dict | None:
+def _fetch_google_userinfo(access_token: str):
     if not access_token:
         return None
-    try:
-        resp = requests.get(
-            "https://www.googleapis.com/oauth2/v3/userinfo",
-            headers={"Authorization": f"Bearer {access_token}"},
-            timeout=8,
-        )
-    except requests.RequestException:
-        return None
-    if resp.status_code != 200:
-        return None
-    try:
-        return resp.json()
-    except ValueError:
-        return None
+    return (yield from _google_json(HttpGet(
+        "https://www.googleapis.com/oauth2/v3/userinfo",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )))
 
 def _clean_display_name(*candidates: str) -> str:
     for raw in candidates:
@@ -674,6 +1503,42 @@ def _unique_username(base: str, *, exclude_user: 'User | None' = None) -> str:
         candidate = f"{base} {counter}"
         counter += 1
 
+# Keys of a stored schedule block, as written by _norm_block().
+BLOCK_FIELDS = ("title", "startTime", "endTime", "period", "steps", "hidden", "completed", "family_tag", "date")
+PROFILE_SECTIONS = ("schedule_blocks", "preferences", "favorites")
+
+def _profile_projection(fields: str | None, view: str | None) -> tuple[set[str] | None, list[str] | None, bool]:
+    """
+    (sections, block fields, list mode) for GET /profile, where None means everything.
+    `fields` mixes section names and block field names; a block field implies schedule_blocks.
+    """
+    view = (view or "full").strip().lower()
+    if view not in ("full", "list"):
+        raise ValueError("view must be 'full' or 'list'")
+    list_mode = view == "list"
+    if not fields:
+        if list_mode:
+            return {"schedule_blocks"}, list(BLOCK_FIELDS), True
+        return None, None, False
+    sections: set[str] = set()
+    block_fields: list[str] = []
+    for name in (part.strip() for part in fields.split(",")):
+        if not name:
+            continue
+        if name in PROFILE_SECTIONS:
+            sections.add(name)
+        elif name in BLOCK_FIELDS:
+            sections.add("schedule_blocks")
+            if name not in block_fields:
+                block_fields.append(name)
+        else:
+            raise ValueError(f"Unknown field '{name}'; expected any of {', '.join(PROFILE_SECTIONS + BLOCK_FIELDS)}")
+    if list_mode:
+        sections.add("schedule_blocks")
+    if list_mode and not block_fields:
+        block_fields = list(BLOCK_FIELDS)
+    return sections, block_fields or None, list_mode
+
 def _norm_block(b: dict | None) -> dict:
     """Normalize a block dict so matching is tolerant of missing keys/whitespace/case."""
     b = b or {}
@@ -699,6 +1564,7 @@ def _norm_block(b: dict | None) -> dict:
         "date": date_val,
     }
 
+@TRACER.traced("blocks.first_match")
 def _first_match_index(blocks: list, cand: dict) -> int:
     """Find index of matching block with several fallbacks."""
     C = _norm_block(cand)
@@ -727,49 +1593,11 @@ def _first_match_index(blocks: list, cand: dict) -> int:
             return i
     return -1
 
-_AI_KEYWORD_STEPS = {
-    "homework": [
-        "Gather notebooks and assignment list",
-        "Work through each subject with focus blocks",
-        "Review answers and pack everything away",
-    ],
-    "exercise": [
-        "Warm up and stretch",
-        "Complete the main workout",
-        "Cool down and hydrate",
-    ],
-    "chores": [
-        "Collect supplies for the chore",
-        "Work through each area methodically",
-        "Tidy up and put supplies back",
-    ],
-    "breakfast": [
-        "Set the table and gather ingredients",
-        "Prepare and eat breakfast",
-        "Clear dishes and wipe counters",
-    ],
-    "dinner": [
-        "Prep ingredients and cookware",
-        "Cook and plate the meal",
-        "Clean the kitchen and store leftovers",
-    ],
-    "study": [
-        "Review class notes or slides",
-        "Work through practice problems",
-        "Summarize what was learned",
-    ],
-}
-
-_TIME_RE = re.compile(
-    r'(?P<hour>1[0-2]|0?[1-9])(?::(?P<minute>[0-5][0-9]))?\s*(?P<period>a\.?m\.?|p\.?m\.?|am|pm)',
-    re.IGNORECASE,
-)
-
 def _split_time_and_period(value: str | None) -> tuple[str | None, str | None]:
     text = (value or "").strip()
     if not text:
         return None, None
-    match = _TIME_RE.search(text)
+    match = TIME_RE.search(text)
     if not match:
         return None, None
     hour = int(match.group('hour'))
@@ -801,14 +1629,6 @@ def _extract_text_from_gemini(payload: dict) -> str:
                 return text.strip()
     raise RuntimeError("Gemini response did not contain text content.")
 
-def _strip_code_fence(text: str) -> str:
-    trimmed = text.strip()
-    if trimmed.startswith("```"):
-        trimmed = re.sub(r"^```(?:json)?", "", trimmed, flags=re.IGNORECASE)
-        if trimmed.endswith("```"):
-            trimmed = trimmed[:-3]
-    return trimmed.strip()
-
 def _sanitize_model_tasks(raw) -> list[dict]:
     items = []
     if isinstance(raw, dict):
@@ -865,169 +1685,314 @@ def _sanitize_model_tasks(raw) -> list[dict]:
         })
     return tasks
 
-def _call_groq_for_tasks(prompt: str) -> list[dict]:
-    if not GROQ_API_KEY:
-        raise RuntimeError("GROQ_API_KEY is not set on the Flask server.")
-
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    body = {
-        "model": GROQ_MODEL,
-        "messages": [
-            {"role": "system", "content": _AI_SYSTEM_INSTRUCTION},
-            {"role": "user", "content": prompt},
-        ],
-        "temperature": 0.4,
-        "max_tokens": 800,
-    }
-
-    response = requests.post(
-        url,
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-        },
-        json=body,
-        timeout=30,
-    )
-    if response.status_code != 200:
-        try:
-            detail = response.json()
-        except Exception:
-            detail = response.text
-        raise RuntimeError(f"Groq HTTP {response.status_code}: {detail}")
-
-    payload = response.json()
-    choices = payload.get("choices") or []
-    if not choices:
-        raise RuntimeError("Groq response contained no choices.")
-    content = choices[0].get("message", {}).get("content", "")
-    if not isinstance(content, str) or not content.strip():
-        raise RuntimeError("Groq response did not contain message content.")
-
-    text = _strip_code_fence(content)
-    try:
-        parsed = json.loads(text)
-    except json.JSONDecodeError as exc:
-        raise RuntimeError(f"Groq returned invalid JSON: {exc}") from exc
+def _normalize_prompt(prompt: str) -> str:
+    text = unicodedata.normalize("NFKC", prompt or "").casefold()
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" .!?,;:")
 
-    tasks = _sanitize_model_tasks(parsed)
-    if not tasks:
-        raise RuntimeError("Groq response did not contain any tasks.")
-    return tasks
+def _ai_cache_key(prompt: str) -> tuple[str, str, str]:
+    """Keyed on the chain's primary provider and model, so changing either starts a fresh cache."""
+    primary = _ai_providers().primary
+    if primary is None:
+        return "", "", _normalize_prompt(prompt)
+    return primary.name, primary.model, _normalize_prompt(prompt)
 
-def _ai_chunks(prompt: str) -> list[str]:
-    cleaned = prompt.replace(' - ', '. ')
-    raw_parts = re.split(r'[.\n;]+', cleaned)
-    parts: list[str] = []
-    for fragment in raw_parts:
-        fragment = fragment.strip(' ,')
-        if fragment:
-            parts.append(fragment)
-    return parts
-
-def _starting_clock(prompt: str) -> tuple[int, int]:
-    lower = prompt.lower()
-    if "evening" in lower or "night" in lower:
-        return 18, 0
-    if "afternoon" in lower or "after school" in lower:
-        return 13, 0
-    if "morning" in lower or "before school" in lower or "wake" in lower:
-        return 7, 0
-    return 8, 0
-
-def _format_time(hour24: int, minute: int) -> tuple[str, str]:
-    period = 'PM' if hour24 >= 12 else 'AM'
-    hour12 = hour24 % 12
-    if hour12 == 0:
-        hour12 = 12
-    return f"{hour12}:{minute:02d}", period
+def _ai_cacheable(source: str) -> bool:
+    """
+    Only the primary provider's answers are cached. A fallback answer (local model,
+    heuristic planner) would otherwise be served for the full TTL after the primary recovers.
+    """
+    primary = _ai_providers().primary
+    return primary is not None and source == primary.name
 
-def _advance_clock(hour24: int, minute: int, delta_minutes: int) -> tuple[int, int]:
-    total = hour24 * 60 + minute + delta_minutes
-    total %= (24 * 60)
-    return total // 60, total % 60
+def _copy_tasks(tasks: list[dict]) -> list[dict]:
+    return [dict(task, steps=list(task.get("steps") or [])) for task in tasks]
 
-def _extract_time_from_chunk(chunk: str) -> tuple[int | None, int | None, str]:
-    match = _TIME_RE.search(chunk)
-    if not match:
-        return None, None, chunk
-    hour = int(match.group('hour'))
-    minute = int(match.group('minute') or 0)
-    period = match.group('period').lower()
-    if period.startswith('p') and hour != 12:
-        hour += 12
-    if period.startswith('a') and hour == 12:
-        hour = 0
-    cleaned = _TIME_RE.sub('', chunk)
-    cleaned = re.sub(r'\bat\b', '', cleaned, flags=re.IGNORECASE)
-    cleaned = re.sub(r'\s+', ' ', cleaned).strip(' ,')
-    return hour, minute, cleaned if cleaned else chunk
-
-def _title_from_chunk(chunk: str, index: int) -> str:
-    cleaned = re.sub(r'[^A-Za-z0-9 &/:-]', '', chunk).strip()
-    if not cleaned:
-        cleaned = f"Task {index + 1}"
-    return cleaned[:60].strip().title()
-
-def _steps_from_chunk(chunk: str, title: str) -> list[str]:
-    lower = chunk.lower()
-    for keyword, steps in _AI_KEYWORD_STEPS.items():
-        if keyword in lower:
-            return steps
-    topic = title.lower()
+def _blocks_on_date(user: 'User', date_str: str) -> list[dict]:
     return [
-        f"Plan what is needed for {topic}",
-        f"Work through the main part of {topic}",
-        f"Review progress and clean up after {topic}",
+        blk
+        for blk in _user_profile(user)["schedule_blocks"]
+        if (blk.get("date") or _today_iso()) == date_str
     ]
 
-def _ai_generate_tasks(prompt: str) -> list[dict]:
-    if GROQ_API_KEY:
+def _ai_generate_tasks(prompt: str, existing_blocks: list[dict] | None = None) -> tuple[list[dict], str]:
+    """
+    Return (tasks, source), where source is "cache" or the name of the provider that
+    answered. `existing_blocks` (the target day's schedule) only affects the heuristic planner.
+    """
+    key = _ai_cache_key(prompt)
+    cached = AI_TASK_CACHE.get(key)
+    if cached is not None:
+        return _copy_tasks(cached), "cache"
+
+    def generate() -> tuple[list[dict], str]:
+        # A flight that finished just before we joined may already have filled the cache.
+        fresh = AI_TASK_CACHE.peek(key)
+        if fresh is not None:
+            return fresh, "cache"
+        tasks, source = _ai_providers().generate(prompt, existing_blocks=existing_blocks)
+        if _ai_cacheable(source):
+            AI_TASK_CACHE.set(key, _copy_tasks(tasks))
+        return tasks, source
+
+    try:
+        (tasks, source), shared = AI_SINGLE_FLIGHT.do(key, generate, timeout=AI_COALESCE_WAIT_SECONDS)
+        if shared and source == "heuristic":
+            # The leader planned around its own schedule; plan around ours instead.
+            return _fallback_generate_tasks(prompt, existing_blocks), source
+        return _copy_tasks(tasks), source
+    except Exception as exc:
+        current_app.logger.warning("AI generation failed, using heuristic fallback: %s", exc)
+    return _fallback_generate_tasks(prompt, existing_blocks), "heuristic"
+
+async def _ai_generate_tasks_async(prompt: str, existing_blocks: list[dict] | None = None, *,
+                                   client=None) -> tuple[list[dict], str]:
+    """_ai_generate_tasks() for asgi.py: the providers are awaited through `client` (httpx)."""
+    key = _ai_cache_key(prompt)
+    cached = AI_TASK_CACHE.get(key)
+    if cached is not None:
+        return _copy_tasks(cached), "cache"
+
+    async def generate() -> tuple[list[dict], str]:
+        fresh = AI_TASK_CACHE.peek(key)
+        if fresh is not None:
+            return fresh, "cache"
+        tasks, source = await _ai_providers().agenerate(prompt, client=client, existing_blocks=existing_blocks)
+        if _ai_cacheable(source):
+            AI_TASK_CACHE.set(key, _copy_tasks(tasks))
+        return tasks, source
+
+    try:
+        (tasks, source), shared = await AI_ASYNC_SINGLE_FLIGHT.do(key, generate, timeout=AI_COALESCE_WAIT_SECONDS)
+        if shared and source == "heuristic":
+            return _fallback_generate_tasks(prompt, existing_blocks), source
+        return _copy_tasks(tasks), source
+    except Exception as exc:
+        current_app.logger.warning("AI generation failed, using heuristic fallback: %s", exc)
+    return _fallback_generate_tasks(prompt, existing_blocks), "heuristic"
+
+def _ai_task_events(prompt: str, existing_blocks: list[dict] | None = None) -> Iterator[str]:
+    """Server-sent events for /ai/tasks/stream: one `task` event per task, then `done`."""
+    key = _ai_cache_key(prompt)
+    cached = AI_TASK_CACHE.get(key)
+    if cached is not None:
+        for task in _copy_tasks(cached):
+            yield sse_event("task", task)
+        yield sse_event("done", {"count": len(cached), "source": "cache"})
+        return
+
+    sent: list[dict] = []
+    source = "heuristic"
+    try:
+        for task, source in _ai_providers().stream(prompt, existing_blocks=existing_blocks):
+            sent.append(task)
+            yield sse_event("task", task)
+    except Exception as exc:
+        current_app.logger.warning("AI streaming failed: %s", exc)
+        if sent:
+            yield sse_event("error", {"error": "AI generation was interrupted."})
+            yield sse_event("done", {"count": len(sent), "source": source, "partial": True})
+            return
+    if sent:
+        if _ai_cacheable(source):
+            AI_TASK_CACHE.set(key, _copy_tasks(sent))
+        yield sse_event("done", {"count": len(sent), "source": source})
+        return
+
+    tasks = _fallback_generate_tasks(prompt, existing_blocks)
+    for task in tasks:
+        yield sse_event("task", task)
+    yield sse_event("done", {"count": len(tasks), "source": "heuristic"})
+
+def _prepare_ai_batch(user: 'User', raw_items: list, *, deploy: bool) -> list[dict]:
+    """Validate batch items up front so bad ones fail individually instead of failing the batch."""
+    items: list[dict] = []
+    day_blocks: dict[tuple[int, str], list[dict]] = {}
+    for idx, raw in enumerate(raw_items):
+        raw = raw if isinstance(raw, dict) else {}
+        child = (raw.get("child") or raw.get("target_child") or "").strip() or None
+        item = {
+            "index": idx,
+            "id": raw.get("id"),
+            "prompt": (raw.get("prompt") or "").strip(),
+            "child": child,
+            "date": _today_iso(),
+            "tasks": [],
+            "source": None,
+            "error": None,
+        }
+        items.append(item)
+        if not item["prompt"]:
+            item["error"] = "Prompt is required."
+            continue
+        if raw.get("date"):
+            date_str = _coerce_date(str(raw.get("date")))
+            if not date_str:
+                item["error"] = "Date must be formatted as YYYY-MM-DD."
+                continue
+            item["date"] = date_str
         try:
-            return _call_groq_for_tasks(prompt)
-        except Exception as exc:
-            app.logger.warning("Groq generation failed, using heuristic fallback: %s", exc)
-    else:
-        app.logger.warning("GROQ_API_KEY missing; using heuristic fallback.")
+            if deploy:
+                _require_not_past(item["date"])
+            target = _resolve_schedule_user(user, child)
+        except ValueError as exc:
+            item["error"] = str(exc)
+            continue
+        item["_target"] = target
+        blocks_key = (target.id, item["date"])
+        if blocks_key not in day_blocks:
+            day_blocks[blocks_key] = _blocks_on_date(target, item["date"])
+        item["_blocks"] = day_blocks[blocks_key]
+    return items
+
+def _run_ai_batch(items: list[dict]) -> Iterator[dict]:
+    """Generate each distinct prompt once, with bounded concurrency; yield items as they finish."""
+    groups: dict[tuple[str, str], list[dict]] = {}
+    for item in items:
+        if item["error"]:
+            yield item
+        else:
+            groups.setdefault(_ai_cache_key(item["prompt"]), []).append(item)
 
-    return _fallback_generate_tasks(prompt)
+    futures = {
+        AI_BATCH_EXECUTOR.submit(
+            contextvars.copy_context().run, _ai_generate_tasks, group[0]["prompt"], group[0]["_blocks"],
+        ): group
+        for group in groups.values()
+    }
+    for future in as_completed(futures):
+        group = futures[future]
+        try:
+            tasks, source = future.result()
+        except Exception as exc:
+            current_app.logger.warning("Batch AI generation failed: %s", exc)
+            tasks, source = [], None
+        for position, item in enumerate(group):
+            if tasks and position and source == "heuristic":
+                item["tasks"] = _fallback_generate_tasks(item["prompt"], item["_blocks"])
+                item["source"] = source
+                item["deduplicated"] = True
+            elif tasks:
+                item["tasks"] = _copy_tasks(tasks)
+                item["source"] = source
+                item["deduplicated"] = position > 0
+            else:
+                item["error"] = "AI generation failed."
+            yield item
+
+def _deploy_ai_batch(items: list[dict]) -> int:
+    """Append every generated task to its target schedule and commit once for the whole batch."""
+    targets = {
+        item["_target"].id: item["_target"]
+        for item in items
+        if not item["error"] and item["tasks"] and item.get("_target") is not None
+    }
+    profiles: dict[int, dict] = {}
+    deployed = 0
+    with _profiles_held(targets.values()):
+        try:
+            for item in items:
+                target = item.get("_target")
+                if item["error"] or not item["tasks"] or target is None:
+                    continue
+                if target.id not in profiles:
+                    profiles[target.id] = _user_profile(target)
+                prof = profiles[target.id]
+                for task in item["tasks"]:
+                    block = _norm_block(task)
+                    block["date"] = item["date"]
+                    prof["schedule_blocks"].append(block)
+                    deployed += 1
+                item["deployed"] = True
+            for target_id, prof in profiles.items():
+                targets[target_id].profile_data = _dump_profile(prof)
+            db.session.commit()
+        except Exception:
+            for item in items:
+                item.pop("deployed", None)
+            raise
+    return deployed
 
-def _fallback_generate_tasks(prompt: str) -> list[dict]:
-    parts = _ai_chunks(prompt)
-    if not parts:
-        parts = ["Plan the day", "Focus block", "Wrap up and reflect"]
+def _public_batch_item(item: dict) -> dict:
+    return {k: v for k, v in item.items() if not k.startswith("_")}
 
-    max_items = min(len(parts), 8)
-    hour, minute = _starting_clock(prompt)
-    tasks: list[dict] = []
+def _fallback_generate_tasks(prompt: str, existing_blocks: list[dict] | None = None) -> list[dict]:
+    """Rule-based tasks placed into the free time around `existing_blocks` (see planner.py)."""
+    return plan_tasks(prompt, existing_blocks)
 
-    for idx, raw_chunk in enumerate(parts[:max_items]):
-        custom_hour, custom_minute, cleaned_chunk = _extract_time_from_chunk(raw_chunk)
-        if custom_hour is not None:
-            hour, minute = custom_hour, custom_minute
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
 
-        title = _title_from_chunk(cleaned_chunk, idx)
-        steps = _steps_from_chunk(cleaned_chunk, title)
-        start_str, period = _format_time(hour, minute)
-        end_hour, end_minute = _advance_clock(hour, minute, 45)
-        end_str, _ = _format_time(end_hour, end_minute)
+def _build_ai_providers() -> ProviderChain:
+    """
+    AI_PROVIDERS lists providers in priority order (default "groq,local,heuristic").
+    Remote providers that are not configured are skipped.
+    """
+    def breaker() -> CircuitBreaker:
+        return CircuitBreaker(
+            failure_threshold=int(_env_float("AI_BREAKER_FAILURES", 5)),
+            reset_timeout=_env_float("AI_BREAKER_RESET_SECONDS", 30),
+        )
 
-        tasks.append({
-            "title": title,
-            "steps": steps,
-            "startTime": start_str,
-            "endTime": end_str,
-            "period": period,
-            "hidden": False,
-            "completed": False,
-        })
+    providers: list[Provider] = []
+    order = os.environ.get("AI_PROVIDERS", "groq,local,heuristic")
+    for name in (n.strip().lower() for n in order.split(",") if n.strip()):
+        if name == "groq" and GROQ_API_KEY:
+            providers.append(OpenAICompatibleProvider(
+                "groq",
+                url=GROQ_API_URL,
+                model=GROQ_MODEL,
+                api_key=GROQ_API_KEY,
+                system_instruction=_AI_SYSTEM_INSTRUCTION,
+                sanitize=_sanitize_model_tasks,
+                deadline=_env_float("AI_GROQ_DEADLINE_SECONDS", 15),
+                breaker=breaker(),
+                http_hooks=HTTP_HOOKS,
+                inject_headers=TRACER.inject if TRACER.enabled else None,
+            ))
+        elif name == "local" and LOCAL_LLM_URL:
+            providers.append(OpenAICompatibleProvider(
+                "local",
+                url=LOCAL_LLM_URL,
+                model=LOCAL_LLM_MODEL,
+                api_key=os.environ.get("LOCAL_LLM_API_KEY") or None,
+                system_instruction=_AI_SYSTEM_INSTRUCTION,
+                sanitize=_sanitize_model_tasks,
+                deadline=_env_float("AI_LOCAL_DEADLINE_SECONDS", 20),
+                breaker=breaker(),
+                http_hooks=HTTP_HOOKS,
+                inject_headers=TRACER.inject if TRACER.enabled else None,
+            ))
+        elif name == "heuristic":
+            providers.append(HeuristicProvider(_fallback_generate_tasks))
+    return ProviderChain(
+        providers,
+        hedge=os.environ.get("AI_HEDGE_ENABLED", "").strip().lower() in ("1", "true", "yes"),
+        hedge_percentile=_env_float("AI_HEDGE_PERCENTILE", 0.95),
+        hedge_min_delay=_env_float("AI_HEDGE_MIN_DELAY_SECONDS", 0.5),
+        hedge_default_delay=_env_float("AI_HEDGE_DEFAULT_DELAY_SECONDS", 3),
+        total_deadline=_env_float("AI_TOTAL_DEADLINE_SECONDS", 20),
+        max_workers=int(_env_float("AI_MAX_CONCURRENCY", 16)),
+    )
 
-        hour, minute = end_hour, end_minute
+_AI_PROVIDERS: ProviderChain | None = None
+_AI_PROVIDERS_LOCK = threading.Lock()
 
-    return tasks
+def _ai_providers() -> ProviderChain:
+    """The provider chain, built on first use (or by warmup()) rather than at import."""
+    global _AI_PROVIDERS
+    if _AI_PROVIDERS is None:
+        with _AI_PROVIDERS_LOCK:
+            if _AI_PROVIDERS is None:
+                _AI_PROVIDERS = _build_ai_providers()
+    return _AI_PROVIDERS
 
 # -------------------- Auth --------------------
-@app.route("/register", methods=["POST"])
+@api.route("/register", methods=["POST"])
+@_rate_limited("register", "5/minute")
 def register():
     data = request.get_json(silent=True) or {}
     username = (data.get("username") or "").strip()
@@ -1047,8 +2012,8 @@ def register():
     if User.query.filter_by(username=username).first():
         return jsonify({"error": "Username already exists"}), 400
 
-    hashed_pw = generate_password_hash(password)
-    default_profile_data = json.dumps({"schedule_blocks": [], "preferences": _default_preferences()})
+    hashed_pw = _hash_password(password)
+    default_profile_data = _dump_profile({"schedule_blocks": [], "preferences": _default_preferences()})
     new_user = User(
         username=username,
         display_name=display_name,
@@ -1066,14 +2031,15 @@ def register():
         "role": account_type
     }), 200
 
-@app.route("/login", methods=["POST"])
+@api.route("/login", methods=["POST"])
+@_rate_limited("login", "10/minute")
 def login():
     data = request.get_json(silent=True) or {}
     username = (data.get("username") or "").strip()
     password = data.get("password") or ""
 
     user = User.query.filter_by(username=username).first()
-    if not user or not check_password_hash(user.password, password):
+    if not user or not _password_matches(user.password, password):
         return jsonify({"error": "Invalid username or password"}), 401
 
     token = create_access_token(identity=user.username)
@@ -1085,7 +2051,9 @@ def login():
         "role": user.account_type
     }), 200
 
-@app.route("/login/google", methods=["POST"])
+@api.route("/login/google", methods=["POST"])
+@_rate_limited("login_google", "20/minute")
+@_outbound_view
 def login_google():
     data = request.get_json(silent=True) or {}
     id_token = (data.get("id_token") or "").strip()
@@ -1099,9 +2067,7 @@ def login_google():
     if not id_token and not access_token:
         return jsonify({"error": "id_token or access_token required"}), 400
 
-    info = _verify_google_id_token(id_token) if id_token else None
-    if not info and access_token:
-        info = _verify_google_access_token(access_token)
+    info = yield from _google_identity(id_token, access_token)
     if not info:
         return jsonify({"error": "Invalid Google token"}), 401
 
@@ -1130,13 +2096,13 @@ def login_google():
         }), 412
 
     if not user:
-        default_profile_data = json.dumps({"schedule_blocks": [], "preferences": _default_preferences()})
+        default_profile_data = _dump_profile({"schedule_blocks": [], "preferences": _default_preferences()})
         username = _unique_username(display_name or email)
         user = User(
             username=username,
             email=email,
             display_name=display_name or username,
-            password=generate_password_hash(secrets.token_urlsafe(16)),
+            password=_hash_password(secrets.token_urlsafe(16)),
             auth_provider="google",
             account_type=preferred_role or "parent",
             profile_data=default_profile_data,
@@ -1167,8 +2133,9 @@ def login_google():
     }), 200
 
 # -------------------- Profile / Me --------------------
-@app.route("/profile", methods=["GET"])
+@api.route("/profile", methods=["GET"])
 @jwt_required()
+@_rate_limited("profile", "120/minute;burst=30", per="user")
 def profile_get():
     current_user = get_jwt_identity()
     user = User.query.filter_by(username=current_user).first()
@@ -1179,21 +2146,64 @@ def profile_get():
     if not requested_date:
         requested_date = _today_iso()
     try:
+        sections, block_fields, list_mode = _profile_projection(request.args.get("fields"), request.args.get("view"))
         schedule_user = _resolve_schedule_user(user, target_child)
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
-    profile = _safe_profile_dict(schedule_user.profile_data)
-    blocks = [
-        blk
-        for blk in profile["schedule_blocks"]
-        if (blk.get("date") or _today_iso()) == requested_date
-    ]
+    counts = None
+    if list_mode and "steps" in block_fields:
+        # Steps come from GET /profile/block/<index>; the list only counts them, and the
+        # decoder counts them without putting them in the blocks.
+        block_fields = [f for f in block_fields if f != "steps"]
+        counts = {"steps": "step_count"}
+    profile = _user_profile(schedule_user, block_fields, date=requested_date, counts=counts)
+    kept = None if block_fields is None else [*block_fields, *(counts or {}).values()]
+    blocks = []
+    for index, blk in enumerate(profile["schedule_blocks"]):
+        if (blk.get("date") or _today_iso()) != requested_date:
+            continue
+        if kept is None and not list_mode:
+            blocks.append(blk)
+            continue
+        out = blk if kept is None else {k: blk[k] for k in kept if k in blk}
+        out["index"] = index
+        blocks.append(out)
     profile["schedule_blocks"] = blocks
+    if sections is not None:
+        profile = {k: v for k, v in profile.items() if k in sections}
     profile["selected_date"] = requested_date
     return jsonify(profile), 200
 
+@api.route("/profile/block/<int:index>", methods=["GET"])
+@jwt_required()
+@_rate_limited("profile_block", "240/minute;burst=60", per="user")
+def profile_block_get(index: int):
+    """
+    One block with all of its fields, for clients reading /profile?view=list. `index` is
+    the one the list returned; pass its `date` (and `title`) to get a 409 instead of a
+    different block when the schedule changed in between.
+    """
+    user = User.query.filter_by(username=get_jwt_identity()).first()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    try:
+        schedule_user = _resolve_schedule_user(user, request.args.get("target_child"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    blocks = _user_profile(schedule_user)["schedule_blocks"]
+    if index >= len(blocks):
+        return jsonify({"error": "Block not found"}), 404
+    block = blocks[index]
+    expected_date = _coerce_date(request.args.get("date"))
+    expected_title = request.args.get("title")
+    if (expected_date and block.get("date") != expected_date) or (
+        expected_title is not None and (block.get("title") or "").strip() != expected_title.strip()
+    ):
+        return jsonify({"error": "Schedule changed; reload the list"}), 409
+    return jsonify({"block": block, "index": index}), 200
+
 # get the profile of the head of the family (used for saving blocks from the parent to the child account)
-@app.route("/profile/family", methods=["GET"])
+@api.route("/profile/family", methods=["GET"])
 @jwt_required()
 def family_get():
     current_user = get_jwt_identity()
@@ -1202,14 +2212,14 @@ def family_get():
         return jsonify({"error": "User not found"}), 404
     family = Family.query.filter_by(family_id=user.family_id).first()
     if not family:
-        return jsonify(_safe_profile_dict(user.profile_data)), 200 # if no family, load user who queried as a failsafe
+        return jsonify(_user_profile(user)), 200 # if no family, load user who queried as a failsafe
     family_head = User.query.filter_by(username=family.creator_username).first()
     if not family_head:
         return jsonify({"error": "Family head not found"}), 404
-    return jsonify(_safe_profile_dict(family_head.profile_data)), 200
+    return jsonify(_user_profile(family_head)), 200
     
 
-@app.route("/me", methods=["GET"])
+@api.route("/me", methods=["GET"])
 @jwt_required()
 def me():
     user = _current_user_from_token()
@@ -1239,10 +2249,11 @@ def me():
 
 # -------------------- Account Management --------------------
 def _require_password(user: 'User', supplied: str) -> bool:
-    return bool(supplied and check_password_hash(user.password, supplied))
+    return bool(supplied and _password_matches(user.password, supplied))
 
-@app.route("/account/credentials", methods=["POST"])
+@api.route("/account/credentials", methods=["POST"])
 @jwt_required()
+@_rate_limited("account_credentials", "10/minute", per="user")
 def account_update_credentials():
     user = _current_user_from_token()
     if not user:
@@ -1293,7 +2304,7 @@ def account_update_credentials():
             return jsonify({"error": "Passwords do not match."}), 400
         if not (8 <= len(new_password) <= 20):
             return jsonify({"error": "Password must be 8–20 characters."}), 400
-        user.password = generate_password_hash(new_password)
+        user.password = _hash_password(new_password)
         changes.append("password")
 
     if not changes:
@@ -1309,8 +2320,9 @@ def account_update_credentials():
         "display_name": user.display_name,
     }), 200
 
-@app.route("/account/google/switch", methods=["POST"])
+@api.route("/account/google/switch", methods=["POST"])
 @jwt_required()
+@_outbound_view
 def account_switch_google():
     user = _current_user_from_token()
     if not user:
@@ -1323,9 +2335,7 @@ def account_switch_google():
     if not id_token and not access_token:
         return jsonify({"error": "Google credential is required."}), 400
 
-    info = _verify_google_id_token(id_token) if id_token else None
-    if not info and access_token:
-        info = _verify_google_access_token(access_token)
+    info = yield from _google_identity(id_token, access_token)
     if not info:
         return jsonify({"error": "Invalid Google credential."}), 400
 
@@ -1351,7 +2361,7 @@ def account_switch_google():
         "token": new_token,
     }), 200
 
-@app.route("/account/google/unlink", methods=["POST"])
+@api.route("/account/google/unlink", methods=["POST"])
 @jwt_required()
 def account_unlink_google():
     user = _current_user_from_token()
@@ -1380,7 +2390,7 @@ def account_unlink_google():
 
     user.display_name = display_name
     user.username = username
-    user.password = generate_password_hash(password)
+    user.password = _hash_password(password)
     user.auth_provider = "password"
 
     db.session.commit()
@@ -1393,7 +2403,7 @@ def account_unlink_google():
     }), 200
 
 # -------------------- Schedule Blocks --------------------
-@app.route("/profile/block/add", methods=["POST"])
+@api.route("/profile/block/add", methods=["POST"])
 @jwt_required()
 def block_add():
     current_user = get_jwt_identity()
@@ -1428,10 +2438,11 @@ def block_add():
         normalized["family_tag"] = family_tag
         normalized["date"] = desired_date
         owner, _ = _schedule_owner(user)
-        _append_block_to_user(owner, normalized)
-        for child in children:
-            _append_block_to_user(child, normalized)
-        db.session.commit()
+        with _profiles_held([owner, *children]):
+            _append_block_to_user(owner, normalized)
+            for child in children:
+                _append_block_to_user(child, normalized)
+            db.session.commit()
         return jsonify({"message": "Family task added", "family_tag": family_tag}), 200
 
     try:
@@ -1439,15 +2450,17 @@ def block_add():
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
 
-    prof = _safe_profile_dict(schedule_user.profile_data)
     norm = _norm_block(block_payload)
     norm["date"] = desired_date
-    prof["schedule_blocks"].append(norm)
-    schedule_user.profile_data = json.dumps(prof)
-    db.session.commit()
-    return jsonify({"message": "Block add successful"}), 200
 
-@app.route("/profile/block/edit", methods=["POST"])
+    def change(prof: dict) -> tuple[dict, int]:
+        prof["schedule_blocks"].append(dict(norm))
+        return {"message": "Block add successful"}, 200
+
+    body, status = _submit_profile_edit(schedule_user, change)
+    return jsonify(body), status
+
+@api.route("/profile/block/edit", methods=["POST"])
 @jwt_required()
 def block_edit():
     current_user = get_jwt_identity()
@@ -1483,12 +2496,14 @@ def block_edit():
         normalized["family_tag"] = tag
         normalized["date"] = new_date
         owner, _ = _schedule_owner(user)
-        changed = _update_block_with_tag(owner, tag, normalized)
-        for child in _family_children(family):
-            changed = _update_block_with_tag(child, tag, normalized) or changed
-        if not changed:
-            return jsonify({"error": "Family task not found"}), 404
-        db.session.commit()
+        children = _family_children(family)
+        with _profiles_held([owner, *children]):
+            changed = _update_block_with_tag(owner, tag, normalized)
+            for child in children:
+                changed = _update_block_with_tag(child, tag, normalized) or changed
+            if not changed:
+                return jsonify({"error": "Family task not found"}), 404
+            db.session.commit()
         return jsonify({"message": "Family block edit successful"}), 200
 
     try:
@@ -1496,21 +2511,22 @@ def block_edit():
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
 
-    prof = _safe_profile_dict(schedule_user.profile_data)
     old_block = dict(old_block)
     old_block["date"] = old_date
-    idx = _first_match_index(prof["schedule_blocks"], old_block)
-    if idx < 0:
-        return jsonify({"error": "Old block not found"}), 404
-
     new_norm = _norm_block(new_block)
     new_norm["date"] = new_date
-    prof["schedule_blocks"][idx] = new_norm
-    schedule_user.profile_data = json.dumps(prof)
-    db.session.commit()
-    return jsonify({"message": "Block edit successful"}), 200
 
-@app.route("/profile/block/delete", methods=["POST"])
+    def change(prof: dict) -> tuple[dict, int]:
+        idx = _first_match_index(prof["schedule_blocks"], old_block)
+        if idx < 0:
+            return {"error": "Old block not found"}, 404
+        prof["schedule_blocks"][idx] = dict(new_norm)
+        return {"message": "Block edit successful"}, 200
+
+    body, status = _submit_profile_edit(schedule_user, change)
+    return jsonify(body), status
+
+@api.route("/profile/block/delete", methods=["POST"])
 @jwt_required()
 def block_delete():
     current_user = get_jwt_identity()
@@ -1534,12 +2550,14 @@ def block_delete():
         if not tag:
             return jsonify({"error": "Family task identifier missing"}), 400
         owner, _ = _schedule_owner(user)
-        changed = _remove_family_tag_from_user(owner, tag, date_str)
-        for child in _family_children(family):
-            changed = _remove_family_tag_from_user(child, tag, date_str) or changed
-        if not changed:
-            return jsonify({"error": "Family task not found"}), 404
-        db.session.commit()
+        children = _family_children(family)
+        with _profiles_held([owner, *children]):
+            changed = _remove_family_tag_from_user(owner, tag, date_str)
+            for child in children:
+                changed = _remove_family_tag_from_user(child, tag, date_str) or changed
+            if not changed:
+                return jsonify({"error": "Family task not found"}), 404
+            db.session.commit()
         return jsonify({"message": "Family task removed"}), 200
 
     try:
@@ -1547,36 +2565,77 @@ def block_delete():
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
 
-    prof = _safe_profile_dict(schedule_user.profile_data)
-    blocks = prof["schedule_blocks"]
-
     # delete by index (if provided)
     if isinstance(payload.get("index"), int):
         i = payload["index"]
-        if 0 <= i < len(blocks):
-            removed = blocks.pop(i)
-            schedule_user.profile_data = json.dumps(prof)
-            db.session.commit()
-            return jsonify({"message": "Deleted", "deleted": removed}), 200
-        return jsonify({"error": "Index out of range"}), 400
+
+        def change(prof: dict) -> tuple[dict, int]:
+            blocks = prof["schedule_blocks"]
+            if 0 <= i < len(blocks):
+                return {"message": "Deleted", "deleted": blocks.pop(i)}, 200
+            return {"error": "Index out of range"}, 400
 
     # delete by block (robust matching)
-    cand = payload.get("block")
-    if isinstance(cand, dict):
-        cand = dict(cand)
+    elif isinstance(payload.get("block"), dict):
+        cand = dict(payload["block"])
         cand["date"] = date_str
-        idx = _first_match_index(blocks, cand)
-        if idx >= 0:
-            removed = blocks.pop(idx)
-            schedule_user.profile_data = json.dumps(prof)
-            db.session.commit()
-            return jsonify({"message": "Deleted", "deleted": removed}), 200
-        return jsonify({"error": "Block not found"}), 404
 
-    return jsonify({"error": "Provide 'index' or 'block'"}), 400
+        def change(prof: dict) -> tuple[dict, int]:
+            blocks = prof["schedule_blocks"]
+            idx = _first_match_index(blocks, cand)
+            if idx >= 0:
+                return {"message": "Deleted", "deleted": blocks.pop(idx)}, 200
+            return {"error": "Block not found"}, 404
+
+    else:
+        return jsonify({"error": "Provide 'index' or 'block'"}), 400
+
+    body, status = _submit_profile_edit(schedule_user, change)
+    return jsonify(body), status
+
+@api.route("/profile/block/complete", methods=["POST"])
+@jwt_required()
+def block_complete():
+    """
+    Set `completed` and/or `hidden` on one block without rewriting the profile. The block
+    is named by `family_tag` or by `index` (as GET /profile returns it) plus `date`; with
+    `index`, pass `title` too so the state is ignored if a different block moves there.
+    """
+    user = User.query.filter_by(username=get_jwt_identity()).first()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    payload = request.get_json(silent=True) or {}
+    date_str = _coerce_date(payload.get("date"))
+    if not date_str:
+        return jsonify({"error": "Missing or invalid 'date'"}), 400
+    flags = {k: payload[k] for k in ("completed", "hidden") if isinstance(payload.get(k), bool)}
+    if not flags:
+        return jsonify({"error": "Provide 'completed' and/or 'hidden' as true or false"}), 400
+    tag = (payload.get("family_tag") or "").strip() if isinstance(payload.get("family_tag"), str) else ""
+    index = payload.get("index")
+    title = None
+    if tag:
+        key = f"tag:{tag}"
+    elif isinstance(index, int) and not isinstance(index, bool) and index >= 0:
+        key = f"pos:{index}"
+        if isinstance(payload.get("title"), str):
+            title = payload["title"].strip()
+    else:
+        return jsonify({"error": "Provide 'family_tag' or 'index'"}), 400
+    if len(key) > 80:
+        return jsonify({"error": "Family task identifier too long"}), 400
+
+    try:
+        schedule_user = _resolve_schedule_user(user, payload.get("target_child"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    _save_block_state(schedule_user.id, date_str, key, title, flags)
+    db.session.commit()
+    return jsonify({"message": "Block updated", **flags}), 200
 
 # -------------------- Task Templates --------------------
-@app.route("/templates", methods=["GET"])
+@api.route("/templates", methods=["GET"])
 @jwt_required()
 def list_templates():
     user = _current_user_from_token()
@@ -1606,7 +2665,7 @@ def list_templates():
         "family": [_serialize_template_entry(entry, user.username, viewer_is_master) for entry in family_entries],
     }), 200
 
-@app.route("/templates", methods=["POST"])
+@api.route("/templates", methods=["POST"])
 @jwt_required()
 def create_template():
     user = _current_user_from_token()
@@ -1656,7 +2715,7 @@ def create_template():
         family_id=family_id,
         scope=scope,
         title=title,
-        steps_json=json.dumps(steps),
+        steps_json=codec.dumps(steps),
         start_time=start,
         end_time=end,
         period=period,
@@ -1671,7 +2730,7 @@ def create_template():
         "bucket": bucket,
     }), 200
 
-@app.route("/templates/<template_id>", methods=["DELETE"])
+@api.route("/templates/<template_id>", methods=["DELETE"])
 @jwt_required()
 def delete_template(template_id: str):
     user = _current_user_from_token()
@@ -1690,7 +2749,7 @@ def delete_template(template_id: str):
     db.session.commit()
     return jsonify({"message": "Template deleted."}), 200
 
-@app.route("/templates/<template_id>", methods=["PUT", "PATCH"])
+@api.route("/templates/<template_id>", methods=["PUT", "PATCH"])
 @jwt_required()
 def update_template(template_id: str):
     user = _current_user_from_token()
@@ -1731,7 +2790,7 @@ def update_template(template_id: str):
         period = None
 
     entry.title = title
-    entry.steps_json = json.dumps(steps)
+    entry.steps_json = codec.dumps(steps)
     entry.start_time = start
     entry.end_time = end
     entry.period = period
@@ -1740,7 +2799,7 @@ def update_template(template_id: str):
     viewer_is_master = entry.scope == "family" and _can_manage_template(user, entry)
     return jsonify({"template": _serialize_template_entry(entry, user.username, viewer_is_master)}), 200
 
-@app.route("/routines", methods=["GET"])
+@api.route("/routines", methods=["GET"])
 @jwt_required()
 def list_routines():
     user = _current_user_from_token()
@@ -1754,7 +2813,7 @@ def list_routines():
     ).all()
     return jsonify({"routines": [_serialize_routine_entry(entry) for entry in entries]}), 200
 
-@app.route("/routines", methods=["POST"])
+@api.route("/routines", methods=["POST"])
 @jwt_required()
 def create_routine():
     user = _current_user_from_token()
@@ -1778,13 +2837,13 @@ def create_routine():
         owner_username=user.username,
         title=title,
         description=(payload.get("description") or "").strip(),
-        tasks_json=json.dumps(normalized),
+        tasks_json=codec.dumps(normalized),
     )
     db.session.add(entry)
     db.session.commit()
     return jsonify({"routine": _serialize_routine_entry(entry)}), 200
 
-@app.route("/routines/<routine_id>", methods=["PUT", "PATCH"])
+@api.route("/routines/<routine_id>", methods=["PUT", "PATCH"])
 @jwt_required()
 def update_routine_template(routine_id: str):
     user = _current_user_from_token()
@@ -1809,11 +2868,11 @@ def update_routine_template(routine_id: str):
 
     entry.title = title
     entry.description = (payload.get("description") or "").strip()
-    entry.tasks_json = json.dumps(normalized)
+    entry.tasks_json = codec.dumps(normalized)
     db.session.commit()
     return jsonify({"routine": _serialize_routine_entry(entry)}), 200
 
-@app.route("/routines/<routine_id>", methods=["DELETE"])
+@api.route("/routines/<routine_id>", methods=["DELETE"])
 @jwt_required()
 def delete_routine_template(routine_id: str):
     user = _current_user_from_token()
@@ -1830,7 +2889,7 @@ def delete_routine_template(routine_id: str):
     db.session.commit()
     return jsonify({"message": "Routine deleted."}), 200
 
-@app.route("/profile/preferences", methods=["GET", "POST"])
+@api.route("/profile/preferences", methods=["GET", "POST"])
 @jwt_required()
 def profile_preferences():
     current_user = get_jwt_identity()
@@ -1838,24 +2897,25 @@ def profile_preferences():
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    prof = _safe_profile_dict(user.profile_data)
-    prefs = prof.get("preferences", _default_preferences())
-
     if request.method == "GET":
-        return jsonify({"preferences": prefs}), 200
+        prof = _user_profile(user)
+        return jsonify({"preferences": prof.get("preferences", _default_preferences())}), 200
 
     payload = request.get_json(silent=True) or {}
     theme = (payload.get("theme") or "").strip().lower()
     if theme not in ("light", "dark", "system"):
         return jsonify({"error": "Theme must be 'light', 'dark', or 'system'."}), 400
 
-    prefs["theme"] = theme
-    prof["preferences"] = prefs
-    user.profile_data = json.dumps(prof)
-    db.session.commit()
-    return jsonify({"preferences": prefs}), 200
+    def change(prof: dict) -> tuple[dict, int]:
+        prefs = prof.get("preferences", _default_preferences())
+        prefs["theme"] = theme
+        prof["preferences"] = prefs
+        return {"preferences": dict(prefs)}, 200
+
+    body, status = _submit_profile_edit(user, change, wait=True)
+    return jsonify(body), status
 
-@app.route("/favorites", methods=["GET", "POST"])
+@api.route("/favorites", methods=["GET", "POST"])
 @jwt_required()
 def favorites():
     user = _current_user_from_token()
@@ -1894,23 +2954,127 @@ def favorites():
         return jsonify({"error": f"Failed to update favorites: {exc}"}), 500
 
 # -------------------- AI Task Generation --------------------
-@app.route("/ai/tasks", methods=["POST"])
+def _ai_context_blocks(user: 'User', payload: dict) -> list[dict]:
+    """Blocks already scheduled on the day the prompt targets (`date`, optional `target_child`)."""
+    date_str = _coerce_date(payload.get("date")) or _today_iso()
+    schedule_user = _resolve_schedule_user(user, payload.get("target_child"))
+    return _blocks_on_date(schedule_user, date_str)
+
+@api.route("/ai/tasks", methods=["POST"])
 @jwt_required()
+@_rate_limited("ai_tasks_user", "6/minute;burst=3", per="user")
+@_rate_limited("ai_tasks_ip", "30/minute")
+@_outbound_view
 def ai_tasks():
+    user = _current_user_from_token()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
     payload = request.get_json(silent=True) or {}
     prompt = (payload.get("prompt") or "").strip()
     if not prompt:
         return jsonify({"error": "Prompt is required."}), 400
+    try:
+        existing_blocks = _ai_context_blocks(user, payload)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
 
-    tasks = _ai_generate_tasks(prompt)
-    return jsonify({
+    tasks, source = yield GenerateTasks(prompt, existing_blocks)
+    cached = source == "cache"
+    resp = jsonify({
         "prompt": prompt,
         "tasks": tasks,
         "count": len(tasks),
+        "cached": cached,
+        "source": source,
+    })
+    resp.headers["X-Cache"] = "HIT" if cached else "MISS"
+    return resp, 200
+
+@api.route("/ai/tasks/stream", methods=["POST"])
+@jwt_required()
+@_rate_limited("ai_tasks_user", "6/minute;burst=3", per="user")
+@_rate_limited("ai_tasks_ip", "30/minute")
+def ai_tasks_stream():
+    user = _current_user_from_token()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    payload = request.get_json(silent=True) or {}
+    prompt = (payload.get("prompt") or "").strip()
+    if not prompt:
+        return jsonify({"error": "Prompt is required."}), 400
+    try:
+        existing_blocks = _ai_context_blocks(user, payload)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    # The generator logs through current_app, so it needs the request context kept open.
+    return Response(
+        stream_with_context(_ai_task_events(prompt, existing_blocks)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api.route("/ai/tasks/batch", methods=["POST"])
+@jwt_required()
+@_rate_limited("ai_batch_user", "3/minute;burst=2", per="user")
+def ai_tasks_batch():
+    user = _current_user_from_token()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    payload = request.get_json(silent=True) or {}
+    raw_items = payload.get("items")
+    if not isinstance(raw_items, list) or not raw_items:
+        return jsonify({"error": "Provide a non-empty 'items' list."}), 400
+    if len(raw_items) > AI_BATCH_MAX_ITEMS:
+        return jsonify({"error": f"A batch can contain at most {AI_BATCH_MAX_ITEMS} items."}), 400
+    deploy = bool(payload.get("deploy"))
+    if deploy and user.account_type.lower() == "child":
+        return jsonify({"error": "Children cannot add tasks"}), 403
+
+    items = _prepare_ai_batch(user, raw_items, deploy=deploy)
+    wants_stream = bool(payload.get("stream")) or "text/event-stream" in (request.headers.get("Accept") or "")
+
+    if wants_stream:
+        def events() -> Iterator[str]:
+            for item in _run_ai_batch(items):
+                yield sse_event("item", _public_batch_item(item))
+            summary = {"count": len(items), "deployed": False, "deployed_blocks": 0}
+            if deploy:
+                try:
+                    summary["deployed_blocks"] = _deploy_ai_batch(items)
+                    summary["deployed"] = True
+                except Exception as exc:
+                    current_app.logger.warning("Batch deploy failed: %s", exc)
+                    summary["error"] = "Failed to save the generated tasks."
+            yield sse_event("done", summary)
+
+        return Response(
+            stream_with_context(events()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    list(_run_ai_batch(items))
+    deployed_blocks = 0
+    if deploy:
+        try:
+            deployed_blocks = _deploy_ai_batch(items)
+        except Exception as exc:
+            current_app.logger.warning("Batch deploy failed: %s", exc)
+            return jsonify({
+                "error": "Failed to save the generated tasks.",
+                "items": [_public_batch_item(item) for item in items],
+            }), 500
+    return jsonify({
+        "items": [_public_batch_item(item) for item in items],
+        "count": len(items),
+        "deployed": deploy,
+        "deployed_blocks": deployed_blocks,
     }), 200
 
 # -------------------- Families --------------------
-@app.route("/family/create", methods=["POST"])
+@api.route("/family/create", methods=["POST"])
 @jwt_required()
 def create_family():
     data = request.get_json(silent=True) or {}
@@ -1926,29 +3090,29 @@ def create_family():
         return jsonify({"error": "Family ID already exists"}), 400
 
     creator = get_jwt_identity()
-    hashed_pw = generate_password_hash(password)
-
-    fam = Family(family_id=family_id, name=name, password=hashed_pw, creator_username=creator)
-    db.session.add(fam)
+    hashed_pw = _hash_password(password)
 
     user = User.query.filter_by(username=creator).first()
-    if user:
-        user.family_id = family_id
-        user.family_joined_at = datetime.utcnow()
-        _promote_existing_tasks_to_family(fam)
-
-    db.session.commit()
+    with _profiles_held([user]):
+        fam = Family(family_id=family_id, name=name, password=hashed_pw, creator_username=creator)
+        db.session.add(fam)
+        if user:
+            user.family_id = family_id
+            user.family_joined_at = datetime.utcnow()
+            _promote_existing_tasks_to_family(fam)
+        db.session.commit()
     return jsonify({"message": "Family created", "family_id": fam.family_id}), 200
 
-@app.route("/family/join", methods=["POST"])
+@api.route("/family/join", methods=["POST"])
 @jwt_required()
+@_rate_limited("family_join", "10/minute", per="user")
 def join_family():
     data = request.get_json(silent=True) or {}
     family_id = (data.get("family_id") or "").strip()
     password = data.get("password") or ""
 
     fam = Family.query.filter_by(family_id=family_id).first()
-    if not fam or not check_password_hash(fam.password, password):
+    if not fam or not _password_matches(fam.password, password):
         return jsonify({"error": "Invalid family ID or password"}), 401
 
     user = User.query.filter_by(username=get_jwt_identity()).first()
@@ -1957,15 +3121,16 @@ def join_family():
     if user.family_id:
         return jsonify({"error": "Leave your current family before joining another one."}), 400
 
-    user.family_id = family_id
-    user.family_joined_at = datetime.utcnow()
-    if user.account_type.lower() == "child":
-        _clear_user_tasks(user)
-        _sync_family_blocks_to_member(user, fam)
-    db.session.commit()
+    with _profiles_held([user, _family_owner(fam)]):
+        user.family_id = family_id
+        user.family_joined_at = datetime.utcnow()
+        if user.account_type.lower() == "child":
+            _clear_user_tasks(user)
+            _sync_family_blocks_to_member(user, fam)
+        db.session.commit()
     return jsonify({"message": "Joined family successfully"}), 200
 
-@app.route("/family/update", methods=["POST"])
+@api.route("/family/update", methods=["POST"])
 @jwt_required()
 def family_update():
     user = _current_user_from_token()
@@ -1981,7 +3146,7 @@ def family_update():
     current_password = (payload.get("current_password") or payload.get("password") or "").strip()
     if not current_password:
         return jsonify({"error": "Current family password is required."}), 400
-    if not check_password_hash(family.password, current_password):
+    if not _password_matches(family.password, current_password):
         return jsonify({"error": "Incorrect family password."}), 403
 
     new_name = (payload.get("name") or payload.get("new_name") or "").strip()
@@ -1997,7 +3162,7 @@ def family_update():
     if new_password:
         if not (8 <= len(new_password) <= 20):
             return jsonify({"error": "Family password must be 8–20 characters."}), 400
-        family.password = generate_password_hash(new_password)
+        family.password = _hash_password(new_password)
         changes.append("password")
 
     if not changes:
@@ -2010,7 +3175,7 @@ def family_update():
         "changed": changes,
     }), 200
 
-@app.route("/family/invite", methods=["POST"])
+@api.route("/family/invite", methods=["POST"])
 @jwt_required()
 def family_invite_send():
     user = _current_user_from_token()
@@ -2047,7 +3212,7 @@ def family_invite_send():
     db.session.commit()
     return jsonify({"message": "Invitation sent."}), 200
 
-@app.route("/family/invite/my", methods=["GET"])
+@api.route("/family/invite/my", methods=["GET"])
 @jwt_required()
 def family_invite_my():
     user = _current_user_from_token()
@@ -2060,9 +3225,14 @@ def family_invite_my():
         child_username=user.username,
         status="pending",
     ).order_by(FamilyInvite.created_at.asc()).all()
+    family_ids = {inv.family_id for inv in invites}
+    families = {
+        fam.family_id: fam
+        for fam in Family.query.filter(Family.family_id.in_(family_ids)).all()
+    } if family_ids else {}
     results = []
     for inv in invites:
-        family = Family.query.filter_by(family_id=inv.family_id).first()
+        family = families.get(inv.family_id)
         if not family:
             continue
         results.append({
@@ -2072,7 +3242,7 @@ def family_invite_my():
         })
     return jsonify({"invites": results}), 200
 
-@app.route("/family/invite/respond", methods=["POST"])
+@api.route("/family/invite/respond", methods=["POST"])
 @jwt_required()
 def family_invite_respond():
     user = _current_user_from_token()
@@ -2111,20 +3281,21 @@ def family_invite_respond():
         # cannot accept now, keep pending
         return jsonify({"error": "Leave your current family before accepting this invite."}), 409
 
-    invite.status = "accepted"
-    if not user.family_id:
-        _clear_user_tasks(user)
-        user.family_id = family_id
-        user.family_joined_at = datetime.utcnow()
-        if user.account_type.lower() == "child":
-            _sync_family_blocks_to_member(user, family)
-    else:
-        if user.account_type.lower() == "child":
-            _sync_family_blocks_to_member(user, family)
-    db.session.commit()
+    with _profiles_held([user, _family_owner(family)]):
+        invite.status = "accepted"
+        if not user.family_id:
+            _clear_user_tasks(user)
+            user.family_id = family_id
+            user.family_joined_at = datetime.utcnow()
+            if user.account_type.lower() == "child":
+                _sync_family_blocks_to_member(user, family)
+        else:
+            if user.account_type.lower() == "child":
+                _sync_family_blocks_to_member(user, family)
+        db.session.commit()
     return jsonify({"message": "Welcome to the family!", "family_id": family_id}), 200
 
-@app.route("/family/members", methods=["GET"])
+@api.route("/family/members", methods=["GET"])
 @jwt_required()
 def family_members():
     current_user = get_jwt_identity()
@@ -2162,7 +3333,7 @@ def family_members():
         "children": children,
     }), 200
 
-@app.route("/family/member/remove", methods=["POST"])
+@api.route("/family/member/remove", methods=["POST"])
 @jwt_required()
 def family_member_remove():
     current_user = get_jwt_identity()
@@ -2186,13 +3357,14 @@ def family_member_remove():
     if not target or target.family_id != family.family_id:
         return jsonify({"error": "User is not part of this family"}), 404
 
-    _clear_user_tasks(target)
-    _detach_user_from_family(target)
-    FamilyLeaveRequest.query.filter_by(family_id=family.family_id, child_username=target.username).delete()
-    db.session.commit()
+    with _profiles_held([target]):
+        _clear_user_tasks(target)
+        _detach_user_from_family(target)
+        FamilyLeaveRequest.query.filter_by(family_id=family.family_id, child_username=target.username).delete()
+        db.session.commit()
     return jsonify({"message": f"Removed {target_username} from family"}), 200
 
-@app.route("/family/leave", methods=["POST"])
+@api.route("/family/leave", methods=["POST"])
 @jwt_required()
 def family_leave():
     user = _current_user_from_token()
@@ -2222,11 +3394,13 @@ def family_leave():
         db.session.commit()
         return jsonify({"message": "Leave request sent to the master parent."}), 200
 
-    message = _handle_parent_leave(user, family)
-    db.session.commit()
+    # Leaving can delete the family, which clears every member's schedule.
+    with _profiles_held(User.query.filter_by(family_id=family.family_id).all()):
+        message = _handle_parent_leave(user, family)
+        db.session.commit()
     return jsonify({"message": message}), 200
 
-@app.route("/family/leave/requests", methods=["GET"])
+@api.route("/family/leave/requests", methods=["GET"])
 @jwt_required()
 def family_leave_requests():
     user = _current_user_from_token()
@@ -2242,9 +3416,14 @@ def family_leave_requests():
         family_id=family.family_id,
         status="pending",
     ).order_by(FamilyLeaveRequest.created_at.asc()).all()
+    usernames = {item.child_username for item in pending}
+    children = {
+        child.username: child
+        for child in User.query.filter(User.username.in_(usernames)).all()
+    } if usernames else {}
     results = []
     for item in pending:
-        child = User.query.filter_by(username=item.child_username).first()
+        child = children.get(item.child_username)
         results.append({
             "child_username": item.child_username,
             "display_name": _user_display_name(child),
@@ -2253,7 +3432,7 @@ def family_leave_requests():
         })
     return jsonify({"requests": results}), 200
 
-@app.route("/family/leave/requests/handle", methods=["POST"])
+@api.route("/family/leave/requests/handle", methods=["POST"])
 @jwt_required()
 def family_leave_requests_handle():
     user = _current_user_from_token()
@@ -2282,20 +3461,21 @@ def family_leave_requests_handle():
     approved = action in ("approve", "accept")
     success = False
     child = User.query.filter_by(username=child_username).first()
-    if approved:
-        if child and child.family_id == family.family_id:
-            _clear_user_tasks(child)
-            _detach_user_from_family(child)
-            success = True
-        else:
-            success = True  # child already left; treat as handled
-    FamilyLeaveRequest.query.filter_by(id=request_row.id).delete()
-    db.session.commit()
+    with _profiles_held([child] if approved else []):
+        if approved:
+            if child and child.family_id == family.family_id:
+                _clear_user_tasks(child)
+                _detach_user_from_family(child)
+                success = True
+            else:
+                success = True  # child already left; treat as handled
+        FamilyLeaveRequest.query.filter_by(id=request_row.id).delete()
+        db.session.commit()
     if success and approved:
         return jsonify({"message": f"{child_username} has left the family."}), 200
     return jsonify({"message": "Leave request rejected."}), 200
 
-@app.route("/family/master/transfer", methods=["POST"])
+@api.route("/family/master/transfer", methods=["POST"])
 @jwt_required()
 def family_transfer_master():
     current_user = get_jwt_identity()
@@ -2321,23 +3501,178 @@ def family_transfer_master():
     if target.account_type.lower() != "parent":
         return jsonify({"error": "Only parents can become master"}), 400
 
-    master_profile = _safe_profile_dict(user.profile_data)
-    target_profile = _safe_profile_dict(target.profile_data)
+    with _profiles_held([user, target]):
+        master_profile = _user_profile(user)
+        target_profile = _user_profile(target)
 
-    target_profile["schedule_blocks"] = list(master_profile.get("schedule_blocks", []))
-    master_profile["schedule_blocks"] = []
+        target_profile["schedule_blocks"] = list(master_profile.get("schedule_blocks", []))
+        master_profile["schedule_blocks"] = []
 
-    user.profile_data = json.dumps(master_profile)
-    target.profile_data = json.dumps(target_profile)
-    family.creator_username = target.username
-    db.session.commit()
+        user.profile_data = _dump_profile(master_profile)
+        target.profile_data = _dump_profile(target_profile)
+        family.creator_username = target.username
+        db.session.commit()
 
     return jsonify({"message": f"Transferred master role to {target_username}"}), 200
 
 # -------------------- Health --------------------
-@app.route("/")
+@api.route("/")
 def health():
     return jsonify({"ok": True})
 
+@api.route("/stats")
+def stats():
+    return jsonify({
+        "rate_limits": RATE_LIMITER.stats(),
+        "ai_cache": AI_TASK_CACHE.stats(),
+        "ai_single_flight": AI_SINGLE_FLIGHT.stats(),
+        "ai_async_single_flight": AI_ASYNC_SINGLE_FLIGHT.stats(),
+        # Built on first AI request (or by warmup()); /stats should not be what builds it.
+        "ai_providers": _AI_PROVIDERS.stats() if _AI_PROVIDERS is not None else {"initialized": False},
+        "response_compression": dict(
+            COMPRESSED_BODIES.stats(), enabled=COMPRESS_ENABLED, encodings=list(COMPRESS_ENCODINGS),
+        ),
+        "profile_writes": dict(
+            PROFILE_WRITES.stats(), coalesce=PROFILE_WRITE_COALESCE, mode="async" if PROFILE_WRITE_ASYNC else "sync",
+        ),
+    })
+
+@api.route("/metrics")
+def metrics_endpoint():
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled."}), 404
+    return Response(METRICS.render(), content_type=metrics.CONTENT_TYPE)
+
+# -------------------- Profile blob conversion --------------------
+def _convert_profile_blobs(fmt: str, *, batch_size: int = 200, pause: float = 0.05, dry_run: bool = False) -> dict:
+    """
+    Re-encode every users.profile_data with `fmt` and the configured compression, in
+    short transactions so a running server keeps getting the write lock. A row that
+    changed since it was read is left alone; run again to pick it up.
+    """
+    totals = {"rows": 0, "converted": 0, "unreadable": 0, "bytes_before": 0, "bytes_after": 0, "formats": {}}
+    table = User.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("pk"), table.c.profile_data == bindparam("old"))
+        .values(profile_data=bindparam("new"))
+    )
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(User.id, User.profile_data).where(User.id > last_id).order_by(User.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        changes = []
+        for pk, blob in rows:
+            totals["rows"] += 1
+            kind = profile_blob.describe(blob)
+            totals["formats"][kind] = totals["formats"].get(kind, 0) + 1
+            if not blob:
+                continue
+            try:
+                new = _dump_profile(profile_blob.decode(blob), fmt)
+            except ValueError:
+                totals["unreadable"] += 1
+                continue
+            totals["bytes_before"] += len(blob)
+            totals["bytes_after"] += len(new)
+            if new != blob:
+                changes.append({"pk": pk, "old": blob, "new": new})
+        if changes and not dry_run:
+            result = db.session.execute(stmt, changes)
+            totals["converted"] += max(result.rowcount, 0)
+        db.session.commit()
+        if pause:
+            time.sleep(pause)
+    return totals
+
+# -------------------- App factory --------------------
+def create_app(config: dict | None = None) -> Flask:
+    """
+    Build an app around the shared models and routes. `config` overrides DEFAULT_CONFIG,
+    e.g. create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"}) for a throwaway in-memory app.
+    """
+    if PROFILE_BLOB_FORMAT not in profile_blob.FORMATS:
+        raise ValueError(f"PROFILE_BLOB_FORMAT must be one of {', '.join(profile_blob.FORMATS)}.")
+    app = Flask(__name__)
+    app.json = codec.CodecJSONProvider(app)
+    app.config.update(DEFAULT_CONFIG)
+    app.config.update(config or {})
+    CORS(app)
+    db.init_app(app)
+    jwt.init_app(app)
+    app.register_blueprint(api)
+    if PROFILER_TOKEN or PROFILER_SAMPLE_RATE > 0:
+        app.before_request(_profile_begin)
+        app.after_request(_profile_header)
+        app.teardown_request(_profile_end)
+    if TRACER.enabled:
+        app.before_request(_trace_begin)
+        app.after_request(_trace_header)
+        app.teardown_request(_trace_end)
+    if CAPTURE.enabled:
+        if not os.environ.get("CAPTURE_SECRET"):
+            app.logger.warning("CAPTURE_SECRET is not set; captured pseudonyms will not match any snapshot.")
+        app.after_request(_capture_request)
+    if COMPRESS_ENABLED:
+        # Registered last, so it runs before the other after_request hooks and they see the 304s.
+        app.after_request(_compress_response)
+
+    @app.cli.command("migrate")
+    def migrate_command():
+        """Create missing tables and columns."""
+        _migrate_schema()
+
+    @app.cli.command("convert-profiles")
+    @click.option("--format", "fmt", type=click.Choice(profile_blob.FORMATS), default=None,
+                  help="Target format (default: PROFILE_BLOB_FORMAT).")
+    @click.option("--batch-size", default=200, show_default=True)
+    @click.option("--pause", default=0.05, show_default=True, help="Seconds to sleep between batches.")
+    @click.option("--dry-run", is_flag=True, help="Report the size change without writing.")
+    def convert_profiles_command(fmt, batch_size, pause, dry_run):
+        """Rewrite stored profiles in the configured blob format, a batch at a time."""
+        totals = _convert_profile_blobs(fmt or PROFILE_BLOB_FORMAT, batch_size=batch_size, pause=pause, dry_run=dry_run)
+        before, after = totals["bytes_before"], totals["bytes_after"]
+        click.echo(f"{totals['rows']} rows {totals['formats']}; {totals['converted']} rewritten, "
+                   f"{totals['unreadable']} unreadable")
+        if before:
+            click.echo(f"profile bytes {before:,} -> {after:,} ({after / before:.1%})")
+
+    if app.config["AUTO_MIGRATE"]:
+        with app.app_context():
+            _migrate_schema()
+    return app
+
+def warmup(app: Flask) -> None:
+    """
+    Do the first-request work up front: open a DB connection, build the AI provider
+    chain and import the HTTP client. Call it once per worker before taking traffic
+    (or before forking, when workers are preloaded).
+    """
+    with app.app_context():
+        db.session.execute(text("SELECT 1"))
+        db.session.remove()
+    _ai_providers()
+    _outbound_session()
+
+def reset_after_fork(app: Flask) -> None:
+    """Drop pooled DB connections inherited from the parent; the child opens its own on first use."""
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+_default_app: Flask | None = None
+
+def __getattr__(name: str):
+    # `flask --app app run` and `from app import app` get a default app, built on first access.
+    global _default_app
+    if name == "app":
+        if _default_app is None:
+            _default_app = create_app()
+        return _default_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == "__main__":
-    app.run(host="127.0.0.1", port=5000, debug=True)
+    create_app().run(host="127.0.0.1", port=5000, debug=True)
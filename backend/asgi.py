@@ -0,0 +1,271 @@
+"""
+ASGI entry point (pip install uvicorn httpx).
+
+    uvicorn asgi:application --workers 4 --port 8000
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+
+Every route is served by the same Flask app. Ordinary views run on a bounded
+thread pool, ASGI_THREADS per worker (default 32). Views marked with
+@_outbound_view in app.py (/login/google, /account/google/switch and /ai/tasks)
+are different: each outbound step they yield is awaited on the event loop with
+httpx. The request holds no thread while Google or a model answers, so
+thousands of slow generations need no more threads than a handful of fast ones.
+"""
+from __future__ import annotations
+import asyncio
+import contextvars
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from flask import Flask, request_started
+
+import app as backend
+from app import ASYNC_VIEWS_ENVIRON_KEY, GenerateTasks, HttpGet, db
+
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", "32"))
+# Outbound connections per worker, shared by Google and the AI providers.
+ASGI_MAX_OUTBOUND = int(os.environ.get("ASGI_MAX_OUTBOUND", "200"))
+
+_STEPS = (HttpGet, GenerateTasks)
+
+
+def _environ(scope: dict, body: bytes) -> dict:
+    """A PEP 3333 environ for an ASGI HTTP scope."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        ASYNC_VIEWS_ENVIRON_KEY: True,
+    }
+    for raw_name, raw_value in scope.get("headers", ()):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+class _Exchange:
+    """
+    One request's trip through Flask, following Flask.wsgi_app step by step but
+    split wherever the view yields an outbound step. Each segment runs on a pool
+    thread inside `context`, which carries the request context between them.
+    """
+
+    def __init__(self, flask_app: Flask, environ: dict):
+        self.app = flask_app
+        self.environ = environ
+        self.context = contextvars.Context()
+        self.request_ctx = flask_app.request_context(environ)
+        self.flow = None
+        self.error: BaseException | None = None
+        self.status = "500 INTERNAL SERVER ERROR"
+        self.headers: list[tuple[str, str]] = []
+        self.body = None
+        self._chunks = None
+        self._closed = False
+
+    def start(self):
+        self.request_ctx.push()
+        return self._advance(self._dispatch)
+
+    def resume(self, result=None, exc: BaseException | None = None):
+        if exc is not None:
+            return self._advance(lambda: self.flow.throw(exc))
+        return self._advance(lambda: self.flow.send(result))
+
+    def _dispatch(self):
+        self.app._got_first_request = True
+        request_started.send(self.app, _async_wrapper=self.app.ensure_sync)
+        rv = self.app.preprocess_request()
+        if rv is None:
+            rv = self.app.dispatch_request()
+        if hasattr(rv, "send") and hasattr(rv, "throw"):
+            self.flow = rv
+            return rv.send(None)
+        return rv
+
+    def _advance(self, advance):
+        """Run the view up to its next outbound step and return it, or finish the request and return None."""
+        try:
+            try:
+                rv = advance()
+                if isinstance(rv, _STEPS):
+                    # Hand the connection back to the pool for the wait; nothing is pending (see app.py).
+                    db.session.rollback()
+                    return rv
+            except StopIteration as stop:
+                rv = stop.value
+            except Exception as exc:
+                rv = self.app.handle_user_exception(exc)
+            response = self.app.finalize_request(rv)
+        except Exception as exc:
+            self.error = exc
+            response = self.app.handle_exception(exc)
+        self._finish(response)
+        return None
+
+    def _finish(self, response) -> None:
+        streamed = False
+        try:
+            app_iter, self.status, headers = response.get_wsgi_response(self.environ)
+            self.headers = list(headers)
+            # Streamed bodies (server-sent events) are pulled chunk by chunk later, through
+            # next_chunk(), and the request context stays pushed until close().
+            streamed = response.is_streamed
+            if streamed:
+                self.body, self._chunks = app_iter, iter(app_iter)
+            else:
+                self.body = [b"".join(app_iter)]
+        finally:
+            if not streamed:
+                self.close()
+
+    def next_chunk(self) -> bytes | None:
+        """The next piece of a streamed body, or None at the end."""
+        try:
+            return next(self._chunks, None)
+        except Exception as exc:
+            self.error = exc
+            raise
+
+    def close(self) -> None:
+        """Close the body and tear the request down; safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self._chunks is not None and hasattr(self.body, "close"):
+                self.body.close()
+        finally:
+            error = self.error
+            if error is not None and self.app.should_ignore_error(error):
+                error = None
+            self.request_ctx.pop(error)
+
+
+class AsgiApp:
+    def __init__(self, flask_app: Flask, *, threads: int = ASGI_THREADS):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="asgi")
+        self.client: httpx.AsyncClient | None = None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self._in_thread(None, backend.warmup, self.flask_app)
+                self._client()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.client is not None:
+                    await self.client.aclose()
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _client(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=ASGI_MAX_OUTBOUND),
+                event_hooks={"request": [_stamp_request], "response": [_record_response]},
+            )
+        return self.client
+
+    async def _in_thread(self, context: contextvars.Context | None, fn, *args):
+        loop = asyncio.get_running_loop()
+        if context is None:
+            return await loop.run_in_executor(self.executor, fn, *args)
+        return await loop.run_in_executor(self.executor, context.run, fn, *args)
+
+    async def _http(self, scope, receive, send) -> None:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+
+        exchange = _Exchange(self.flask_app, _environ(scope, b"".join(chunks)))
+        step = await self._in_thread(exchange.context, exchange.start)
+        while step is not None:
+            try:
+                # Run the wait inside the request's context so metrics and tracing see it.
+                result = await asyncio.create_task(self._perform(step), context=exchange.context)
+            except Exception as exc:
+                step = await self._in_thread(exchange.context, exchange.resume, None, exc)
+            else:
+                step = await self._in_thread(exchange.context, exchange.resume, result)
+
+        code, _, _ = exchange.status.partition(" ")
+        await send({
+            "type": "http.response.start",
+            "status": int(code),
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in exchange.headers],
+        })
+        if isinstance(exchange.body, list):
+            await send({"type": "http.response.body", "body": exchange.body[0]})
+            return
+        try:
+            while True:
+                # Like the view's segments, each chunk is produced inside the request's context.
+                chunk = await self._in_thread(exchange.context, exchange.next_chunk)
+                if chunk is None:
+                    break
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            await self._in_thread(exchange.context, exchange.close)
+
+    async def _perform(self, step):
+        if isinstance(step, GenerateTasks):
+            return await backend._ai_generate_tasks_async(step.prompt, step.existing_blocks, client=self._client())
+        try:
+            resp = await self._client().get(step.url, params=step.params, headers=step.headers, timeout=step.timeout)
+        except httpx.HTTPError:
+            return None
+        try:
+            return resp.status_code, resp.json()
+        except ValueError:
+            return resp.status_code, None
+
+
+async def _stamp_request(req: httpx.Request) -> None:
+    req.extensions["stepsync.started"] = time.perf_counter()
+
+
+async def _record_response(resp: httpx.Response) -> None:
+    started = resp.request.extensions.get("stepsync.started")
+    elapsed = time.perf_counter() - started if started else 0.0
+    backend._note_outbound(resp.request.method, str(resp.request.url), resp.status_code, elapsed)
+
+
+application = AsgiApp(backend.app)
@@ -0,0 +1,115 @@
+"""
+Encode/decode cost of profile blobs and /profile responses, per JSON backend.
+
+    python benchmarks/bench_codec.py                       # 100 .. 50k blocks
+    python benchmarks/bench_codec.py --blocks 5800 --min-time 0.5
+
+Compares what the app did before (json.dumps/json.loads with default
+settings), the codec's stdlib path, and the codec's orjson path when orjson is
+installed. Before timing, it checks that every backend decodes to the same
+profile and that both codec paths write byte-identical text.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codec  # noqa: E402
+from loadtest.dataset import make_block  # noqa: E402
+
+SIZES = (100, 1000, 5800, 50000)  # 5800 ~ two years of a busy child's schedule
+
+
+def profile(size: int, seed: int = 3) -> dict:
+    rng = random.Random(seed)
+    blocks = []
+    for idx in range(size):
+        day = f"20{24 + idx // 3000:02d}-{1 + idx // 250 % 12:02d}-{1 + idx % 28:02d}"
+        block = make_block(rng, day, completed=rng.random() < 0.4,
+                           family_tag=f"fam-{idx:016x}" if rng.random() < 0.3 else "")
+        if idx % 50 == 0:
+            block["title"] = f"Clases de música ♪ {idx}"  # non-ASCII text shows up in real titles
+        blocks.append(block)
+    return {
+        "schedule_blocks": blocks,
+        "preferences": {"theme": "dark"},
+        "favorites": {"templates": ["T1", "T2"], "routines": []},
+    }
+
+
+def backends() -> dict[str, tuple]:
+    """name -> (dumps(obj) -> str, loads(text), response(obj) -> bytes)."""
+    found = {
+        "json (before)": (
+            json.dumps,
+            json.loads,
+            lambda obj: json.dumps(obj, sort_keys=True, separators=(",", ":")).encode() + b"\n",
+        ),
+        "codec stdlib": (
+            lambda obj: codec._stdlib_encode(obj, sort_keys=False, default=None)[0],
+            json.loads,
+            lambda obj: codec._stdlib_encode(obj, sort_keys=True, default=None)[1] + b"\n",
+        ),
+    }
+    if codec.orjson is not None:
+        found["codec orjson"] = (
+            codec.dumps,
+            codec.loads,
+            lambda obj: codec.dumps_bytes(obj, sort_keys=True) + b"\n",
+        )
+    return found
+
+
+def check(doc: dict, found: dict[str, tuple]) -> None:
+    texts = {name: dumps(doc) for name, (dumps, _, _) in found.items()}
+    for name, (_, loads, _) in found.items():
+        for source, text in texts.items():
+            if loads(text) != doc:
+                sys.exit(f"FAIL: {name} decodes {source} output differently")
+    if "codec orjson" in texts and texts["codec orjson"] != texts["codec stdlib"]:
+        sys.exit("FAIL: codec stdlib and orjson paths wrote different bytes")
+    responses = {name: response(doc) for name, (_, _, response) in found.items()}
+    if "codec orjson" in responses and responses["codec orjson"] != responses["codec stdlib"]:
+        sys.exit("FAIL: codec stdlib and orjson responses differ")
+
+
+def per_call(fn, *, min_time: float, repeat: int = 5) -> float:
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, action="append", help=f"repeatable (default {SIZES})")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing repeat")
+    args = parser.parse_args()
+
+    found = backends()
+    print(f"codec backend in use: {codec.NAME}")
+    print(f"{'blocks':>7}  {'backend':<14}{'KiB':>8}{'dumps ms':>10}{'loads ms':>10}{'response ms':>13}")
+    for size in args.blocks or SIZES:
+        doc = profile(size)
+        check(doc, found)
+        base = None
+        for name, (dumps, loads, response) in found.items():
+            text = dumps(doc)
+            timings = (
+                per_call(lambda: dumps(doc), min_time=args.min_time),
+                per_call(lambda: loads(text), min_time=args.min_time),
+                per_call(lambda: response(doc), min_time=args.min_time),
+            )
+            base = base or timings
+            speedup = " ".join(f"{b / t:4.1f}x" for b, t in zip(base, timings))
+            print(f"{size:>7}  {name:<14}{len(text.encode()) / 1024:>8.0f}"
+                  f"{timings[0] * 1e3:>10.2f}{timings[1] * 1e3:>10.2f}{timings[2] * 1e3:>13.2f}   {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Compression ratio and CPU cost of each response encoding, per route.
+
+    python benchmarks/bench_compression.py
+    python benchmarks/bench_compression.py --years 2 --blocks-per-day 8 --min-time 0.5
+
+Seeds one synthetic family (loadtest.dataset) into a temporary SQLite file,
+fetches /profile, /profile/family, /templates and /routines as the family's
+parent, and compresses each body with every installed encoding at a range of
+levels. The levels marked * are the ones the app uses (COMPRESS_LEVEL_*).
+Compression is single-threaded CPU work, so the times are CPU per call. The
+"etag" row is the extra hashing every GET pays for its ETag.
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compression  # noqa: E402
+from bench_codec import per_call  # noqa: E402
+from loadtest.dataset import DatasetConfig, seed_database  # noqa: E402
+
+ROUTES = ("/profile", "/profile/family", "/templates", "/routines")
+LEVELS = {"gzip": (1, 5, 6, 9), "br": (1, 4, 5, 11), "zstd": (1, 3, 6, 19)}
+
+
+def bodies(cfg: DatasetConfig) -> dict[str, bytes]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        manifest = seed_database(db_path, cfg, os.path.join(tmp, "accounts.json"))
+        import app as backend
+
+        flask_app = backend.create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}"})
+        client = flask_app.test_client()
+        username = manifest["families"][0]["parents"][0]
+        resp = client.post("/login", json={"username": username, "password": cfg.password})
+        headers = {"Authorization": f"Bearer {resp.get_json()['token']}"}
+        found = {}
+        for route in ROUTES:
+            resp = client.get(route, headers=headers)
+            if resp.status_code != 200:
+                sys.exit(f"FAIL: GET {route} returned {resp.status_code}")
+            found[route] = resp.get_data()
+        with flask_app.app_context():
+            backend.db.engine.dispose()
+        return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=float, default=1.0, help="schedule history per member")
+    parser.add_argument("--blocks-per-day", type=int, default=4)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing repeat")
+    args = parser.parse_args()
+
+    cfg = DatasetConfig(families=1, years=args.years, blocks_per_day=args.blocks_per_day)
+    found = bodies(cfg)
+    print(f"encodings installed: {', '.join(compression.available())}")
+    print(f"{'route':<17}{'encoding':<10}{'level':>6}{'KiB':>9}{'ratio':>8}{'ms':>9}{'MB/s':>8}")
+    for route, data in found.items():
+        etag = per_call(lambda: hashlib.sha1(data).hexdigest(), min_time=args.min_time)
+        print(f"{route:<17}{'identity':<10}{'':>6}{len(data) / 1024:>9.1f}{1:>8.0%}{0:>9.2f}")
+        print(f"{'':<17}{'etag':<10}{'':>6}{'':>9}{'':>8}{etag * 1e3:>9.2f}")
+        for encoding in compression.available():
+            for level in LEVELS[encoding]:
+                body = compression.compress(data, encoding, level)
+                if compression.decompress(body, encoding) != data:
+                    sys.exit(f"FAIL: {encoding} level {level} did not round-trip")
+                seconds = per_call(lambda: compression.compress(data, encoding, level), min_time=args.min_time)
+                mark = "*" if level == compression.DEFAULT_LEVELS[encoding] else " "
+                print(f"{'':<17}{encoding:<10}{level:>5}{mark}{len(body) / 1024:>9.1f}{len(body) / len(data):>8.1%}"
+                      f"{seconds * 1e3:>9.2f}{len(data) / seconds / 1e6:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
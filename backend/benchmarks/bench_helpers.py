@@ -0,0 +1,294 @@
+"""
+Microbenchmarks for the pure helpers on the request path, at input sizes from
+10 to 100k blocks. Reports time per call and the memory each call allocates
+(tracemalloc peak above the starting point, and what is still held afterwards).
+
+    python benchmarks/bench_helpers.py run                      # print a table
+    python benchmarks/bench_helpers.py run --save               # refresh benchmarks/baselines/helpers.json
+    python benchmarks/bench_helpers.py compare                  # fresh run vs the stored baseline
+    python benchmarks/bench_helpers.py compare old.json new.json --threshold 0.25
+
+`compare` exits non-zero when a case is slower, or allocates more, by more than
+`--threshold`. It also fails when a case's growth between the two largest sizes
+steepens, e.g. when something linear turns quadratic. Baselines are machine
+specific; regenerate them on the machine you compare on.
+"""
+from __future__ import annotations
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+import app as backend  # noqa: E402
+from loadtest.dataset import make_block  # noqa: E402
+
+APP = backend.create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})  # in-memory; nothing touches users.db
+
+BASELINE = os.path.join(BACKEND, "benchmarks", "baselines", "helpers.json")
+SIZES = (10, 100, 1000, 10000, 100000)
+DAY = "2030-01-15"
+PROMPT = "Breakfast and get dressed. Homework at 4pm. Soccer practice. Tidy room; dinner. Bedtime at 9pm"
+
+
+def _blocks(size: int, *, tagged: float = 0.0, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    blocks = []
+    for idx in range(size):
+        tag = f"fam-{idx:016x}" if rng.random() < tagged else ""
+        block = make_block(rng, DAY, family_tag=tag)
+        block["title"] = f"{block['title']} {idx}"
+        blocks.append(block)
+    return blocks
+
+
+# Each case maps a size to (call, reset). `reset` restores state mutated by `call` and is not timed.
+def case_safe_profile_dict(size):
+    text = json.dumps({"schedule_blocks": _blocks(size), "preferences": {}, "favorites": []})
+    return (lambda: backend._safe_profile_dict(text)), None
+
+
+def case_norm_block(size):
+    blocks = _blocks(size)
+    return (lambda: [backend._norm_block(b) for b in blocks]), None
+
+
+def case_first_match_index_hit(size):
+    blocks = _blocks(size)
+    target = dict(blocks[-1])
+    return (lambda: backend._first_match_index(blocks, target)), None
+
+
+def case_first_match_index_miss(size):
+    blocks = _blocks(size)
+    missing = dict(blocks[-1], title="Not on the schedule")
+    return (lambda: backend._first_match_index(blocks, missing)), None
+
+
+def case_sync_family_blocks_to_member(size):
+    owner_blocks = _blocks(size, tagged=0.5)
+    tagged = [b for b in owner_blocks if b["family_tag"]]
+    member_text = json.dumps({"schedule_blocks": tagged[: len(tagged) // 2] + _blocks(size // 2, seed=8)})
+    backend.User.query.filter_by(username="bench-owner").delete()
+    owner = backend.User(username="bench-owner", password="x", account_type="parent",
+                         profile_data=json.dumps({"schedule_blocks": owner_blocks}))
+    backend.db.session.add(owner)
+    backend.db.session.commit()
+    family = backend.Family(family_id="BENCH", name="Bench", password="x", creator_username="bench-owner")
+    member = backend.User(username="bench-member", password="x", account_type="child", profile_data=member_text)
+
+    def reset():
+        member.profile_data = member_text
+
+    return (lambda: backend._sync_family_blocks_to_member(member, family)), reset
+
+
+def case_normalize_task_payload(size):
+    payloads = [
+        {"title": f" {b['title']} ", "steps": b["steps"] + [""], "start": b["startTime"],
+         "end": b["endTime"], "period": b["period"].lower()}
+        for b in _blocks(size)
+    ]
+    return (lambda: [backend._normalize_task_payload(p) for p in payloads]), None
+
+
+def case_sanitize_model_tasks(size):
+    raw = {"tasks": [
+        {"title": b["title"], "steps": b["steps"], "startTime": f"{b['startTime']} {b['period']}",
+         "endTime": b["endTime"]}
+        for b in _blocks(size)
+    ]}
+    return (lambda: backend._sanitize_model_tasks(raw)), None
+
+
+def case_split_time_and_period(size):
+    values = [f"{b['startTime']} {b['period'].lower()}" for b in _blocks(size)]
+    return (lambda: [backend._split_time_and_period(v) for v in values]), None
+
+
+def case_fallback_generate_tasks(size):
+    blocks = _blocks(size)
+    return (lambda: backend._fallback_generate_tasks(PROMPT, blocks)), None
+
+
+CASES = {
+    "_safe_profile_dict": case_safe_profile_dict,
+    "_norm_block": case_norm_block,
+    "_first_match_index[hit-last]": case_first_match_index_hit,
+    "_first_match_index[miss]": case_first_match_index_miss,
+    "_sync_family_blocks_to_member": case_sync_family_blocks_to_member,
+    "_normalize_task_payload": case_normalize_task_payload,
+    "_sanitize_model_tasks": case_sanitize_model_tasks,
+    "_split_time_and_period": case_split_time_and_period,
+    "_fallback_generate_tasks": case_fallback_generate_tasks,
+}
+
+
+def _time_per_call(call, reset, *, min_time: float, repeat: int) -> float:
+    if reset is None:
+        timer = timeit.Timer(call)
+        number, _ = timer.autorange()
+        number = max(1, math.ceil(number * min_time / 0.2))
+        return min(timer.repeat(repeat=repeat, number=number)) / number
+    best = math.inf
+    deadline = time.perf_counter() + min_time * repeat
+    for n in range(10000):
+        reset()
+        started = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - started)
+        if n + 1 >= repeat and time.perf_counter() > deadline:
+            break
+    return best
+
+
+def _allocations(call, reset) -> tuple[int, int]:
+    if reset:
+        reset()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = call()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak - before, max(0, after - before)
+
+
+def run(cases: list[str], sizes: list[int], *, min_time: float, repeat: int) -> dict:
+    results: dict[str, dict] = {}
+    with APP.app_context():
+        for name in cases:
+            results[name] = _run_case(name, sizes, min_time=min_time, repeat=repeat)
+    return {"meta": _meta(sizes, min_time, repeat), "results": results}
+
+
+def _run_case(name: str, sizes: list[int], *, min_time: float, repeat: int) -> dict:
+    entries = {}
+    for size in sizes:
+        call, reset = CASES[name](size)
+        seconds = _time_per_call(call, reset, min_time=min_time, repeat=repeat)
+        peak, retained = _allocations(call, reset)
+        entries[str(size)] = {
+            "time_us": round(seconds * 1e6, 3),
+            "alloc_peak_bytes": peak,
+            "alloc_retained_bytes": retained,
+        }
+        print(f"{name:<34}{size:>8}{seconds * 1e6:>14.1f} us{peak / 1024:>12.1f} KiB", flush=True)
+    exponent = scaling(entries)
+    if exponent is not None:
+        print(f"{'':<34}{'growth':>8}{exponent:>14.2f}", flush=True)
+    return entries
+
+
+def _meta(sizes, min_time, repeat) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=BACKEND, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "sizes": sizes,
+        "min_time": min_time,
+        "repeat": repeat,
+    }
+
+
+def scaling(entries: dict[str, dict]) -> float | None:
+    """Growth exponent between the two largest sizes: ~1 linear, ~2 quadratic."""
+    sizes = sorted(int(s) for s in entries)
+    if len(sizes) < 2 or sizes[-2] < 1000:
+        return None
+    small, large = entries[str(sizes[-2])]["time_us"], entries[str(sizes[-1])]["time_us"]
+    if small <= 0 or large <= 0:
+        return None
+    return math.log(large / small) / math.log(sizes[-1] / sizes[-2])
+
+
+def compare(base: dict, head: dict, *, threshold: float) -> tuple[str, list[str]]:
+    lines = [f"{'case':<34}{'size':>8}{'base us':>12}{'head us':>12}{'time':>9}{'alloc':>9}"]
+    regressions = []
+    for name, sizes in head["results"].items():
+        base_sizes = base["results"].get(name)
+        if not base_sizes:
+            continue
+        for size, now in sizes.items():
+            then = base_sizes.get(size)
+            if not then:
+                continue
+            time_change = now["time_us"] / then["time_us"] - 1 if then["time_us"] else 0.0
+            base_alloc, head_alloc = then["alloc_peak_bytes"], now["alloc_peak_bytes"]
+            # Ignore a few hundred bytes of allocator noise on tiny inputs.
+            alloc_change = (head_alloc - base_alloc) / max(base_alloc, 1024)
+            flags = []
+            if time_change > threshold:
+                flags.append("slower")
+            if alloc_change > threshold:
+                flags.append("more memory")
+            if flags:
+                regressions.append(f"{name}@{size} ({', '.join(flags)})")
+            lines.append(f"{name:<34}{size:>8}{then['time_us']:>12.1f}{now['time_us']:>12.1f}"
+                         f"{time_change:>+9.0%}{alloc_change:>+9.0%}{'  REGRESSION' if flags else ''}")
+        before, after = scaling(base_sizes), scaling(sizes)
+        if before is not None and after is not None and after > max(1.3, before + 0.3):
+            regressions.append(f"{name} (growth exponent {before:.2f} -> {after:.2f})")
+    return "\n".join(lines), regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run")
+    compare_cmd = sub.add_parser("compare")
+    for cmd in (run_cmd, compare_cmd):
+        cmd.add_argument("--case", action="append", choices=sorted(CASES), help="repeatable; default all")
+        cmd.add_argument("--sizes", help=f"comma-separated (default {','.join(map(str, SIZES))})")
+        cmd.add_argument("--min-time", type=float, default=0.1, help="seconds per timing repeat")
+        cmd.add_argument("--repeat", type=int, default=5)
+    run_cmd.add_argument("--out", help="write results as JSON")
+    run_cmd.add_argument("--save", action="store_true", help=f"write results to {os.path.relpath(BASELINE, BACKEND)}")
+    compare_cmd.add_argument("base", nargs="?", default=BASELINE)
+    compare_cmd.add_argument("head", nargs="?", help="results file; default: run now")
+    compare_cmd.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")] if args.sizes else None
+    if args.command == "run":
+        report = run(args.case or list(CASES), sizes or list(SIZES), min_time=args.min_time, repeat=args.repeat)
+        for path in filter(None, (args.out, BASELINE if args.save else None)):
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2)
+                fh.write("\n")
+        return
+
+    with open(args.base, encoding="utf-8") as fh:
+        base = json.load(fh)
+    if args.head:
+        with open(args.head, encoding="utf-8") as fh:
+            head = json.load(fh)
+    else:
+        cases = args.case or [c for c in base["results"] if c in CASES]
+        head = run(cases, sizes or base["meta"]["sizes"], min_time=args.min_time, repeat=args.repeat)
+    text, regressions = compare(base, head, threshold=args.threshold)
+    print(text)
+    if regressions:
+        sys.exit("Regressions:\n  " + "\n  ".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Check the cost of `import app`, the first thing every new worker pays.
+
+    python benchmarks/bench_import.py                   # median of 5 fresh interpreters
+    python benchmarks/bench_import.py --budget-ms 600 --top 15
+
+Fails when the median import takes longer than the budget, when importing
+touches the database, or when it pulls in modules that should stay lazy
+(`requests` is only needed once a worker actually calls out).
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_MODULES = ("requests", "urllib3")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "ms": elapsed * 1000,
+    "eager": [m for m in {lazy!r} if m in sys.modules],
+    "default_app_built": app._default_app is not None,
+}}))
+"""
+
+
+def probe(db_path: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(lazy=LAZY_MODULES)],
+        cwd=BACKEND, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def heaviest_imports(top: int) -> list[tuple[float, str]]:
+    """Slowest top-level imports under `import app`, from `python -X importtime`."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                         cwd=BACKEND, capture_output=True, text=True, check=True)
+    rows: list[tuple[float, str]] = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            # Children are printed before their parent; everything since the last
+            # top-level line belongs to this one (interpreter startup imports do not).
+            if name.strip() == "app":
+                return sorted(rows, reverse=True)[:top]
+            rows = []
+        elif depth == 1:
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return []
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS", "800")))
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "untouched.db")
+        results = [probe(db_path) for _ in range(args.runs)]
+        touched_db = os.path.exists(db_path)
+    median = statistics.median(r["ms"] for r in results)
+    print(f"import app: median {median:.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    for ms, name in heaviest_imports(args.top):
+        print(f"  {ms:8.1f} ms  {name}")
+
+    problems = []
+    if median > args.budget_ms:
+        problems.append(f"import took {median:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    eager = sorted({m for r in results for m in r["eager"]})
+    if eager:
+        problems.append(f"imported eagerly: {', '.join(eager)}")
+    if touched_db or any(r["default_app_built"] for r in results):
+        problems.append("importing app built an app or touched the database; keep that in create_app()")
+    if problems:
+        sys.exit("FAIL: " + "; ".join(problems))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compare keyword/time matching strategies on long prompts and large keyword libraries.
+
+    python benchmarks/bench_keywords.py --chunks 200 --library 3000
+
+  substring  lowercase each chunk and test every keyword with `in`, plus
+             TIME_RE.search/sub and the `at` re.sub per chunk (the original code)
+  regex      one keyword alternation per chunk plus the same three time regexes
+             (the previous planner)
+  automaton  one KeywordAutomaton pass over the whole prompt (planner.py today)
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keywords import KeywordAutomaton  # noqa: E402
+from planner import KEYWORD_RULES, TIME_RE, _CHUNK_RE  # noqa: E402
+
+SENTENCES = (
+    "Homework for math at 4pm",
+    "Read two chapters before dinner",
+    "Soccer practice at 5:30 pm",
+    "Tidy the bedroom and fold laundry",
+    "Walk the dog around the block",
+    "Brush your teeth and get dressed",
+    "Study for the spelling test",
+    "Help set the table for supper at 6pm",
+    "Practice piano scales slowly",
+)
+
+
+def keyword_library(size: int) -> list[tuple[str, int]]:
+    """The real keywords followed by synthetic ones until `size` is reached."""
+    pairs = [(kw, rule.weight) for rule in KEYWORD_RULES for kw in rule.keywords]
+    rng = random.Random(7)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    while len(pairs) < size:
+        words = ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(rng.randint(1, 2))]
+        pairs.append((" ".join(words), rng.randint(1, 40)))
+    return pairs
+
+
+def long_prompt(chunks: int) -> str:
+    rng = random.Random(11)
+    return ". ".join(rng.choice(SENTENCES) for _ in range(chunks))
+
+
+def _chunks(prompt: str) -> list[str]:
+    return [m.group().strip(" ,") for m in _CHUNK_RE.finditer(prompt.replace(" - ", " . ")) if m.group().strip(" ,")]
+
+
+def _legacy_time(chunk: str):
+    match = TIME_RE.search(chunk)
+    if not match:
+        return None, chunk
+    cleaned = TIME_RE.sub("", chunk)
+    cleaned = re.sub(r"\bat\b", "", cleaned, flags=re.IGNORECASE)
+    return match, re.sub(r"\s+", " ", cleaned).strip(" ,")
+
+
+def make_substring(pairs):
+    ordered = sorted(pairs, key=lambda kv: -kv[1])
+
+    def run(prompt: str):
+        out = []
+        for chunk in _chunks(prompt):
+            match, cleaned = _legacy_time(chunk)
+            lower = cleaned.lower()
+            out.append((match, next((kw for kw, _ in ordered if kw in lower), None)))
+        return out
+    return run
+
+
+def make_regex(pairs):
+    weights = dict(pairs)
+    pattern = re.compile(
+        r"\b(" + "|".join(re.escape(k) for k in sorted(weights, key=len, reverse=True)) + r")(?:s|es|ing)?\b"
+    )
+
+    def run(prompt: str):
+        out = []
+        for chunk in _chunks(prompt):
+            match, cleaned = _legacy_time(chunk)
+            best = None
+            for m in pattern.finditer(cleaned.lower()):
+                if best is None or weights[m.group(1)] > weights[best]:
+                    best = m.group(1)
+            out.append((match, best))
+        return out
+    return run
+
+
+def make_automaton(pairs):
+    automaton = KeywordAutomaton((kw, (kw, weight)) for kw, weight in pairs)
+
+    def run(prompt: str):
+        return automaton.scan(prompt, time_re=TIME_RE)
+    return run
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[20, 200])
+    parser.add_argument("--library", type=int, nargs="+", default=[60, 1000, 5000])
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'keywords':>8} {'chunks':>6} {'substring':>12} {'regex':>12} {'automaton':>12}")
+    for size in args.library:
+        pairs = keyword_library(size)
+        runners = [make_substring(pairs), make_regex(pairs), make_automaton(pairs)]
+        for chunks in args.chunks:
+            prompt = long_prompt(chunks)
+            cells = []
+            for run in runners:
+                seconds = min(timeit.repeat(lambda: run(prompt), number=args.number, repeat=3))
+                cells.append(f"{seconds / args.number * 1e3:9.2f} ms")
+            print(f"{size:>8} {chunks:>6} " + " ".join(f"{c:>12}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
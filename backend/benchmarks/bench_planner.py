@@ -0,0 +1,52 @@
+"""
+Time the heuristic planner on a crowded day.
+
+    python benchmarks/bench_planner.py --blocks 100 --number 2000
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from planner import plan_tasks  # noqa: E402
+
+PROMPT = (
+    "Morning: breakfast, shower and get dressed. Homework for math and science. "
+    "Soccer practice at 4pm. Read a chapter. Tidy the bedroom; laundry. Dinner. Bedtime at 9pm"
+)
+
+
+def crowded_day(count: int) -> list[dict]:
+    """`count` 10-minute blocks spread over the day with 5-minute gaps between some."""
+    blocks = []
+    minute = 6 * 60
+    for idx in range(count):
+        start, end = minute, minute + 10
+        hour = start // 60
+        blocks.append({
+            "title": f"Block {idx}",
+            "startTime": f"{(hour % 12) or 12}:{start % 60:02d}",
+            "endTime": f"{((end // 60) % 12) or 12}:{end % 60:02d}",
+            "period": "PM" if hour >= 12 else "AM",
+        })
+        minute = end + (5 if idx % 3 else 0)
+    return blocks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=100)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    blocks = crowded_day(args.blocks)
+    for label, existing in (("empty day", None), (f"{args.blocks} blocks", blocks)):
+        seconds = min(timeit.repeat(lambda: plan_tasks(PROMPT, existing), number=args.number, repeat=5))
+        print(f"{label:>12}: {seconds / args.number * 1e6:8.1f} us/plan")
+
+
+if __name__ == "__main__":
+    main()
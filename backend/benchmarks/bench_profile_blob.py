@@ -0,0 +1,72 @@
+"""
+Row size and read/write cost of each users.profile_data storage format.
+
+    python benchmarks/bench_profile_blob.py
+    python benchmarks/bench_profile_blob.py --blocks 5800 --compress-min-bytes 4096 --level 6
+
+For each profile size and format this prints the stored size, the time to
+encode, the time to decode, the time to decode only the
+fields a home-screen list asks for (columnar rows skip the others; JSON is
+parsed whole), and the time to fetch the row from SQLite and decode it (what
+`_safe_profile_dict` pays on every request, minus sanitizing).
+"""
+from __future__ import annotations
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import profile_blob  # noqa: E402
+from bench_codec import SIZES, per_call, profile  # noqa: E402
+
+VARIANTS = (("json", False), ("json", True), ("columnar", False), ("columnar", True))
+# /profile?view=list&fields=title,startTime,endTime,period,completed (date is always read).
+LIST_FIELDS = ("title", "startTime", "endTime", "period", "completed", "date")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, action="append", help=f"repeatable (default {SIZES})")
+    parser.add_argument("--compress-min-bytes", type=int, default=1, help="threshold for the compressed variants")
+    parser.add_argument("--level", type=int, default=3, help="zlib level")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing repeat")
+    args = parser.parse_args()
+
+    print(f"{'blocks':>7}  {'format':<20}{'KiB':>9}{'size':>7}{'encode ms':>11}{'decode ms':>11}"
+          f"{'list decode':>13}{'fetch+decode':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "blobs.db"))
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, profile_data TEXT)")
+        for size in args.blocks or SIZES:
+            doc = profile(size)
+            base_len = None
+            for fmt, compressed in VARIANTS:
+                threshold = args.compress_min_bytes if compressed else 0
+                encode = lambda: profile_blob.encode(doc, fmt=fmt, compress_min_bytes=threshold,  # noqa: E731
+                                                     compress_level=args.level)
+                blob = encode()
+                if profile_blob.decode(blob) != doc:
+                    sys.exit(f"FAIL: {fmt} (compressed={compressed}) did not round-trip")
+                listed = [{k: b[k] for k in LIST_FIELDS if k in b} for b in doc["schedule_blocks"]]
+                projected = profile_blob.decode(blob, block_fields=LIST_FIELDS)["schedule_blocks"]
+                if [{k: b[k] for k in LIST_FIELDS if k in b} for b in projected] != listed:
+                    sys.exit(f"FAIL: {fmt} (compressed={compressed}) projected the wrong fields")
+                conn.execute("INSERT OR REPLACE INTO users VALUES (1, ?)", (blob,))
+                conn.commit()
+                fetch = lambda: profile_blob.decode(  # noqa: E731
+                    conn.execute("SELECT profile_data FROM users WHERE id = 1").fetchone()[0])
+                base_len = base_len or len(blob)
+                label = f"{fmt}{' + zlib' if compressed else ''}"
+                print(f"{size:>7}  {label:<20}{len(blob) / 1024:>9.1f}{len(blob) / base_len:>7.0%}"
+                      f"{per_call(encode, min_time=args.min_time) * 1e3:>11.2f}"
+                      f"{per_call(lambda: profile_blob.decode(blob), min_time=args.min_time) * 1e3:>11.2f}"
+                      f"{per_call(lambda: profile_blob.decode(blob, block_fields=LIST_FIELDS), min_time=args.min_time) * 1e3:>13.2f}"
+                      f"{per_call(fetch, min_time=args.min_time) * 1e3:>14.2f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Cost of saving a burst of schedule edits one at a time versus as one buffered batch.
+
+    python benchmarks/bench_profile_writes.py
+    python benchmarks/bench_profile_writes.py --blocks 5800 --edits 1 --edits 16
+
+For each profile size and burst length this times `_apply_profile_edits` called
+once per edit (what PROFILE_WRITE_COALESCE=0 does) against one call with the
+whole burst (one read, every edit in order, one write and one commit), on a
+SQLite file. It exits non-zero if the batch of a burst is not cheaper than
+saving its edits one by one.
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as backend  # noqa: E402
+from bench_codec import SIZES, profile  # noqa: E402
+
+EDITS = (1, 4, 16, 64)
+
+
+def append(idx: int):
+    def change(prof: dict) -> tuple[dict, int]:
+        prof["schedule_blocks"].append({"title": f"Burst {idx}", "date": "2030-01-01"})
+        return {"message": "Block add successful"}, 200
+    return change
+
+
+def timed(fn, *, min_time: float) -> float:
+    """Best of three runs of seconds per call, each run at least `min_time` long."""
+    best = float("inf")
+    for _ in range(3):
+        calls, start = 0, time.perf_counter()
+        while True:
+            fn()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, action="append", help=f"repeatable (default {SIZES[:3]})")
+    parser.add_argument("--edits", type=int, action="append", help=f"burst length, repeatable (default {EDITS})")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing run")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'blocks':>7}{'edits':>7}{'one by one ms':>15}{'batched ms':>12}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = backend.create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp, 'bench.db')}"})
+        with app.app_context():
+            for size in args.blocks or SIZES[:3]:
+                user = backend.User(username=f"bench{size}", password="unused", account_type="parent",
+                                    profile_data=backend._dump_profile(profile(size)))
+                backend.db.session.add(user)
+                backend.db.session.commit()
+                original = user.profile_data
+
+                def reset() -> None:
+                    user.profile_data = original
+                    backend.db.session.commit()
+
+                for count in args.edits or EDITS:
+                    edits = [backend._ProfileEdit(append(idx), app) for idx in range(count)]
+
+                    def one_by_one() -> None:
+                        for edit in edits:
+                            backend._apply_profile_edits(user.id, [edit])
+                        reset()
+
+                    def batched() -> None:
+                        backend._apply_profile_edits(user.id, edits)
+                        reset()
+
+                    single = timed(one_by_one, min_time=args.min_time)
+                    batch = timed(batched, min_time=args.min_time)
+                    print(f"{size:>7}{count:>7}{single * 1e3:>15.2f}{batch * 1e3:>12.2f}{single / batch:>8.1f}x")
+                    if count > 1 and batch >= single:
+                        failed = True
+    if failed:
+        sys.exit("FAIL: a batched burst was not cheaper than its edits saved one by one")
+
+
+if __name__ == "__main__":
+    main()
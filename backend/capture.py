@@ -0,0 +1,193 @@
+from __future__ import annotations
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+from typing import Iterable, Iterator
+
+from slowlog import BackgroundQueueHandler
+
+# Sanitized traffic capture for replay (python -m loadtest replay). Each request
+# becomes one compact JSON line:
+#
+#   {"t": 1718000000.123, "u": "u3f9a...", "m": "POST", "r": "/profile/block/edit",
+#    "p": "/profile/block/edit", "q": {...}, "b": {...}, "s": 200, "d": 12.5}
+#
+# Usernames become keyed pseudonyms, secrets are replaced by REDACTED, and free
+# text is rewritten word by word into same-length pseudo-words. Words the
+# planner reacts to, numbers and times are kept, so AI prompts still exercise
+# the same code paths. The mapping is deterministic for a given secret, so a
+# database snapshot pseudonymized with the same secret (loadtest snapshot)
+# still matches the block titles that captured edits refer to.
+
+REDACTED = "<redacted>"
+# Values kept verbatim: dates, times, flags and opaque ids.
+SAFE_KEYS = frozenset({
+    "date", "new_date", "startTime", "endTime", "start", "end", "start_time", "end_time", "period",
+    "hidden", "completed", "family_tag", "apply_to_family", "share_with_family", "action", "family_id",
+    "id", "scope", "status", "type", "role", "account_type", "preferred_role", "theme", "index",
+    "stream", "deploy", "requested_local_time", "requested_local_label",
+})
+IDENTITY_KEYS = frozenset({
+    "username", "new_username", "child_username", "target_child", "child", "creator_username", "owner_username",
+})
+SECRET_KEYS = frozenset({
+    "password", "new_password", "new_password_confirm", "confirm_password", "current_password",
+    "id_token", "access_token", "token", "email",
+})
+FUNCTION_WORDS = frozenset({
+    "a", "an", "and", "at", "by", "for", "from", "in", "of", "on", "or", "the", "then", "to", "until",
+    "after", "before", "am", "pm", "noon", "midnight", "morning", "afternoon", "evening", "night", "tonight",
+})
+_WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+class Pseudonymizer:
+    def __init__(self, secret: bytes, *, keep_words: Iterable[str] = ()):
+        self.secret = secret
+        self.keep_words = frozenset(w.lower() for w in keep_words) | FUNCTION_WORDS
+        self._words: dict[str, str] = {}
+
+    def _digest(self, kind: str, value: str) -> bytes:
+        return hmac.new(self.secret, f"{kind}:{value}".encode(), hashlib.sha256).digest()
+
+    def identity(self, username: str | None) -> str | None:
+        if not username:
+            return username
+        return "u" + self._digest("user", username).hex()[:15]
+
+    def _keep(self, word: str) -> bool:
+        lower = word.lower()
+        if lower in self.keep_words:
+            return True
+        return any(lower.endswith(s) and lower[: -len(s)] in self.keep_words for s in ("s", "es", "ing"))
+
+    def _word(self, word: str) -> str:
+        if self._keep(word):
+            return word
+        cached = self._words.get(word)
+        if cached is None:
+            digest = self._digest("word", word.lower())
+            cached = "".join(_LETTERS[digest[i % len(digest)] % 26] for i in range(len(word)))
+            if word[:1].isupper():
+                cached = cached.capitalize()
+            if len(self._words) < 100_000:
+                self._words[word] = cached
+        return cached
+
+    def text(self, value: str) -> str:
+        return _WORD_RE.sub(lambda m: self._word(m.group()), value)
+
+    def payload(self, value, key: str | None = None):
+        """Sanitized copy of a JSON value; `key` is the name it was stored under."""
+        if isinstance(value, dict):
+            return {k: self.payload(v, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.payload(v, key) for v in value]
+        if not isinstance(value, str):
+            return value
+        if key in SECRET_KEYS:
+            return REDACTED
+        if key in IDENTITY_KEYS:
+            return self.identity(value)
+        if key in SAFE_KEYS:
+            return value
+        return self.text(value)
+
+
+class CaptureFile(logging.Handler):
+    """
+    Writes each record's `context` as one JSON line. The file is opened lazily
+    in each process (gzip when the name ends in .gz), and `{pid}` in the path is
+    replaced so pre-forked workers never interleave writes in one file.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._fh = None
+        self._pid: int | None = None
+
+    def _open(self):
+        path = self.path.replace("{pid}", str(os.getpid()))
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if path.endswith(".gz"):
+            return gzip.open(path, "at", encoding="utf-8")
+        return open(path, "a", encoding="utf-8")
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self._pid != os.getpid():
+                self._fh, self._pid = self._open(), os.getpid()
+            self._fh.write(json.dumps(record.context, separators=(",", ":"), default=str) + "\n")
+            self._fh.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        if self._fh is not None and self._pid == os.getpid():
+            self._fh.close()
+            self._fh = None
+        super().close()
+
+
+class TrafficRecorder:
+    def __init__(self, path: str | None, *, secret: bytes, sample_rate: float = 1.0,
+                 keep_words: Iterable[str] = ()):
+        self.enabled = bool(path)
+        self.sample_rate = sample_rate
+        self.pseudonyms = Pseudonymizer(secret, keep_words=keep_words)
+        self._logger = logging.getLogger("stepsync.capture")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.handlers[:] = [BackgroundQueueHandler(CaptureFile(path))] if path else []
+
+    def sampled(self, pseudonym: str | None) -> bool:
+        """Sampling is per user, so each captured user's request sequence is complete."""
+        if self.sample_rate >= 1:
+            return True
+        if not pseudonym:
+            return False
+        return int(pseudonym[1:9], 16) / 0xFFFFFFFF < self.sample_rate
+
+    def record(self, *, started: float, username: str | None, method: str, route: str, path: str,
+               query: dict, body, status: int, duration: float) -> None:
+        pseudonym = self.pseudonyms.identity(username)
+        if not self.sampled(pseudonym):
+            return
+        event = {"t": round(started, 3), "u": pseudonym, "m": method, "r": route, "p": path}
+        if query:
+            event["q"] = self.pseudonyms.payload(query)
+        if body is not None:
+            event["b"] = self.pseudonyms.payload(body)
+        event["s"] = status
+        event["d"] = round(duration * 1000, 2)
+        self._logger.info("request", extra={"context": event})
+
+
+def read_events(paths: Iterable[str]) -> list[dict]:
+    """Events from one or more capture files, merged in time order. A truncated gzip tail is ignored."""
+    events: list[dict] = []
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as fh:
+            events.extend(_lines(fh))
+    events.sort(key=lambda e: e["t"])
+    return events
+
+
+def _lines(fh) -> Iterator[dict]:
+    try:
+        for line in fh:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    except EOFError:  # worker killed before the gzip trailer was written
+        return
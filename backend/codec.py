@@ -0,0 +1,94 @@
+from __future__ import annotations
+import json
+import os
+from typing import Any, Callable
+
+from flask.json.provider import DefaultJSONProvider
+
+# One JSON codec for profile blobs, template columns and HTTP responses. orjson
+# (C, several times faster on large profiles) is used when it is installed and
+# JSON_CODEC is not "stdlib"; otherwise the standard library. The stdlib path is
+# configured to write exactly what orjson writes (compact separators, UTF-8
+# rather than \u escapes), so rows and responses do not change with the backend.
+# Anything orjson refuses (integers past 64 bits, lone surrogates, NaN literals
+# in old rows) is retried with the stdlib, which raises the usual errors. The one
+# remaining difference: orjson writes non-finite floats as null, the stdlib as
+# NaN/Infinity; none of our payloads carry floats.
+
+try:
+    if os.environ.get("JSON_CODEC", "auto").strip().lower() == "stdlib":
+        raise ImportError
+    import orjson
+except ImportError:
+    orjson = None
+
+NAME = "orjson" if orjson is not None else "stdlib"
+
+
+def _stdlib_encode(obj: Any, *, sort_keys: bool, default: Callable | None) -> tuple[str, bytes]:
+    text = json.dumps(obj, separators=(",", ":"), ensure_ascii=False, sort_keys=sort_keys, default=default)
+    try:
+        return text, text.encode("utf-8")
+    except UnicodeEncodeError:
+        # Lone surrogates cannot be written as UTF-8; keep them as \u escapes.
+        text = json.dumps(obj, separators=(",", ":"), sort_keys=sort_keys, default=default)
+        return text, text.encode("ascii")
+
+
+def _orjson_encode(obj: Any, *, sort_keys: bool, default: Callable | None) -> bytes | None:
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if default is not None:
+        # Let `default` decide for these types, as json.dumps would.
+        option |= orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    try:
+        return orjson.dumps(obj, default=default, option=option)
+    except TypeError:
+        return None
+
+
+def dumps(obj: Any, *, sort_keys: bool = False, default: Callable | None = None) -> str:
+    if orjson is not None:
+        encoded = _orjson_encode(obj, sort_keys=sort_keys, default=default)
+        if encoded is not None:
+            return encoded.decode("utf-8")
+    return _stdlib_encode(obj, sort_keys=sort_keys, default=default)[0]
+
+
+def dumps_bytes(obj: Any, *, sort_keys: bool = False, default: Callable | None = None) -> bytes:
+    if orjson is not None:
+        encoded = _orjson_encode(obj, sort_keys=sort_keys, default=default)
+        if encoded is not None:
+            return encoded
+    return _stdlib_encode(obj, sort_keys=sort_keys, default=default)[1]
+
+
+def loads(data: str | bytes | bytearray) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """Flask's default provider (sorted keys, same type handling) on top of the codec."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, sort_keys=self.sort_keys, default=self.default)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)  # indented output for debugging
+        obj = self._prepare_response_obj(args, kwargs)
+        body = dumps_bytes(obj, sort_keys=self.sort_keys, default=self.default) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+import gzip
+import threading
+
+# Content-Encoding for HTTP responses. gzip is always available; zstd and br are
+# offered when the zstandard / brotli packages are installed. Levels default to
+# fast settings: on a schedule-sized JSON body they already get most of the size
+# win, while the top levels cost 5-50x the CPU for a few more percent.
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PREFERENCE = ("zstd", "br", "gzip")
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 5}
+
+_LOCAL = threading.local()
+
+
+def available() -> tuple[str, ...]:
+    """Encodings this process can produce, most preferred first."""
+    installed = {"zstd": zstandard is not None, "br": brotli is not None, "gzip": True}
+    return tuple(name for name in PREFERENCE if installed[name])
+
+
+def negotiate(accept_encoding: str | None, offered: tuple[str, ...]) -> str | None:
+    """
+    The encoding to answer an Accept-Encoding header with: the highest q-value among
+    `offered`, ties going to the earlier one in `offered`. None means send it as is.
+    """
+    if not accept_encoding or not offered:
+        return None
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    if "x-gzip" in weights:
+        weights.setdefault("gzip", weights["x-gzip"])
+    star = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in offered:
+        q = weights.get(name, star)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int | None = None) -> bytes:
+    if level is None:
+        level = DEFAULT_LEVELS[encoding]
+    if encoding == "gzip":
+        # mtime=0 keeps the output identical for identical input.
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == "br":
+        return brotli.compress(data, quality=level, mode=brotli.MODE_TEXT)
+    if encoding == "zstd":
+        # Compressor objects are not thread-safe; keep one per thread and level.
+        compressors = getattr(_LOCAL, "zstd", None)
+        if compressors is None:
+            compressors = _LOCAL.zstd = {}
+        compressor = compressors.get(level)
+        if compressor is None:
+            compressor = compressors[level] = zstandard.ZstdCompressor(level=level)
+        return compressor.compress(data)
+    raise ValueError(f"Unsupported content encoding {encoding!r}")
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "br":
+        return brotli.decompress(data)
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unsupported content encoding {encoding!r}")
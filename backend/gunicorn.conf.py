@@ -0,0 +1,78 @@
+"""
+Gunicorn settings for production (pip install gunicorn).
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Every setting can be overridden from the environment:
+
+    WEB_BIND                 address to listen on (default 0.0.0.0:8000)
+    WEB_CONCURRENCY          worker processes (default 2 x CPUs + 1)
+    WEB_THREADS              threads per worker (default 1, the sync worker)
+    WEB_TIMEOUT              seconds before a silent worker is killed and replaced (default 60)
+    WEB_GRACEFUL_TIMEOUT     seconds a worker gets to finish in-flight requests on reload or stop (default 30)
+    WEB_MAX_REQUESTS         recycle a worker after this many requests, 0 to disable (default 2000)
+    WEB_MAX_REQUESTS_JITTER  random extra requests so workers do not all restart together (default 200)
+    WEB_PIDFILE              master pid file, used by tools/worker_memory.py (default none)
+
+Reloading: `kill -HUP <master>` starts fresh workers and retires the old ones
+gracefully, but with preload_app they are forked from the code the master
+already holds. To deploy new code send USR2 (a new master starts next to the
+old one), then WINCH and TERM to the old master once the new one is serving.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("WEB_THREADS", "1"))
+worker_class = "gthread" if threads > 1 else "sync"
+timeout = int(os.environ.get("WEB_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.environ.get("WEB_MAX_REQUESTS_JITTER", "200"))
+pidfile = os.environ.get("WEB_PIDFILE") or None
+
+# Import the app once in the master (see wsgi.py) so workers start warm and share its pages.
+preload_app = True
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    # Snapshots left behind by a previous deploy's workers would be merged into /metrics forever.
+    metrics_dir = os.environ.get("METRICS_MULTIPROC_DIR")
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.startswith("metrics-"):
+                os.remove(os.path.join(metrics_dir, name))
+
+
+def post_fork(server, worker):
+    import app
+
+    # wsgi.py and asgi.py both serve the module's default app.
+    if app._default_app is not None:
+        app.reset_after_fork(app._default_app)
+
+
+def worker_exit(server, worker):
+    # Fold a recycled worker's counters into the shared aggregate and drop its snapshot,
+    # so the directory does not grow and a reused pid does not overwrite them.
+    from app import METRICS
+
+    try:
+        METRICS.mark_process_dead()
+    except OSError:
+        pass
+
+
+def child_exit(server, worker):
+    # Runs in the master, also for workers killed before worker_exit could run. Folds
+    # their last periodic snapshot; a no-op when worker_exit already did it.
+    from app import METRICS
+
+    try:
+        METRICS.mark_process_dead(worker.pid)
+    except OSError:
+        pass
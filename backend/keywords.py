@@ -0,0 +1,126 @@
+from __future__ import annotations
+import re
+from collections import deque
+from typing import Any, Iterable, NamedTuple
+
+# Aho-Corasick keyword automaton. Built once from (keyword, payload) pairs, it
+# reports every whole-word keyword occurrence in a single left-to-right pass,
+# regardless of how many keywords it holds. The same pass can also pick out
+# time expressions ("4pm", "7:30 a.m.") with an anchored regex tried only where
+# a digit starts, so callers never rescan the text.
+
+_DEFAULT_SUFFIXES = ("s", "es", "ing")
+
+
+class Hit(NamedTuple):
+    start: int
+    end: int
+    kind: str  # "keyword" or "time"
+    value: Any  # keyword payload, or the re.Match of a time expression
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def fold_case(text: str) -> str:
+    """Lowercase `text` without changing its length, so hit offsets index the original."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+
+
+class KeywordAutomaton:
+    """
+    Whole-word, case-insensitive multi-keyword matcher.
+
+    A keyword only matches between word boundaries, optionally followed by one
+    of `suffixes` ("chore" also matches "chores"). Adding the same keyword twice
+    keeps the first payload, so callers control priority by insertion order.
+    """
+
+    def __init__(self, keywords: Iterable[tuple[str, Any]], *, suffixes: Iterable[str] = _DEFAULT_SUFFIXES):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[tuple[int, ...]] = [()]
+        self._lengths: list[int] = []
+        self._payloads: list[Any] = []
+        self._suffixes = tuple(sorted(set(suffixes), key=len, reverse=True))
+        seen: set[str] = set()
+        for keyword, payload in keywords:
+            keyword = " ".join(keyword.lower().split())
+            if not keyword or keyword in seen:
+                continue
+            seen.add(keyword)
+            self._add(keyword, payload)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def _add(self, keyword: str, payload: Any) -> None:
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = (len(self._payloads),)
+        self._lengths.append(len(keyword))
+        self._payloads.append(payload)
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _word_end(self, text: str, end: int) -> int | None:
+        """Where a keyword ending at `end` stops once a suffix is allowed for, or None."""
+        if end == len(text) or not _is_word(text[end]):
+            return end
+        for suffix in self._suffixes:
+            stop = end + len(suffix)
+            if text.startswith(suffix, end) and (stop == len(text) or not _is_word(text[stop])):
+                return stop
+        return None
+
+    def scan(self, text: str, *, time_re: re.Pattern | None = None) -> list[Hit]:
+        """All hits in `text`, ordered by where they end; time hits never overlap each other."""
+        folded = fold_case(text)
+        goto, fail, out, lengths, payloads = self._goto, self._fail, self._out, self._lengths, self._payloads
+        hits: list[Hit] = []
+        state = 0
+        time_until = 0
+        for idx, ch in enumerate(folded):
+            if time_re is not None and idx >= time_until and ch.isdigit():
+                match = time_re.match(text, idx)
+                if match:
+                    hits.append(Hit(idx, match.end(), "time", match))
+                    time_until = match.end()
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = idx + 1
+            for kw in out[state]:
+                start = end - lengths[kw]
+                if start and _is_word(folded[start - 1]):
+                    continue
+                stop = self._word_end(folded, end)
+                if stop is not None:
+                    hits.append(Hit(start, stop, "keyword", payloads[kw]))
+        return hits
@@ -0,0 +1,4 @@
+"""
+Load-test harness for the backend: synthetic families, scripted client
+scenarios and per-endpoint latency reports. See `python -m loadtest --help`.
+"""
@@ -0,0 +1,170 @@
+"""
+Seed a synthetic dataset, drive scripted clients against a running backend,
+and compare the per-endpoint results of two runs.
+
+    python -m loadtest seed --db /tmp/loadtest.db --families 50 --years 2
+    DATABASE_URL=sqlite:////tmp/loadtest.db RATE_LIMIT_ENABLED=0 flask run
+    python -m loadtest run --base-url http://127.0.0.1:5000 --clients 32 --duration 60 --out before.json
+    python -m loadtest compare before.json after.json --threshold 0.1
+
+Replaying captured production traffic (see CAPTURE_FILE in app.py) instead:
+
+    python -m loadtest snapshot --source prod-users.db --dest /tmp/replay.db   # uses $CAPTURE_SECRET
+    DATABASE_URL=sqlite:////tmp/replay.db RATE_LIMIT_ENABLED=0 flask run
+    python -m loadtest replay capture-*.jsonl.gz --speed 0 --out build-a.json
+
+Run the server with RATE_LIMIT_ENABLED=0; otherwise the limits, not the code
+under test, decide the numbers.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+from dataclasses import fields
+
+from capture import Pseudonymizer, read_events
+from planner import vocabulary
+
+from .dataset import DatasetConfig, seed_database
+from .replay import captured_latency, replay
+from .report import build_report, compare, format_report
+from .runner import run
+from .scenarios import SCENARIOS
+from .snapshot import snapshot
+
+
+def _scenario_weights(spec: str | None) -> dict:
+    if not spec:
+        return SCENARIOS
+    chosen = {}
+    for part in spec.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in SCENARIOS:
+            sys.exit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        chosen[name] = (SCENARIOS[name][0], float(weight or SCENARIOS[name][1]))
+    return chosen
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    seed_cmd = sub.add_parser("seed", help="create a fresh SQLite database of synthetic families")
+    seed_cmd.add_argument("--db", required=True)
+    seed_cmd.add_argument("--accounts", default="loadtest-accounts.json", help="manifest written for `run`")
+    for f in fields(DatasetConfig):
+        seed_cmd.add_argument(f"--{f.name.replace('_', '-')}", type=type(f.default), default=f.default)
+
+    run_cmd = sub.add_parser("run", help="drive scripted clients against a running server")
+    run_cmd.add_argument("--base-url", default="http://127.0.0.1:5000")
+    run_cmd.add_argument("--accounts", default="loadtest-accounts.json")
+    run_cmd.add_argument("--clients", type=int, default=16)
+    run_cmd.add_argument("--duration", type=float, default=30.0, help="seconds")
+    run_cmd.add_argument("--think-time", type=float, default=0.0, help="mean pause between scenarios, seconds")
+    run_cmd.add_argument("--scenarios", help="e.g. child_completion_toggle=5,routine_deploy=1 (default: all)")
+    run_cmd.add_argument("--seed", type=int, default=1)
+    run_cmd.add_argument("--label", help="free-form tag stored in the report, e.g. a branch name")
+    run_cmd.add_argument("--out", help="write the JSON report here")
+
+    snapshot_cmd = sub.add_parser("snapshot", help="pseudonymized copy of a SQLite database for replay")
+    snapshot_cmd.add_argument("--source", required=True)
+    snapshot_cmd.add_argument("--dest", required=True)
+    snapshot_cmd.add_argument("--secret", default=os.environ.get("CAPTURE_SECRET"),
+                              help="the server's CAPTURE_SECRET (default: $CAPTURE_SECRET)")
+    snapshot_cmd.add_argument("--password", default="replay-pass", help="password given to every account")
+
+    replay_cmd = sub.add_parser("replay", help="re-drive captured traffic against a running server")
+    replay_cmd.add_argument("captures", nargs="+", help="capture files (.jsonl or .jsonl.gz)")
+    replay_cmd.add_argument("--base-url", default="http://127.0.0.1:5000")
+    replay_cmd.add_argument("--password", default="replay-pass", help="the password used for `snapshot`")
+    replay_cmd.add_argument("--speed", type=float, default=1.0, help="1 = captured pacing, 0 = as fast as possible")
+    replay_cmd.add_argument("--clients", type=int, default=16)
+    replay_cmd.add_argument("--limit", type=int, help="only the first N events")
+    replay_cmd.add_argument("--label")
+    replay_cmd.add_argument("--out", help="write the JSON report here")
+
+    compare_cmd = sub.add_parser("compare", help="diff two run reports")
+    compare_cmd.add_argument("base")
+    compare_cmd.add_argument("head")
+    compare_cmd.add_argument("--metric", default="p95_ms")
+    compare_cmd.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before failing")
+    compare_cmd.add_argument("--min-count", type=int, default=20, help="ignore endpoints with fewer samples")
+
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        cfg = DatasetConfig(**{f.name: getattr(args, f.name) for f in fields(DatasetConfig)})
+        manifest = seed_database(args.db, cfg, args.accounts)
+        print(f"Seeded {manifest['database']}: {manifest['counts']}")
+        print(f"Accounts written to {args.accounts}")
+        return
+
+    if args.command == "run":
+        with open(args.accounts, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+        scenarios = _scenario_weights(args.scenarios)
+        recorder, elapsed = run(args.base_url, manifest, scenarios, clients=args.clients,
+                                duration=args.duration, seed=args.seed, think_time=args.think_time)
+        report = build_report(recorder, elapsed, {
+            "label": args.label,
+            "base_url": args.base_url,
+            "clients": args.clients,
+            "duration_s": args.duration,
+            "think_time_s": args.think_time,
+            "seed": args.seed,
+            "scenarios": {name: weight for name, (_, weight) in scenarios.items()},
+            "dataset": {"families": len(manifest["families"]), "seed": manifest.get("seed"),
+                        **manifest.get("counts", {})},
+        })
+        print(format_report(report))
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2)
+        return
+
+    if args.command == "snapshot":
+        if not args.secret:
+            sys.exit("Pass --secret or set CAPTURE_SECRET to the value the capturing server used.")
+        counts = snapshot(args.source, args.dest, Pseudonymizer(args.secret.encode(), keep_words=vocabulary()),
+                          password=args.password)
+        print(f"Wrote {args.dest}: {counts}")
+        return
+
+    if args.command == "replay":
+        events = read_events(args.captures)[: args.limit]
+        if not events:
+            sys.exit("No events in the capture files.")
+        recorder, elapsed = replay(args.base_url, events, password=args.password, speed=args.speed,
+                                   clients=args.clients)
+        report = build_report(recorder, elapsed, {
+            "label": args.label,
+            "mode": "replay",
+            "base_url": args.base_url,
+            "captures": args.captures,
+            "events": len(events),
+            "captured_span_s": round(events[-1]["t"] - events[0]["t"], 3),
+            "speed": args.speed,
+            "clients": args.clients,
+        })
+        report["captured"] = captured_latency(events)
+        print(format_report(report))
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2)
+        return
+
+    with open(args.base, encoding="utf-8") as fh:
+        base = json.load(fh)
+    with open(args.head, encoding="utf-8") as fh:
+        head = json.load(fh)
+    text, regressions = compare(base, head, metric=args.metric, threshold=args.threshold,
+                                  min_count=args.min_count)
+    print(text)
+    if regressions:
+        sys.exit(f"{len(regressions)} endpoint(s) regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+from __future__ import annotations
+import json
+import os
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+
+# Synthetic families written straight into the app's database. Everything is
+# derived from `seed`, so two runs with the same parameters produce the same
+# users, schedules, templates and routines.
+
+TASKS = [
+    ("Breakfast", ["Eat breakfast", "Clear the table"], 7, 20),
+    ("Brush teeth", ["Brush for two minutes", "Rinse"], 7, 10),
+    ("Get dressed", ["Pick clothes", "Get dressed"], 7, 15),
+    ("Pack backpack", ["Homework folder", "Lunch", "Water bottle"], 8, 10),
+    ("Homework", ["Math worksheet", "Reading log", "Check answers"], 16, 45),
+    ("Soccer practice", ["Cleats", "Shin guards", "Water"], 17, 60),
+    ("Piano practice", ["Scales", "Current piece"], 18, 30),
+    ("Tidy bedroom", ["Make bed", "Put clothes away", "Clear desk"], 18, 20),
+    ("Feed the dog", ["Fill bowl", "Fresh water"], 18, 5),
+    ("Dinner", ["Set the table", "Eat dinner", "Help clean up"], 19, 40),
+    ("Read a chapter", ["Pick a book", "Read for 20 minutes"], 20, 25),
+    ("Bedtime", ["Pajamas", "Brush teeth", "Lights out"], 20, 15),
+]
+
+
+@dataclass
+class DatasetConfig:
+    families: int = 20
+    parents: int = 2
+    children: int = 2
+    years: float = 1.0
+    blocks_per_day: int = 4
+    templates: int = 5
+    routines: int = 3
+    seed: int = 1
+    password: str = "loadtest-pass"
+
+
+def _clock(minutes: int) -> tuple[str, str]:
+    hour = (minutes // 60) % 24
+    return f"{(hour % 12) or 12}:{minutes % 60:02d}", "PM" if hour >= 12 else "AM"
+
+
+def make_block(rng: random.Random, day: str, *, completed: bool = False, family_tag: str = "") -> dict:
+    title, steps, hour, length = rng.choice(TASKS)
+    start = hour * 60 + rng.choice((0, 15, 30))
+    start_time, period = _clock(start)
+    end_time, _ = _clock(start + length)
+    return {
+        "title": title,
+        "startTime": start_time,
+        "endTime": end_time,
+        "period": period,
+        "steps": list(steps),
+        "hidden": False,
+        "completed": completed,
+        "family_tag": family_tag,
+        "date": day,
+    }
+
+
+def _days(years: float, today: date) -> list[str]:
+    first = today - timedelta(days=int(years * 365))
+    return [(first + timedelta(days=n)).isoformat() for n in range((today - first).days + 31)]
+
+
+def make_schedules(rng: random.Random, cfg: DatasetConfig, members: int, today: date) -> list[list[dict]]:
+    """Schedules for [master, *children]: one shared family block a day plus personal ones."""
+    schedules: list[list[dict]] = [[] for _ in range(members)]
+    for day in _days(cfg.years, today):
+        past = day < today.isoformat()
+        if cfg.blocks_per_day:
+            shared = make_block(rng, day, family_tag=f"fam-{rng.getrandbits(64):016x}")
+            for idx, blocks in enumerate(schedules):
+                done = past and (idx == 0 or rng.random() < 0.8)
+                blocks.append(dict(shared, steps=list(shared["steps"]), completed=done))
+        for blocks in schedules:
+            for _ in range(max(0, cfg.blocks_per_day - 1)):
+                blocks.append(make_block(rng, day, completed=past and rng.random() < 0.8))
+    return schedules
+
+
+def _profile(blocks: list[dict]) -> str:
+    return json.dumps({"schedule_blocks": blocks, "preferences": {}, "favorites": []})
+
+
+def generate(cfg: DatasetConfig, *, now: datetime | None = None):
+    """
+    Yield (table, rows) batches plus the account manifest as the final item. Dates
+    are laid out around `now` (default: the current UTC time), which is also the
+    value used for every timestamp column.
+    """
+    rng = random.Random(cfg.seed)
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    today = now.date()
+    manifest: dict = {"password": cfg.password, "seed": cfg.seed, "families": []}
+    for f in range(cfg.families):
+        family_id = f"LT{f:06d}"
+        parents = [f"lt{f}_parent{i}" for i in range(max(1, cfg.parents))]
+        children = [f"lt{f}_child{i}" for i in range(cfg.children)]
+        free_child = f"lt{f}_free"
+        schedules = make_schedules(rng, cfg, 1 + len(children), today)
+        users = []
+        for idx, name in enumerate(parents):
+            users.append({
+                "username": name, "email": f"{name}@loadtest.invalid", "display_name": name.title(),
+                "account_type": "parent", "family_id": family_id, "family_joined_at": now,
+                "profile_data": _profile(schedules[0] if idx == 0 else []),
+            })
+        for idx, name in enumerate(children):
+            users.append({
+                "username": name, "email": None, "display_name": name.title(),
+                "account_type": "child", "family_id": family_id, "family_joined_at": now,
+                "profile_data": _profile(schedules[idx + 1]),
+            })
+        users.append({
+            "username": free_child, "email": None, "display_name": free_child.title(),
+            "account_type": "child", "family_id": None, "family_joined_at": None,
+            "profile_data": _profile([]),
+        })
+        yield "users", users
+        yield "families", [{
+            "family_id": family_id, "name": f"Load Test Family {f}", "creator_username": parents[0],
+        }]
+        templates = []
+        for t in range(cfg.templates):
+            title, steps, hour, length = rng.choice(TASKS)
+            start_time, period = _clock(hour * 60)
+            end_time, _ = _clock(hour * 60 + length)
+            templates.append({
+                "id": uuid.UUID(int=rng.getrandbits(128)).hex, "owner_username": parents[t % len(parents)],
+                "family_id": family_id, "scope": "family" if t % 2 else "personal",
+                "title": f"{title} #{t}", "steps_json": json.dumps(steps),
+                "start_time": start_time, "end_time": end_time, "period": period, "created_at": now,
+            })
+        yield "task_templates", templates
+        routines = []
+        for r in range(cfg.routines):
+            tasks = []
+            for _ in range(rng.randint(3, 6)):
+                task = make_block(rng, "")
+                del task["date"], task["family_tag"]
+                tasks.append(task)
+            routines.append({
+                "id": uuid.UUID(int=rng.getrandbits(128)).hex, "owner_username": parents[0],
+                "title": f"Routine {r}", "description": "Generated by loadtest",
+                "tasks_json": json.dumps(tasks), "created_at": now, "updated_at": now,
+            })
+        yield "routine_templates", routines
+        manifest["families"].append({
+            "family_id": family_id,
+            "parents": parents,
+            "children": children,
+            "free_child": free_child,
+        })
+    yield "manifest", manifest
+
+
+def seed_database(db_path: str, cfg: DatasetConfig, manifest_path: str) -> dict:
+    """Create a fresh SQLite database at `db_path` through the app's own models."""
+    db_path = os.path.abspath(db_path)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    import app as backend
+
+    flask_app = backend.create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}"})
+
+    tables = {
+        "users": backend.User,
+        "families": backend.Family,
+        "task_templates": backend.TaskTemplateEntry,
+        "routine_templates": backend.RoutineTemplateEntry,
+    }
+    hashed = backend._hash_password(cfg.password)
+    counts = {name: 0 for name in tables}
+    blocks = 0
+    manifest: dict = {}
+    with flask_app.app_context():
+        session = backend.db.session
+        for table, rows in generate(cfg):
+            if table == "manifest":
+                manifest = rows
+                continue
+            if not rows:
+                continue
+            if table in ("users", "families"):
+                for row in rows:
+                    row["password"] = hashed
+            if table == "users":
+                blocks += sum(len(json.loads(r["profile_data"])["schedule_blocks"]) for r in rows)
+            session.execute(tables[table].__table__.insert(), rows)
+            counts[table] += len(rows)
+        session.commit()
+    manifest["database"] = db_path
+    manifest["counts"] = dict(counts, schedule_blocks=blocks)
+    with open(manifest_path, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    return manifest
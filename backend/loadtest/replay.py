@@ -0,0 +1,99 @@
+from __future__ import annotations
+import threading
+import time
+
+from capture import REDACTED
+
+from .report import percentile
+from .runner import Client, Recorder, Tokens
+
+# Re-drives captured traffic. Each pseudonymous user is pinned to one worker
+# thread, so a user's requests keep their original order while different users
+# overlap the way they did in production. A sample counts as an error when the
+# replayed status differs from the captured one.
+
+_PASSWORD_KEYS = ("password", "new_password", "new_password_confirm", "confirm_password", "current_password")
+_TOKENLESS_ROUTES = ("/login", "/login/google", "/register")
+
+
+def _restore_passwords(value, password: str):
+    if isinstance(value, dict):
+        return {
+            k: password if k in _PASSWORD_KEYS and v == REDACTED else _restore_passwords(v, password)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [_restore_passwords(v, password) for v in value]
+    return value
+
+
+def _assign(events: list[dict], workers: int) -> list[list[dict]]:
+    lanes: list[list[dict]] = [[] for _ in range(max(1, workers))]
+    slots: dict[str, int] = {}
+    anonymous = 0
+    for event in events:
+        user = event.get("u")
+        if user:
+            slot = slots.setdefault(user, len(slots) % len(lanes))
+        else:
+            slot, anonymous = anonymous % len(lanes), anonymous + 1
+        lanes[slot].append(event)
+    return lanes
+
+
+def replay(base_url: str, events: list[dict], *, password: str, speed: float = 1.0,
+           clients: int = 16) -> tuple[Recorder, float]:
+    """`speed` 1.0 keeps the captured pacing, 2.0 doubles it, 0 sends as fast as possible."""
+    recorder = Recorder()
+    tokens = Tokens(password)
+    first = events[0]["t"] if events else 0.0
+    errors: list[BaseException] = []
+
+    def worker(lane: list[dict]) -> None:
+        client = Client(base_url, recorder)
+        login_client = Client(base_url, Recorder())  # token fetches are not part of the replayed mix
+        try:
+            for event in lane:
+                if speed > 0:
+                    delay = started + (event["t"] - first) / speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                token = None
+                if event.get("u") and event["r"] not in _TOKENLESS_ROUTES:
+                    token = tokens.get(login_client, event["u"])
+                kwargs = {}
+                if "q" in event:
+                    kwargs["params"] = event["q"]
+                if "b" in event:
+                    kwargs["json"] = _restore_passwords(event["b"], password)
+                client.call(event["m"], event["p"], token=token, expect=(event["s"],),
+                            label=f"{event['m']} {event['r']}", **kwargs)
+        except BaseException as exc:
+            errors.append(exc)
+
+    lanes = [lane for lane in _assign(events, clients) if lane]
+    threads = [threading.Thread(target=worker, args=(lane,), daemon=True) for lane in lanes]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return recorder, time.perf_counter() - started
+
+
+def captured_latency(events: list[dict]) -> dict[str, dict]:
+    """Latency the production server reported for each route while capturing."""
+    by_route: dict[str, list[float]] = {}
+    for event in events:
+        by_route.setdefault(f"{event['m']} {event['r']}", []).append(event.get("d") or 0.0)
+    summary = {}
+    for name, values in sorted(by_route.items()):
+        values.sort()
+        summary[name] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50), 3),
+            "p95_ms": round(percentile(values, 95), 3),
+        }
+    return summary
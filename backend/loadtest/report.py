@@ -0,0 +1,95 @@
+from __future__ import annotations
+import math
+import os
+import platform
+import subprocess
+from collections import Counter
+
+from .runner import Recorder, Sample
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _summary(samples: list[Sample], elapsed: float) -> dict:
+    latencies = sorted(s.latency * 1000 for s in samples)
+    errors = sum(1 for s in samples if not s.ok)
+    stats = {
+        "count": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+    }
+    for pct in PERCENTILES:
+        stats[f"p{pct}_ms"] = round(percentile(latencies, pct), 3)
+    stats["max_ms"] = round(latencies[-1], 3) if latencies else 0.0
+    stats["status"] = {str(code): n for code, n in sorted(Counter(s.status for s in samples).items())}
+    return stats
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def build_report(recorder: Recorder, elapsed: float, params: dict) -> dict:
+    everything = [s for samples in recorder.samples.values() for s in samples]
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "elapsed_s": round(elapsed, 3),
+            **params,
+        },
+        "total": _summary(everything, elapsed),
+        "endpoints": {name: _summary(samples, elapsed) for name, samples in sorted(recorder.samples.items())},
+    }
+
+
+def format_report(report: dict) -> str:
+    header = f"{'endpoint':<34}{'count':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    lines = [header, "-" * len(header)]
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, s in rows:
+        lines.append(f"{name:<34}{s['count']:>8}{s['errors']:>6}{s['rps']:>9.1f}"
+                     f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}")
+    return "\n".join(lines)
+
+
+def compare(base: dict, head: dict, *, metric: str = "p95_ms", threshold: float = 0.10,
+            min_count: int = 20) -> tuple[str, list[str]]:
+    """Side-by-side `metric` per endpoint; endpoints slower by more than `threshold` are regressions.
+
+    Endpoints with fewer than `min_count` samples in either run are shown but never flagged.
+    """
+    lines = [f"{'endpoint':<34}{'base':>10}{'head':>10}{'change':>9}   ({metric}, "
+             f"{base['meta'].get('commit')} -> {head['meta'].get('commit')})"]
+    regressions = []
+    for name in sorted(set(base["endpoints"]) | set(head["endpoints"])):
+        a, b = base["endpoints"].get(name), head["endpoints"].get(name)
+        if not a or not b:
+            lines.append(f"{name:<34}{'-' if not a else a[metric]:>10}{'-' if not b else b[metric]:>10}")
+            continue
+        change = (b[metric] - a[metric]) / a[metric] if a[metric] else 0.0
+        flag = ""
+        if min(a["count"], b["count"]) < min_count:
+            flag = "  (few samples)"
+        elif change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        lines.append(f"{name:<34}{a[metric]:>10.1f}{b[metric]:>10.1f}{change:>+9.1%}{flag}")
+    a, b = base["total"], head["total"]
+    lines.append(f"{'throughput (req/s)':<34}{a['rps']:>10.1f}{b['rps']:>10.1f}")
+    return "\n".join(lines), regressions
@@ -0,0 +1,115 @@
+from __future__ import annotations
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import requests
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    status: int
+    ok: bool
+    latency: float
+    started: float
+
+
+@dataclass
+class Recorder:
+    """Thread-safe sink for request samples, grouped by endpoint label."""
+
+    samples: dict[str, list[Sample]] = field(default_factory=lambda: defaultdict(list))
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, sample: Sample) -> None:
+        with self._lock:
+            self.samples[sample.endpoint].append(sample)
+
+
+class Client:
+    """One virtual user's HTTP session. Every call is timed under `label`, by default `METHOD /route`."""
+
+    def __init__(self, base_url: str, recorder: Recorder, *, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def call(self, method: str, route: str, *, token: str | None = None, expect: tuple[int, ...] = (200,),
+             label: str | None = None, **kwargs):
+        headers = kwargs.pop("headers", {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        started = time.perf_counter()
+        try:
+            resp = self.session.request(method, self.base_url + route, headers=headers, timeout=self.timeout, **kwargs)
+            status = resp.status_code
+        except requests.RequestException:
+            resp, status = None, 0
+        ok = status in expect
+        self.recorder.add(Sample(label or f"{method} {route}", status, ok, time.perf_counter() - started, started))
+        if not ok:
+            return None
+        try:
+            return resp.json()
+        except ValueError:
+            return {}
+
+
+class Tokens:
+    """Logs each account in once and shares the JWT between virtual users."""
+
+    def __init__(self, password: str):
+        self.password = password
+        self._tokens: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, client: Client, username: str) -> str | None:
+        with self._lock:
+            token = self._tokens.get(username)
+        if token:
+            return token
+        body = client.call("POST", "/login", json={"username": username, "password": self.password})
+        token = (body or {}).get("token")
+        if token:
+            with self._lock:
+                self._tokens[username] = token
+        return token
+
+
+def run(base_url: str, manifest: dict, scenarios: dict, *, clients: int, duration: float,
+        seed: int = 1, think_time: float = 0.0) -> tuple[Recorder, float]:
+    """Run `clients` virtual users for `duration` seconds, each looping over weighted scenarios."""
+    recorder = Recorder()
+    tokens = Tokens(manifest["password"])
+    families = manifest["families"]
+    names = list(scenarios)
+    weights = [scenarios[name][1] for name in names]
+    deadline = time.perf_counter() + duration
+    errors: list[BaseException] = []
+
+    def virtual_user(index: int) -> None:
+        rng = random.Random(seed * 100003 + index)
+        client = Client(base_url, recorder)
+        family = families[index % len(families)]
+        try:
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                scenarios[name][0](client, tokens, family, rng)
+                if think_time:
+                    time.sleep(rng.uniform(0, 2 * think_time))
+        except BaseException as exc:  # surface scenario bugs instead of silently idling
+            errors.append(exc)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=virtual_user, args=(i,), daemon=True) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return recorder, time.perf_counter() - started
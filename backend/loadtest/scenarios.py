@@ -0,0 +1,102 @@
+from __future__ import annotations
+import random
+from datetime import datetime, timedelta, timezone
+
+from .dataset import make_block
+from .runner import Client, Tokens
+
+# Scripted user journeys mirroring what the Flutter app sends. Each scenario
+# gets its family from the manifest and a per-virtual-user RNG; a failed call
+# ends the scenario early (the failure is already recorded).
+
+
+def _day(offset: int = 0) -> str:
+    return (datetime.now(timezone.utc).date() + timedelta(days=offset)).isoformat()
+
+
+def parent_morning_planning(client: Client, tokens: Tokens, family: dict, rng: random.Random) -> None:
+    """Parent opens today's schedule, browses templates and family, adds a family-wide task."""
+    parent = rng.choice(family["parents"])
+    token = tokens.get(client, parent)
+    if not token:
+        return
+    today = _day()
+    if client.call("GET", "/profile", token=token, params={"date": today}) is None:
+        return
+    client.call("GET", "/templates", token=token)
+    client.call("GET", "/family/members", token=token)
+    block = make_block(rng, today)
+    client.call("POST", "/profile/block/add", token=token,
+                json={"block": block, "date": today, "apply_to_family": bool(family["children"])})
+    client.call("GET", "/profile", token=token, params={"date": today})
+
+
+# What child_home_page asks for; naming fields also returns each block's index.
+_CHILD_FIELDS = "title,startTime,endTime,period,steps,hidden,completed,family_tag,date"
+
+
+def child_completion_toggle(client: Client, tokens: Tokens, family: dict, rng: random.Random) -> None:
+    """Child loads today and flips a task's completed flag, as child_home_page does."""
+    if not family["children"]:
+        return
+    token = tokens.get(client, rng.choice(family["children"]))
+    if not token:
+        return
+    today = _day()
+    profile = client.call("GET", "/profile", token=token, params={"date": today, "fields": _CHILD_FIELDS})
+    blocks = (profile or {}).get("schedule_blocks") or []
+    if not blocks:
+        return
+    block = rng.choice(blocks)
+    body = {"date": today, "completed": not block.get("completed")}
+    if block.get("family_tag"):
+        body["family_tag"] = block["family_tag"]
+    else:
+        body.update(index=block["index"], title=block.get("title"))
+    client.call("POST", "/profile/block/complete", token=token, json=body)
+
+
+def routine_deploy(client: Client, tokens: Tokens, family: dict, rng: random.Random) -> None:
+    """Parent picks a saved routine and adds each of its tasks to an upcoming day."""
+    token = tokens.get(client, rng.choice(family["parents"]))
+    if not token:
+        return
+    body = client.call("GET", "/routines", token=token)
+    routines = (body or {}).get("routines") or []
+    if not routines:
+        return
+    target: dict = {}
+    if family["children"] and rng.random() < 0.5:
+        target["target_child"] = rng.choice(family["children"])
+    day = _day(rng.randint(1, 30))
+    for task in rng.choice(routines).get("tasks") or []:
+        payload = dict(target, block=dict(task, date=day), date=day)
+        if client.call("POST", "/profile/block/add", token=token, json=payload) is None:
+            return
+    client.call("GET", "/profile", token=token, params=dict(target, date=day))
+
+
+def invite_flow(client: Client, tokens: Tokens, family: dict, rng: random.Random) -> None:
+    """Parent invites the family's unattached child, who checks invites and declines."""
+    parent_token = tokens.get(client, rng.choice(family["parents"]))
+    child_token = tokens.get(client, family["free_child"])
+    if not parent_token or not child_token:
+        return
+    if client.call("POST", "/family/invite", token=parent_token, json={"child_username": family["free_child"]}) is None:
+        return
+    body = client.call("GET", "/family/invite/my", token=child_token)
+    for invite in (body or {}).get("invites") or []:
+        if invite.get("family_id") == family["family_id"]:
+            # Concurrent virtual users share the free child, so another may have answered first.
+            client.call("POST", "/family/invite/respond", token=child_token, expect=(200, 404),
+                        json={"family_id": family["family_id"], "action": "reject"})
+            break
+
+
+# name -> (scenario, weight)
+SCENARIOS = {
+    "parent_morning_planning": (parent_morning_planning, 3),
+    "child_completion_toggle": (child_completion_toggle, 5),
+    "routine_deploy": (routine_deploy, 1),
+    "invite_flow": (invite_flow, 1),
+}
@@ -0,0 +1,103 @@
+from __future__ import annotations
+import json
+import os
+import sqlite3
+
+from werkzeug.security import generate_password_hash
+
+from capture import Pseudonymizer
+import codec
+import profile_blob
+
+# Copy of a production SQLite database rewritten the same way captured traffic
+# is: usernames become pseudonyms, free text is pseudo-worded, and every
+# account gets one known password so the replayer can log in as anyone.
+
+
+def _json(pseudonyms: Pseudonymizer, text: str | None, key: str | None = None) -> str | None:
+    if not text:
+        return text
+    try:
+        return json.dumps(pseudonyms.payload(json.loads(text), key))
+    except ValueError:
+        return None
+
+
+def _profile(pseudonyms: Pseudonymizer, blob: str | None) -> str | None:
+    """Profiles come back as plain JSON whatever format they were stored in; see `flask convert-profiles`."""
+    if not blob:
+        return blob
+    try:
+        return codec.dumps(pseudonyms.payload(profile_blob.decode(blob)))
+    except ValueError:
+        return None
+
+
+def _tables(conn: sqlite3.Connection) -> set[str]:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def snapshot(source: str, dest: str, pseudonyms: Pseudonymizer, *, password: str) -> dict[str, int]:
+    if os.path.abspath(source) == os.path.abspath(dest):
+        raise ValueError("Refusing to pseudonymize the source database in place.")
+    if os.path.exists(dest):
+        os.remove(dest)
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    conn = sqlite3.connect(dest)
+    try:
+        src.backup(conn)
+    finally:
+        src.close()
+    hashed = generate_password_hash(password)
+    ident = pseudonyms.identity
+    text = lambda value: pseudonyms.text(value) if value else value  # noqa: E731
+    counts: dict[str, int] = {}
+    tables = _tables(conn)
+    with conn:
+        if "users" in tables:
+            rows = conn.execute("SELECT id, username, display_name, profile_data FROM users").fetchall()
+            conn.executemany(
+                "UPDATE users SET username = ?, email = NULL, display_name = ?, password = ?,"
+                " auth_provider = 'password', profile_data = ? WHERE id = ?",
+                [(ident(u), text(name), hashed, _profile(pseudonyms, blob), pk) for pk, u, name, blob in rows],
+            )
+            counts["users"] = len(rows)
+        if "families" in tables:
+            rows = conn.execute("SELECT id, creator_username, name FROM families").fetchall()
+            conn.executemany(
+                "UPDATE families SET creator_username = ?, name = ?, password = ? WHERE id = ?",
+                [(ident(u), text(name), hashed, pk) for pk, u, name in rows],
+            )
+            counts["families"] = len(rows)
+        for table in ("family_invites", "family_leave_requests"):
+            if table in tables:
+                rows = conn.execute(f"SELECT id, child_username FROM {table}").fetchall()
+                conn.executemany(f"UPDATE {table} SET child_username = ? WHERE id = ?",
+                                 [(ident(u), pk) for pk, u in rows])
+                counts[table] = len(rows)
+        if "task_templates" in tables:
+            rows = conn.execute("SELECT id, owner_username, title, steps_json FROM task_templates").fetchall()
+            conn.executemany(
+                "UPDATE task_templates SET owner_username = ?, title = ?, steps_json = ? WHERE id = ?",
+                [(ident(u), text(title), _json(pseudonyms, steps, "steps") or "[]", pk)
+                 for pk, u, title, steps in rows],
+            )
+            counts["task_templates"] = len(rows)
+        if "routine_templates" in tables:
+            rows = conn.execute(
+                "SELECT id, owner_username, title, description, tasks_json FROM routine_templates"
+            ).fetchall()
+            conn.executemany(
+                "UPDATE routine_templates SET owner_username = ?, title = ?, description = ?, tasks_json = ?"
+                " WHERE id = ?",
+                [(ident(u), text(title), text(desc), _json(pseudonyms, tasks) or "[]", pk)
+                 for pk, u, title, desc, tasks in rows],
+            )
+            counts["routine_templates"] = len(rows)
+        if "block_states" in tables:
+            rows = conn.execute("SELECT id, title FROM block_states").fetchall()
+            conn.executemany("UPDATE block_states SET title = ? WHERE id = ?", [(text(title), pk) for pk, title in rows])
+            counts["block_states"] = len(rows)
+    conn.execute("VACUUM")
+    conn.close()
+    return counts
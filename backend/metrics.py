@@ -0,0 +1,337 @@
+from __future__ import annotations
+import atexit
+import bisect
+import contextlib
+import glob
+import json
+import math
+import os
+import threading
+import time
+from typing import Callable, Iterable
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+# Small Prometheus-compatible metrics registry (counters, gauges, histograms)
+# rendered in the text exposition format.
+#
+# Under several worker processes (gunicorn) set `multiprocess_dir`: every
+# process periodically writes its own snapshot to <dir>/metrics-<pid>.json and
+# whichever worker answers /metrics merges all snapshots. When a worker exits,
+# mark_process_dead() folds its counters and histograms into
+# <dir>/metrics-aggregate.json and deletes its snapshot (its gauges are dropped),
+# so totals never go backwards, the directory does not grow with every recycled
+# worker, and a reused pid starts from zero. Clear the directory when the server starts.
+
+AGGREGATE_FILE = "metrics-aggregate.json"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Child:
+    __slots__ = ("_metric", "_key")
+
+    def __init__(self, metric: "_Metric", key: tuple[str, ...]):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount: float = 1.0) -> None:
+        metric = self._metric
+        with metric._lock:
+            metric._values[self._key] = metric._values.get(self._key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def set(self, value: float) -> None:
+        """Gauges, or counters that mirror a cumulative count kept elsewhere."""
+        with self._metric._lock:
+            self._metric._values[self._key] = float(value)
+
+    def observe(self, value: float) -> None:
+        metric = self._metric
+        idx = bisect.bisect_left(metric.buckets, value)
+        with metric._lock:
+            counts = metric._values.get(self._key)
+            if counts is None:
+                counts = metric._values[self._key] = [0] * (len(metric.buckets) + 1) + [0.0]
+            counts[idx] += 1
+            counts[-1] += value
+
+
+class _Metric:
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets)) if kind == "histogram" else ()
+        self._values: dict[tuple[str, ...], object] = {}
+        self._children: dict[tuple[str, ...], _Child] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> _Child:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._children.setdefault(key, _Child(self, key))
+        return child
+
+    # Unlabelled shortcuts
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = [[list(k), list(v) if isinstance(v, list) else v] for k, v in self._values.items()]
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labels": list(self.labelnames),
+            "buckets": list(self.buckets),
+            "samples": samples,
+        }
+
+
+class Registry:
+    def __init__(self, *, multiprocess_dir: str | None = None, flush_interval: float = 5.0):
+        self._metrics: dict[str, _Metric] = {}
+        self._callbacks: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_interval = flush_interval
+        self._flusher_pid: int | None = None
+        self._flush_lock = threading.Lock()
+        self._dead = False
+        if multiprocess_dir:
+            os.makedirs(multiprocess_dir, exist_ok=True)
+            atexit.register(self.flush)
+
+    def _register(self, kind: str, name: str, documentation: str, labelnames=(), **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = _Metric(kind, name, documentation, labelnames, **kwargs)
+            elif metric.kind != kind:
+                raise ValueError(f"Metric {name} already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> _Metric:
+        return self._register("counter", name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> _Metric:
+        return self._register("gauge", name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> _Metric:
+        return self._register("histogram", name, documentation, labelnames, buckets=buckets)
+
+    def on_collect(self, callback: Callable[[], None]) -> None:
+        """Run `callback` before every snapshot, e.g. to copy counters kept by another object."""
+        self._callbacks.append(callback)
+
+    def snapshot(self) -> dict:
+        for callback in self._callbacks:
+            callback()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    # ---- multi-process ----
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.multiprocess_dir, f"metrics-{pid}.json")
+
+    @contextlib.contextmanager
+    def _dir_lock(self, exclusive: bool):
+        """Serializes folding a dead worker into the aggregate against readers of the directory."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.multiprocess_dir, "metrics.lock"), "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def flush(self) -> None:
+        if not self.multiprocess_dir:
+            return
+        with self._flush_lock:
+            if self._dead:
+                return
+            _write_json(self._path(os.getpid()), self.snapshot())
+
+    def mark_process_dead(self, pid: int | None = None) -> None:
+        """
+        Fold an exited worker's counters and histograms into the aggregate file and
+        delete its snapshot. Without `pid`, this process's final values are folded in
+        and it stops flushing (call it last, e.g. from gunicorn's worker_exit).
+        """
+        if not self.multiprocess_dir:
+            return
+        own = pid is None or pid == os.getpid()
+        pid = os.getpid() if own else pid
+        path = self._path(pid)
+        with self._flush_lock if own else contextlib.nullcontext():
+            if own:
+                if self._dead:
+                    return
+                self._dead = True
+            with self._dir_lock(exclusive=True):
+                if own:
+                    snapshot = self.snapshot()
+                else:
+                    snapshot = _read_json(path)
+                    if snapshot is None and not os.path.exists(path):
+                        return  # already folded, e.g. by the worker itself
+                merged: dict[str, dict] = {}
+                for part in (_read_json(self._aggregate_path()), snapshot):
+                    if part:
+                        _merge(merged, part, alive=False)
+                _write_json(self._aggregate_path(), {
+                    name: {**metric, "samples": [[list(k), v] for k, v in metric["samples"].items()]}
+                    for name, metric in merged.items()
+                })
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+
+    def _aggregate_path(self) -> str:
+        return os.path.join(self.multiprocess_dir, AGGREGATE_FILE)
+
+    def start_flusher(self) -> None:
+        """Flush this process's snapshot every `flush_interval` seconds; safe to call per request."""
+        if not self.multiprocess_dir or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+
+        def loop() -> None:
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        threading.Thread(target=loop, name="metrics-flush", daemon=True).start()
+
+    def _collect_snapshots(self) -> list[tuple[dict, bool]]:
+        """(snapshot, alive) for this process and, in multi-process mode, every other worker."""
+        own = os.getpid()
+        snapshots = [(self.snapshot(), True)]
+        if not self.multiprocess_dir:
+            return snapshots
+        with self._dir_lock(exclusive=False):
+            aggregate = _read_json(self._aggregate_path())
+            if aggregate:
+                snapshots.append((aggregate, False))
+            for path in glob.glob(os.path.join(self.multiprocess_dir, "metrics-*.json")):
+                try:
+                    pid = int(os.path.basename(path)[8:-5])
+                except ValueError:
+                    continue
+                if pid == own:
+                    continue
+                snapshot = _read_json(path)
+                if snapshot is not None:
+                    snapshots.append((snapshot, _pid_alive(pid)))
+        return snapshots
+
+    def render(self) -> str:
+        merged: dict[str, dict] = {}
+        for snapshot, alive in self._collect_snapshots():
+            _merge(merged, snapshot, alive=alive)
+        lines: list[str] = []
+        for name in sorted(merged):
+            lines.extend(_render_metric(name, merged[name]))
+        return "\n".join(lines) + "\n"
+
+
+def _merge(merged: dict[str, dict], snapshot: dict, *, alive: bool) -> None:
+    """Add `snapshot` into `merged`, whose samples are keyed by label tuple. Dead processes' gauges are skipped."""
+    for name, metric in snapshot.items():
+        if metric["kind"] == "gauge" and not alive:
+            continue
+        target = merged.setdefault(name, {**metric, "samples": {}})
+        samples = target["samples"]
+        for labels, value in metric["samples"]:
+            key = tuple(labels)
+            if isinstance(value, list):
+                current = samples.get(key)
+                samples[key] = value if current is None else [a + b for a, b in zip(current, value)]
+            else:
+                samples[key] = samples.get(key, 0.0) + value
+
+
+def _read_json(path: str) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra: tuple[str, str] | None = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _render_metric(name: str, metric: dict) -> list[str]:
+    lines = [f"# HELP {name} {metric['help']}", f"# TYPE {name} {metric['kind']}"]
+    names = metric["labels"]
+    for labels, value in sorted(metric["samples"].items()):
+        if metric["kind"] != "histogram":
+            lines.append(f"{name}{_label_str(names, labels)} {_number(value)}")
+            continue
+        cumulative = 0
+        for bound, count in zip(list(metric["buckets"]) + [math.inf], value[:-1]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_label_str(names, labels, ('le', _number(bound)))} {cumulative}")
+        lines.append(f"{name}_sum{_label_str(names, labels)} {_number(value[-1])}")
+        lines.append(f"{name}_count{_label_str(names, labels)} {cumulative}")
+    return lines
@@ -0,0 +1,416 @@
+from __future__ import annotations
+import bisect
+import json
+import os
+import re
+from dataclasses import dataclass
+
+from keywords import KeywordAutomaton
+
+# Rule-based task planner used when no LLM answers (and as the last provider in
+# the AI chain). It splits the prompt into chunks, picks steps and a duration
+# for each chunk from a weighted keyword table, and places the chunks into the
+# gaps between the blocks already scheduled on the target day.
+
+TIME_RE = re.compile(
+    r'(?P<hour>1[0-2]|0?[1-9])(?::(?P<minute>[0-5][0-9]))?\s*(?P<period>a\.?m\.?|p\.?m\.?|am|pm)',
+    re.IGNORECASE,
+)
+
+DAY_MINUTES = 24 * 60
+DEFAULT_MINUTES = 45
+_UNTIMED_BLOCK_MINUTES = 30
+
+
+@dataclass(frozen=True)
+class KeywordRule:
+    keywords: tuple[str, ...]
+    steps: tuple[str, ...]
+    minutes: int
+    weight: int
+
+
+# When several keywords appear in one chunk the highest weight wins; ties go to
+# the keyword that appears first.
+KEYWORD_RULES: tuple[KeywordRule, ...] = (
+    KeywordRule(
+        ("homework", "assignment"),
+        ("Gather notebooks and assignment list",
+         "Work through each subject with focus blocks",
+         "Review answers and pack everything away"),
+        minutes=60, weight=50,
+    ),
+    KeywordRule(
+        ("study", "revise", "revision", "exam"),
+        ("Review class notes or slides",
+         "Work through practice problems",
+         "Summarize what was learned"),
+        minutes=45, weight=45,
+    ),
+    KeywordRule(
+        ("exercise", "workout", "soccer", "gym"),
+        ("Warm up and stretch",
+         "Complete the main workout",
+         "Cool down and hydrate"),
+        minutes=45, weight=40,
+    ),
+    KeywordRule(
+        ("breakfast",),
+        ("Set the table and gather ingredients",
+         "Prepare and eat breakfast",
+         "Clear dishes and wipe counters"),
+        minutes=30, weight=35,
+    ),
+    KeywordRule(
+        ("dinner", "supper"),
+        ("Prep ingredients and cookware",
+         "Cook and plate the meal",
+         "Clean the kitchen and store leftovers"),
+        minutes=60, weight=35,
+    ),
+    KeywordRule(
+        ("lunch",),
+        ("Pack or prepare lunch",
+         "Eat lunch",
+         "Clean up the table"),
+        minutes=30, weight=30,
+    ),
+    KeywordRule(
+        ("chores", "clean", "tidy", "laundry", "dishes"),
+        ("Collect supplies for the chore",
+         "Work through each area methodically",
+         "Tidy up and put supplies back"),
+        minutes=30, weight=25,
+    ),
+    KeywordRule(
+        ("read", "reading"),
+        ("Pick a book and a quiet spot",
+         "Read for the planned time",
+         "Note anything interesting you learned"),
+        minutes=30, weight=20,
+    ),
+    KeywordRule(
+        ("shower", "bath", "brush teeth"),
+        ("Gather towel and clothes",
+         "Wash up",
+         "Hang up the towel and tidy the bathroom"),
+        minutes=15, weight=15,
+    ),
+    KeywordRule(
+        ("bedtime", "go to bed", "sleep"),
+        ("Put on pajamas",
+         "Brush teeth and set out tomorrow's clothes",
+         "Lights out"),
+        minutes=20, weight=10,
+    ),
+)
+
+_FILLER = "at"  # dropped from titles next to a time ("soccer at 4pm")
+
+# Phrases taken from the app's premade templates and routines (regenerate with
+# tools/build_keyword_catalog.py). They outrank the generic rules above because
+# they are more specific, but never replace a generic rule's own keyword.
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "keyword_catalog.json")
+CATALOG_WEIGHT = 60
+
+
+def build_automaton(rules) -> KeywordAutomaton:
+    """Earlier rules keep any keyword a later rule repeats."""
+    pairs = [(keyword, rule) for rule in rules for keyword in rule.keywords]
+    pairs.append((_FILLER, _FILLER))
+    return KeywordAutomaton(pairs)
+
+
+def _in_text_order(hits: list) -> list:
+    return sorted(hits, key=lambda h: h.start)
+
+
+def _best_rule(hits) -> KeywordRule | None:
+    """Highest weight wins; ties go to the keyword that starts first (`hits` are in text order)."""
+    best: KeywordRule | None = None
+    for hit in hits:
+        rule = hit.value
+        if hit.kind == "keyword" and rule is not _FILLER and (best is None or rule.weight > best.weight):
+            best = rule
+    return best
+
+
+def load_catalog(path: str = CATALOG_PATH) -> tuple[KeywordRule, ...]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            entries = json.load(fh)
+    except (OSError, ValueError):
+        return ()
+    generic = build_automaton(KEYWORD_RULES)
+    rules: list[KeywordRule] = []
+    for entry in entries:
+        keywords = tuple(k for k in entry.get("keywords") or () if isinstance(k, str) and k.strip())
+        if not keywords:
+            continue
+        # Routine tasks carry no steps; borrow them from the generic rule the title matches.
+        fallback = _best_rule(_in_text_order(generic.scan(entry.get("title") or keywords[0])))
+        steps = tuple(entry.get("steps") or (fallback.steps if fallback else ()))
+        minutes = entry.get("minutes") or (fallback.minutes if fallback else DEFAULT_MINUTES)
+        rules.append(KeywordRule(keywords, steps, int(minutes), CATALOG_WEIGHT))
+    return tuple(rules)
+
+
+CATALOG_RULES = load_catalog()
+_AUTOMATON = build_automaton(KEYWORD_RULES + CATALOG_RULES)
+
+
+def vocabulary() -> frozenset[str]:
+    """Every word that appears in a keyword, e.g. to keep when pseudonymizing prompts."""
+    return frozenset(
+        word
+        for rule in KEYWORD_RULES + CATALOG_RULES
+        for keyword in rule.keywords
+        for word in keyword.lower().split()
+    ) | {_FILLER}
+
+
+def match_rule(text: str) -> KeywordRule | None:
+    """Best keyword rule for `text`."""
+    return _best_rule(_in_text_order(_AUTOMATON.scan(text)))
+
+
+_CHUNK_RE = re.compile(r'[^.\n;]+')
+
+
+@dataclass
+class _Chunk:
+    start: int
+    end: int
+    hits: list
+
+
+def _ai_chunks(text: str) -> list[_Chunk]:
+    chunks: list[_Chunk] = []
+    for match in _CHUNK_RE.finditer(text):
+        start, end = match.span()
+        while start < end and text[start] in " ,":
+            start += 1
+        while end > start and text[end - 1] in " ,":
+            end -= 1
+        if start < end:
+            chunks.append(_Chunk(start, end, []))
+    return chunks
+
+
+def _analyze(prompt: str) -> tuple[str, list[_Chunk]]:
+    """
+    Split the prompt into chunks and attach every keyword and time hit to its chunk,
+    using a single automaton pass over the whole prompt.
+    """
+    text = prompt.replace(' - ', ' . ')  # same length, so hit offsets stay valid
+    chunks = _ai_chunks(text)
+    if not chunks:
+        return text, chunks
+    hits = _in_text_order(_AUTOMATON.scan(text, time_re=TIME_RE))
+    idx = 0
+    for hit in hits:
+        while idx < len(chunks) and chunks[idx].end <= hit.start:
+            idx += 1
+        if idx == len(chunks):
+            break
+        chunk = chunks[idx]
+        if hit.start >= chunk.start:
+            # "4pm." matches with its trailing dot, so clip hits to the chunk.
+            chunk.hits.append(hit if hit.end <= chunk.end else hit._replace(end=chunk.end))
+    return text, chunks
+
+
+def _time_and_title_text(text: str, chunk: _Chunk) -> tuple[int | None, int | None, str]:
+    """(hour24, minute, chunk text without time expressions) for a chunk."""
+    raw = text[chunk.start:chunk.end]
+    times = [h for h in chunk.hits if h.kind == "time"]
+    if not times:
+        return None, None, raw
+    match = times[0].value
+    hour = int(match.group('hour'))
+    minute = int(match.group('minute') or 0)
+    period = match.group('period').lower()
+    if period.startswith('p') and hour != 12:
+        hour += 12
+    if period.startswith('a') and hour == 12:
+        hour = 0
+    cut = times + [h for h in chunk.hits if h.value is _FILLER and h.end - h.start == len(_FILLER)]
+    pieces: list[str] = []
+    pos = chunk.start
+    for hit in _in_text_order(cut):
+        if hit.start >= pos:
+            pieces.append(text[pos:hit.start])
+            pos = hit.end
+    pieces.append(text[pos:chunk.end])
+    cleaned = " ".join("".join(pieces).split()).strip(' ,')
+    return hour, minute, cleaned if cleaned else raw
+
+
+def _starting_clock(prompt: str) -> tuple[int, int]:
+    lower = prompt.lower()
+    if "evening" in lower or "night" in lower:
+        return 18, 0
+    if "afternoon" in lower or "after school" in lower:
+        return 13, 0
+    if "morning" in lower or "before school" in lower or "wake" in lower:
+        return 7, 0
+    return 8, 0
+
+
+def _format_time(hour24: int, minute: int) -> tuple[str, str]:
+    period = 'PM' if hour24 >= 12 else 'AM'
+    hour12 = hour24 % 12
+    if hour12 == 0:
+        hour12 = 12
+    return f"{hour12}:{minute:02d}", period
+
+
+def _title_from_chunk(chunk: str, index: int) -> str:
+    cleaned = re.sub(r'[^A-Za-z0-9 &/:-]', '', chunk).strip()
+    if not cleaned:
+        cleaned = f"Task {index + 1}"
+    return cleaned[:60].strip().title()
+
+
+def _generic_steps(title: str) -> list[str]:
+    topic = title.lower()
+    return [
+        f"Plan what is needed for {topic}",
+        f"Work through the main part of {topic}",
+        f"Review progress and clean up after {topic}",
+    ]
+
+
+_CLOCK_RE = re.compile(r'^\s*(\d{1,2})(?::(\d{2}))?\s*([ap])?', re.IGNORECASE)
+
+
+def _clock_minutes(value, period: str | None) -> int | None:
+    match = _CLOCK_RE.match(str(value or ""))
+    if not match:
+        return None
+    hour = int(match.group(1))
+    minute = int(match.group(2) or 0)
+    if hour > 23 or minute > 59:
+        return None
+    marker = (match.group(3) or (period or "")[:1]).upper()
+    if marker and hour <= 12:
+        hour %= 12
+        if marker == "P":
+            hour += 12
+    return hour * 60 + minute
+
+
+def block_interval(block: dict) -> tuple[int, int] | None:
+    """Minutes-since-midnight (start, end) of a schedule block, or None when it has no start."""
+    period = (block.get("period") or "").strip().upper() or None
+    start = _clock_minutes(block.get("startTime"), period)
+    if start is None:
+        return None
+    end = _clock_minutes(block.get("endTime"), period)
+    if end is None:
+        end = start + _UNTIMED_BLOCK_MINUTES
+    elif end <= start:
+        # Blocks carry one period; "11:30"-"12:15" AM really ends after noon.
+        end += 12 * 60
+        if end <= start:
+            end = start + _UNTIMED_BLOCK_MINUTES
+    return start, min(end, DAY_MINUTES)
+
+
+def _merge(spans: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    merged: list[tuple[int, int]] = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def busy_intervals(blocks: list[dict] | None) -> list[tuple[int, int]]:
+    """Sorted, merged busy intervals for a day's blocks."""
+    return _merge(sorted(
+        span for span in (block_interval(b) for b in (blocks or []) if isinstance(b, dict))
+        if span is not None
+    ))
+
+
+def find_gap(busy: list[tuple[int, int]], earliest: int, minutes: int) -> int | None:
+    """First start >= `earliest` where `minutes` fit before midnight without touching `busy`."""
+    ends = [end for _, end in busy]
+    idx = bisect.bisect_right(ends, earliest)
+    candidate = earliest
+    for start, end in busy[idx:]:
+        if candidate + minutes <= start:
+            return candidate
+        candidate = max(candidate, end)
+    if candidate + minutes <= DAY_MINUTES:
+        return candidate
+    return None
+
+
+def is_free(busy: list[tuple[int, int]], start: int, end: int) -> bool:
+    """True when [start, end) doesn't overlap any of the sorted, merged `busy` intervals."""
+    idx = bisect.bisect_right(busy, (start, DAY_MINUTES))
+    if idx and busy[idx - 1][1] > start:
+        return False
+    return idx == len(busy) or busy[idx][0] >= end
+
+
+def _reserve(busy: list[tuple[int, int]], start: int, end: int) -> None:
+    bisect.insort(busy, (start, end))
+    busy[:] = _merge(busy)
+
+
+def plan_tasks(prompt: str, existing_blocks: list[dict] | None = None, *, max_items: int = 8) -> list[dict]:
+    """
+    Turn a free-text prompt into up to `max_items` tasks. Chunks with an explicit
+    time ("soccer at 4pm") are pinned there, or moved to the next free gap when that
+    slot is taken; every other chunk goes into the first gap after the previous task
+    that is long enough for its inferred duration. Chunks that don't fit before
+    midnight are dropped.
+    """
+    text, chunks = _analyze(prompt)
+    if not chunks:
+        text = "Plan the day. Focus block. Wrap up and reflect"
+        chunks = _ai_chunks(text)
+
+    hour, minute = _starting_clock(prompt)
+    cursor = hour * 60 + minute
+    busy = busy_intervals(existing_blocks)
+    tasks: list[dict] = []
+
+    for idx, chunk in enumerate(chunks[:max_items]):
+        custom_hour, custom_minute, cleaned_chunk = _time_and_title_text(text, chunk)
+        rule = _best_rule(chunk.hits)
+        minutes = rule.minutes if rule else DEFAULT_MINUTES
+
+        if custom_hour is not None:
+            start = custom_hour * 60 + custom_minute
+            end = min(start + minutes, DAY_MINUTES)
+            if not is_free(busy, start, end):
+                start = find_gap(busy, start, minutes)
+                end = start + minutes if start is not None else None
+        else:
+            start = find_gap(busy, cursor, minutes)
+            end = start + minutes if start is not None else None
+        if start is None:
+            continue
+        _reserve(busy, start, end)
+
+        title = _title_from_chunk(cleaned_chunk, idx)
+        start_str, period = _format_time(start // 60 % 24, start % 60)
+        end_str, _ = _format_time(end // 60 % 24, end % 60)
+        tasks.append({
+            "title": title,
+            "steps": list(rule.steps) if rule else _generic_steps(title),
+            "startTime": start_str,
+            "endTime": end_str,
+            "period": period,
+            "hidden": False,
+            "completed": False,
+        })
+        cursor = end
+
+    return tasks
@@ -0,0 +1,134 @@
+from __future__ import annotations
+import base64
+import binascii
+import zlib
+from collections.abc import Collection, Mapping
+from typing import Any
+
+import codec
+
+# Storage formats for users.profile_data. Every format is text, so the column
+# keeps working on any database, and every format but the original starts with a
+# version tag, so rows written by any release still decode:
+#
+#   {...}          v0  the profile as JSON
+#   c1:{...}       v1  key-dictionary ("columnar") JSON, below
+#   z1:<base64>    v1  any of the above, zlib-compressed and base64-encoded
+#
+# The columnar form writes each distinct list of block keys once, under
+# "shapes", and each block as its values followed by the index of its shape:
+#
+#   {"shapes": [["title", "startTime", ...]],
+#    "profile": {"schedule_blocks": [["Breakfast", "7:00", ..., 0], ...], "preferences": {...}}}
+#
+# Keys, key order and values round-trip exactly. Columnar halves the text but
+# rebuilding the block dicts costs Python time on decode; compression shrinks a
+# profile 10-20x for a few milliseconds per write. See benchmarks/bench_profile_blob.py.
+#
+# decode(..., block_fields=...) builds columnar blocks with only those keys. JSON
+# blocks come back whole: the parser has built them already, and trimming every
+# block costs more than it saves, so callers trim the few they actually return.
+# `counts` ({"steps": "step_count"}) adds the length of a list field under another
+# key, so a projection can report how many steps a block has without carrying them.
+
+COLUMNAR_TAG = "c1:"
+COMPRESSED_TAG = "z1:"
+FORMATS = ("json", "columnar")
+
+
+def encode(profile: dict, *, fmt: str = "json", compress_min_bytes: int = 0, compress_level: int = 3) -> str:
+    """`compress_min_bytes` 0 never compresses; otherwise blobs at least that long are."""
+    text = None
+    if fmt == "columnar":
+        columnar = _to_columnar(profile)
+        if columnar is not None:
+            text = COLUMNAR_TAG + codec.dumps(columnar)
+    elif fmt != "json":
+        raise ValueError(f"Unknown profile blob format {fmt!r}; expected one of {', '.join(FORMATS)}.")
+    if text is None:
+        text = codec.dumps(profile)
+    if compress_min_bytes and len(text) >= compress_min_bytes:
+        packed = zlib.compress(text.encode("utf-8"), compress_level)
+        return COMPRESSED_TAG + base64.b64encode(packed).decode("ascii")
+    return text
+
+
+def decode(text: str | bytes, *, block_fields: Collection[str] | None = None,
+           counts: Mapping[str, str] | None = None) -> Any:
+    """Any stored format back to the profile; raises ValueError on damaged blobs."""
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+    if text.startswith(COMPRESSED_TAG):
+        try:
+            text = zlib.decompress(base64.b64decode(text[len(COMPRESSED_TAG):], validate=True)).decode("utf-8")
+        except (zlib.error, binascii.Error) as exc:
+            raise ValueError(f"Damaged compressed profile blob: {exc}") from exc
+    if text.startswith(COLUMNAR_TAG):
+        return _from_columnar(codec.loads(text[len(COLUMNAR_TAG):]), block_fields, counts)
+    doc = codec.loads(text)
+    if counts and block_fields is not None and isinstance(doc, dict) and isinstance(doc.get("schedule_blocks"), list):
+        for block in doc["schedule_blocks"]:
+            if isinstance(block, dict):
+                for field, key in counts.items():
+                    block[key] = _length(block.get(field))
+    return doc
+
+
+def describe(text: str | None) -> str:
+    """The format tag of a stored blob: "json", "columnar", "compressed" or "empty"."""
+    if not text:
+        return "empty"
+    if text.startswith(COMPRESSED_TAG):
+        return "compressed"
+    if text.startswith(COLUMNAR_TAG):
+        return "columnar"
+    return "json"
+
+
+def _to_columnar(profile: dict) -> dict | None:
+    blocks = profile.get("schedule_blocks")
+    if not isinstance(blocks, list) or not all(isinstance(b, dict) for b in blocks):
+        return None
+    shapes: dict[tuple, int] = {}
+    rows = []
+    for block in blocks:
+        keys = tuple(block)
+        idx = shapes.get(keys)
+        if idx is None:
+            idx = shapes[keys] = len(shapes)
+        row = list(block.values())
+        row.append(idx)
+        rows.append(row)
+    return {
+        "shapes": [list(keys) for keys in shapes],
+        "profile": {k: rows if k == "schedule_blocks" else v for k, v in profile.items()},
+    }
+
+
+def _length(value: Any) -> int:
+    return len(value) if isinstance(value, list) else 0
+
+
+def _from_columnar(doc: dict, block_fields: Collection[str] | None = None,
+                   counts: Mapping[str, str] | None = None) -> dict:
+    shapes = doc["shapes"]
+    profile = doc["profile"]
+    rows = profile.get("schedule_blocks") or []
+    if block_fields is None:
+        # zip() stops at the shorter side, so the trailing shape index is dropped.
+        profile["schedule_blocks"] = [dict(zip(shapes[row[-1]], row)) for row in rows]
+        return profile
+    # Per shape, the positions of the wanted keys, in the order the caller listed them.
+    picks = [[(keys.index(k), k) for k in block_fields if k in keys] for keys in shapes]
+    if not counts:
+        profile["schedule_blocks"] = [{k: row[i] for i, k in picks[row[-1]]} for row in rows]
+        return profile
+    tallies = [[(keys.index(f) if f in keys else None, k) for f, k in counts.items()] for keys in shapes]
+    blocks = []
+    for row in rows:
+        block = {k: row[i] for i, k in picks[row[-1]]}
+        for i, k in tallies[row[-1]]:
+            block[k] = 0 if i is None else _length(row[i])
+        blocks.append(block)
+    profile["schedule_blocks"] = blocks
+    return profile
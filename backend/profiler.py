@@ -0,0 +1,145 @@
+from __future__ import annotations
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# Wall-clock sampling profiler for a single thread. A helper thread reads the
+# target thread's current frame every `interval` seconds, so the profiled code
+# runs unmodified (no sys.setprofile hooks). Results are written as collapsed
+# stacks (flamegraph.pl, speedscope, inferno) or as a speedscope JSON file.
+
+Stack = tuple[tuple[str, str, int], ...]  # root-first (function, file, line)
+
+
+class StackSampler:
+    def __init__(self, thread_id: int | None = None, *, interval: float = 0.005, max_depth: int = 128):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter[Stack] = Counter()
+        self.started = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "StackSampler":
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter[Stack]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self.samples
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            self.samples[tuple(reversed(stack))] += 1
+
+
+def _frame_label(frame: tuple[str, str, int]) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapsed(samples: Counter[Stack]) -> str:
+    """Brendan Gregg's collapsed format: `root;child;leaf count` per line."""
+    lines = [
+        ";".join(_frame_label(f).replace(";", ":") for f in stack) + f" {count}"
+        for stack, count in samples.most_common()
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def speedscope(samples: Counter[Stack], *, name: str, interval: float) -> dict:
+    frames: list[dict] = []
+    index: dict[tuple[str, str, int], int] = {}
+    stacks: list[list[int]] = []
+    weights: list[float] = []
+    for stack, count in samples.items():
+        ids = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            ids.append(index[frame])
+        stacks.append(ids)
+        weights.append(count * interval)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": stacks,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": "stepsync-backend",
+    }
+
+
+class ProfileStore:
+    """
+    Writes profiles to `directory`, keeping only the newest `max_files` and, when
+    `max_bytes` is set, only as many of the newest as fit in it together. The
+    profile just written is always kept.
+    """
+
+    def __init__(self, directory: str, *, fmt: str = "speedscope", max_files: int = 50, max_bytes: int = 0):
+        if fmt not in ("speedscope", "collapsed"):
+            raise ValueError(f"Unknown profile format: {fmt}")
+        self.directory = directory
+        self.fmt = fmt
+        self.max_files = max(1, max_files)
+        self.max_bytes = max(0, max_bytes)
+        self._lock = threading.Lock()
+
+    def filename(self, label: str) -> str:
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", label).strip("-")[:60] or "request"
+        suffix = "speedscope.json" if self.fmt == "speedscope" else "collapsed.txt"
+        return f"{time.strftime('%Y%m%dT%H%M%S')}-{slug}-{os.urandom(3).hex()}.{suffix}"
+
+    def save(self, filename: str, sampler: StackSampler, *, name: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, filename)
+        with open(path, "w", encoding="utf-8") as fh:
+            if self.fmt == "speedscope":
+                json.dump(speedscope(sampler.samples, name=name, interval=sampler.interval), fh)
+            else:
+                fh.write(collapsed(sampler.samples))
+        self._rotate()
+        return path
+
+    def _rotate(self) -> None:
+        with self._lock:
+            entries = [e for e in os.scandir(self.directory) if e.is_file()]
+            entries.sort(key=lambda e: e.stat().st_mtime_ns, reverse=True)
+            kept = total = 0
+            for entry in entries:
+                total += entry.stat().st_size
+                if kept < self.max_files and (not kept or not self.max_bytes or total <= self.max_bytes):
+                    kept += 1
+                    continue
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
@@ -0,0 +1,235 @@
+from __future__ import annotations
+import heapq
+import itertools
+import math
+import os
+import re
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+# Token buckets are tracked with GCRA (generic cell rate algorithm): instead of
+# storing a token count plus a refill timestamp we keep a single "theoretical
+# arrival time" per key. It behaves exactly like a bucket of `burst` tokens that
+# refills at `rate` tokens per second, but every update is one float, which keeps
+# both the in-process store and the shared store cheap.
+
+_PERIODS = {
+    "second": 1.0, "sec": 1.0, "s": 1.0,
+    "minute": 60.0, "min": 60.0, "m": 60.0,
+    "hour": 3600.0, "h": 3600.0,
+    "day": 86400.0, "d": 86400.0,
+}
+_LIMIT_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*([a-z]+)\s*(?:;\s*burst\s*=\s*(\d+)\s*)?$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Limit:
+    count: int
+    period: float
+    burst: int
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.count
+
+    @property
+    def tolerance(self) -> float:
+        return self.interval * self.burst
+
+    @classmethod
+    def parse(cls, spec: str) -> "Limit":
+        """Parse specs such as "10/minute", "5/30s" or "60/hour;burst=10"."""
+        match = _LIMIT_RE.match(spec or "")
+        if not match:
+            raise ValueError(f"Invalid rate limit spec: {spec!r}")
+        count = int(match.group(1))
+        multiplier = int(match.group(2) or 1)
+        unit = match.group(3).lower()
+        if unit not in _PERIODS or count <= 0 or multiplier <= 0:
+            raise ValueError(f"Invalid rate limit spec: {spec!r}")
+        burst = int(match.group(4) or count)
+        return cls(count=count, period=_PERIODS[unit] * multiplier, burst=max(1, burst))
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    remaining: int
+    retry_after: float
+
+
+def _gcra(tat: float | None, now: float, limit: Limit) -> tuple[float | None, Decision]:
+    """Return (new_tat, decision); new_tat is None when the request is rejected."""
+    base = tat if tat is not None and tat > now else now
+    new_tat = base + limit.interval
+    used = new_tat - now
+    if used > limit.tolerance + 1e-9:
+        return None, Decision(False, 0, used - limit.tolerance)
+    remaining = int((limit.tolerance - used) / limit.interval + 1e-9)
+    return new_tat, Decision(True, remaining, 0.0)
+
+
+class MemoryStore:
+    """Per-process store. State is one float per key, guarded by striped locks.
+
+    CPython has no compare-and-swap primitive, so the nearest thing to a
+    lock-free store is to keep the critical section to a few float operations
+    and spread keys over many locks so unrelated clients never contend.
+    """
+
+    SWEEP_EVERY = 1024
+
+    def __init__(self, stripes: int = 64, max_keys: int = 100_000):
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._state: dict[str, float] = {}
+        self._max_keys = max_keys
+        self._ops = itertools.count(1)  # next() on a count is atomic under the GIL
+        self._sweeping = threading.Lock()
+
+    def _stripe(self, key: str) -> threading.Lock:
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def hit(self, key: str, limit: Limit, now: float) -> Decision:
+        with self._stripe(key):
+            new_tat, decision = _gcra(self._state.get(key), now, limit)
+            if new_tat is not None:
+                self._state[key] = new_tat
+        # Sweeping walks every key, so it only runs on a schedule, never per hit: a
+        # flood of distinct live keys overshoots max_keys by about SWEEP_EVERY.
+        if next(self._ops) % self.SWEEP_EVERY == 0 and self._sweeping.acquire(blocking=False):
+            try:
+                self._sweep(now)
+            finally:
+                self._sweeping.release()
+        return decision
+
+    def _sweep(self, now: float) -> None:
+        # A key whose TAT is in the past is indistinguishable from a fresh key.
+        live = []
+        for key, tat in list(self._state.items()):
+            if tat > now:
+                live.append((tat, key))
+            else:
+                self._drop(key, lambda current: current <= now)
+        excess = len(live) - self._max_keys * 9 // 10
+        if excess > 0 and len(live) > self._max_keys:
+            # Over the cap with live buckets: forget the ones closest to draining.
+            # Their owners get a fresh burst, the price of bounded memory.
+            for tat, key in heapq.nsmallest(excess, live):
+                self._drop(key, lambda current, seen=tat: current == seen)
+
+    def _drop(self, key: str, still: Callable[[float], bool]) -> None:
+        # Another thread may have hit the key since the snapshot; only drop it if not.
+        with self._stripe(key):
+            current = self._state.get(key)
+            if current is not None and still(current):
+                del self._state[key]
+
+    def reset(self) -> None:
+        self._state.clear()
+
+
+class RedisStore:
+    """Shared store for multi-worker deployments (requires the `redis` package)."""
+
+    _SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local tolerance = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local used = new_tat - now
+if used > tolerance then
+  return {0, 0, tostring(used - tolerance)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(used * 1000))
+return {1, math.floor((tolerance - used) / interval), '0'}
+"""
+
+    def __init__(self, url: str, prefix: str = "stepsync:rl:"):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("RATE_LIMIT_STORAGE_URL points at Redis but the 'redis' package is not installed.") from exc
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self._SCRIPT)
+        self._prefix = prefix
+
+    def hit(self, key: str, limit: Limit, now: float) -> Decision:
+        allowed, remaining, retry_after = self._script(
+            keys=[self._prefix + key],
+            args=[repr(now), repr(limit.interval), repr(limit.tolerance)],
+        )
+        return Decision(bool(int(allowed)), int(remaining), float(retry_after))
+
+    def reset(self) -> None:
+        for key in self._client.scan_iter(self._prefix + "*"):
+            self._client.delete(key)
+
+
+def store_from_url(url: str | None):
+    url = (url or "").strip()
+    if not url or url.startswith("memory://"):
+        return MemoryStore()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    raise ValueError(f"Unsupported rate limit storage: {url!r}")
+
+
+class RateLimiter:
+    def __init__(self, store=None, *, enabled: bool = True, clock=time.time):
+        self.store = store if store is not None else MemoryStore()
+        self.enabled = enabled
+        self._clock = clock
+        self._rules: dict[str, Limit] = {}
+        self._counters: dict[str, dict[str, int]] = {}
+        self._counter_lock = threading.Lock()
+
+    def rule(self, name: str, default: str) -> Limit:
+        """Register a named rule; RATE_LIMIT_<NAME> in the environment overrides it."""
+        env_key = "RATE_LIMIT_" + re.sub(r"[^A-Z0-9]+", "_", name.upper())
+        limit = Limit.parse(os.environ.get(env_key) or default)
+        self._rules[name] = limit
+        self._counters.setdefault(name, {"allowed": 0, "limited": 0})
+        return limit
+
+    def hit(self, name: str, key: str) -> Decision:
+        limit = self._rules[name]
+        if not self.enabled:
+            return Decision(True, limit.burst, 0.0)
+        try:
+            decision = self.store.hit(f"{name}:{key}", limit, self._clock())
+        except Exception:
+            # A broken shared store must not take the API down with it.
+            self._count(name, "store_errors")
+            return Decision(True, limit.burst, 0.0)
+        self._count(name, "allowed" if decision.allowed else "limited")
+        return decision
+
+    def _count(self, name: str, field: str) -> None:
+        with self._counter_lock:
+            bucket = self._counters.setdefault(name, {"allowed": 0, "limited": 0})
+            bucket[field] = bucket.get(field, 0) + 1
+
+    def stats(self) -> dict:
+        with self._counter_lock:
+            counters = {name: dict(values) for name, values in self._counters.items()}
+        return {
+            "enabled": self.enabled,
+            "store": type(self.store).__name__,
+            "rules": {
+                name: {
+                    "limit": f"{limit.count}/{int(limit.period)}s",
+                    "burst": limit.burst,
+                    **counters.get(name, {}),
+                }
+                for name, limit in self._rules.items()
+            },
+        }
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
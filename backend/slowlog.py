@@ -0,0 +1,86 @@
+from __future__ import annotations
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Structured (JSON lines) logging that never does I/O on the caller's thread:
+# records go onto an in-memory queue and a listener thread formats and writes
+# them. The listener is started lazily in whichever process logs first, so it
+# also works when gunicorn forks workers after the app module is imported.
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: timestamp, level, logger, message and the `context` extra."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        context = getattr(record, "context", None)
+        if isinstance(context, dict):
+            entry.update(context)
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class BackgroundQueueHandler(QueueHandler):
+    def __init__(self, *handlers: logging.Handler, maxsize: int = 10000):
+        super().__init__(queue.Queue(maxsize))
+        self._handlers = handlers
+        self._listener: QueueListener | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _ensure_listener(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A listener inherited through fork has no thread behind it; start our own.
+            self.queue = queue.Queue(self.queue.maxsize)
+            self._listener = QueueListener(self.queue, *self._handlers, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self._listener.stop)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait (up to `timeout` seconds) until the listener has written everything queued so far."""
+        if self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.queue.all_tasks_done.wait(remaining)
+        for handler in self._handlers:
+            handler.flush()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def structured_logger(name: str, *, path: str | None = None, level: int = logging.INFO) -> logging.Logger:
+    """Logger whose records are written as JSON lines to `path` (or stderr) by a background thread."""
+    target = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler()
+    target.setFormatter(JsonFormatter())
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    logger.propagate = False
+    logger.handlers[:] = [BackgroundQueueHandler(target)]
+    return logger
@@ -0,0 +1,89 @@
+from __future__ import annotations
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-request SQL bookkeeping. Recording a statement is a tuple append; shapes
+# (literal-free statement text) are only computed when someone asks for them,
+# e.g. the N+1 check or a test assertion.
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_PLACEHOLDER_RE = re.compile(r"(?:\?|%\(\w+\)s|:\w+)")
+
+
+def statement_shape(statement: str) -> str:
+    """Statement text with literals, placeholders and IN-lists collapsed to `?`."""
+    shape = _STRING_RE.sub("?", statement)
+    shape = _PLACEHOLDER_RE.sub("?", shape)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _IN_LIST_RE.sub("IN (?)", shape)
+    return _WHITESPACE_RE.sub(" ", shape).strip()
+
+
+class QueryLog:
+    def __init__(self):
+        self.statements: list[tuple[str, float]] = []
+        self.total_time = 0.0
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.statements.append((statement, elapsed))
+        self.total_time += elapsed
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def shapes(self) -> Counter:
+        return Counter(statement_shape(sql) for sql, _ in self.statements)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Shapes executed at least `threshold` times: the usual signature of an N+1 loop."""
+        return [(shape, n) for shape, n in self.shapes().most_common() if n >= threshold]
+
+    def slowest(self, limit: int = 3) -> list[tuple[str, float]]:
+        return sorted(self.statements, key=lambda item: item[1], reverse=True)[:limit]
+
+    def describe(self) -> str:
+        return "\n".join(f"{n:>4} x {shape}" for shape, n in self.shapes().most_common())
+
+
+@contextmanager
+def count_queries(engine=Engine) -> Iterator[QueryLog]:
+    """Record every statement `engine` (default: all engines) executes inside the block."""
+    log = QueryLog()
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("sqlcount_started", []).append(time.perf_counter())
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        log.record(statement, time.perf_counter() - conn.info["sqlcount_started"].pop())
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+    try:
+        yield log
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+        event.remove(engine, "after_cursor_execute", after)
+
+
+@contextmanager
+def assert_max_queries(limit: int, engine=Engine) -> Iterator[QueryLog]:
+    """
+    Test helper: fail when the block runs more than `limit` SQL statements.
+
+        with assert_max_queries(3):
+            client.get("/family/invite/my", headers=auth)
+    """
+    with count_queries(engine) as log:
+        yield log
+    if log.count > limit:
+        raise AssertionError(f"Expected at most {limit} SQL statements, ran {log.count}:\n{log.describe()}")
@@ -0,0 +1,109 @@
+from __future__ import annotations
+import os
+import sys
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Read at import by app.py; tests make bursts of calls a real client never would.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+import pytest  # noqa: E402
+import requests  # noqa: E402
+from requests.structures import CaseInsensitiveDict  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from ai_providers import HeuristicProvider, Provider, ProviderChain  # noqa: E402
+
+import app as backend  # noqa: E402
+
+
+@pytest.fixture
+def flask_app(tmp_path):
+    app = backend.create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+        "JWT_SECRET_KEY": "test-secret-key-long-enough-for-hs256",
+        "TESTING": True,
+    })
+    yield app
+    with app.app_context():
+        backend.db.session.remove()
+        backend.db.engine.dispose()
+
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.test_client()
+
+
+@pytest.fixture
+def make_user(flask_app):
+    """make_user(username, account_type="parent", **columns) -> Authorization headers for that user."""
+    def make(username: str, account_type: str = "parent", **columns) -> dict:
+        with flask_app.app_context():
+            backend.db.session.add(backend.User(
+                username=username, password="unused", account_type=account_type, **columns,
+            ))
+            backend.db.session.commit()
+            return {"Authorization": f"Bearer {create_access_token(identity=username)}"}
+    return make
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """providers(*remote) installs that chain (plus the heuristic planner), with an empty task cache."""
+    def install(*remote: Provider) -> None:
+        chain = ProviderChain([*remote, HeuristicProvider(backend._fallback_generate_tasks)])
+        monkeypatch.setattr(backend, "_AI_PROVIDERS", chain)
+    backend.AI_TASK_CACHE.clear()
+    yield install
+    backend.AI_TASK_CACHE.clear()
+
+
+class _TestClientAdapter(requests.adapters.BaseAdapter):
+    """Hands requests.Session calls to a Flask test client and notes each (method, path) sent."""
+
+    def __init__(self, client, sent: list):
+        super().__init__()
+        self.client = client
+        self.sent = sent
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        self.sent.append((request.method, url.path))
+        resp = self.client.open(url.path, method=request.method, query_string=url.query,
+                                headers=dict(request.headers), data=request.body)
+        out = requests.Response()
+        out.status_code = resp.status_code
+        out.headers = CaseInsensitiveDict(resp.headers)
+        out._content = resp.get_data()
+        out.url, out.request = request.url, request
+        return out
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def loadtest_server(client, monkeypatch):
+    """Points the load-test HTTP client at the test client; `.url` to pass it, `.sent` to inspect."""
+    server = SimpleNamespace(url="http://testserver", sent=[])
+    session_class = requests.Session
+
+    def session() -> requests.Session:
+        sess = session_class()
+        sess.mount(server.url, _TestClientAdapter(client, server.sent))
+        return sess
+
+    monkeypatch.setattr(requests, "Session", session)
+    return server
+
+
+def sse_events(body: str) -> list[tuple[str, str]]:
+    """(event, data) pairs of a text/event-stream body."""
+    events = []
+    for chunk in body.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in chunk.splitlines() if ": " in line)
+        if "event" in fields:
+            events.append((fields["event"], fields.get("data", "")))
+    return events
@@ -0,0 +1,91 @@
+from __future__ import annotations
+import threading
+
+import app as backend
+from ai_providers import Provider
+
+DATE = "2030-01-01"
+
+
+class Counting(Provider):
+    name = "groq"
+
+    def __init__(self):
+        super().__init__()
+        self.prompts: list[str] = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, **context) -> list[dict]:
+        with self._lock:
+            self.prompts.append(prompt)
+        return [{"title": f"Plan for {prompt}", "steps": ["Start", "Finish"]}]
+
+
+def batch(client, headers, items: list[dict], **extra):
+    return client.post("/ai/tasks/batch", headers=headers, json={"items": items, **extra})
+
+
+def test_duplicate_prompts_are_generated_once(client, make_user, providers):
+    provider = Counting()
+    providers(provider)
+    headers = make_user("alice")
+    prompts = ["Homework time", "homework   TIME", "Reading", "Homework time"]
+    resp = batch(client, headers, [{"id": n, "prompt": p, "date": DATE} for n, p in enumerate(prompts)])
+
+    assert resp.status_code == 200
+    assert sorted(provider.prompts) == ["Homework time", "Reading"]
+    items = sorted(resp.get_json()["items"], key=lambda item: item["index"])
+    assert [item["id"] for item in items] == [0, 1, 2, 3]
+    assert all(item["source"] == "groq" and item["error"] is None for item in items)
+    assert [item["deduplicated"] for item in items] == [False, True, False, True]
+    assert items[0]["tasks"] == items[1]["tasks"] == items[3]["tasks"]
+    assert items[0]["tasks"] is not items[1]["tasks"]
+
+
+def test_a_failing_item_gets_its_own_error(client, make_user, providers, monkeypatch):
+    providers(Counting())
+    headers = make_user("alice")
+    generate = backend._ai_generate_tasks
+
+    def flaky(prompt, existing_blocks=None):
+        if prompt == "Explode":
+            raise RuntimeError("planner crashed")
+        return generate(prompt, existing_blocks)
+
+    monkeypatch.setattr(backend, "_ai_generate_tasks", flaky)
+    resp = batch(client, headers, [
+        {"prompt": "Homework", "date": DATE},
+        {"prompt": "", "date": DATE},
+        {"prompt": "Reading", "date": "not-a-date"},
+        {"prompt": "Reading", "date": DATE, "child": "nobody"},
+        {"prompt": "Explode", "date": DATE},
+        {"prompt": "Reading", "date": DATE},
+    ])
+
+    assert resp.status_code == 200
+    items = sorted(resp.get_json()["items"], key=lambda item: item["index"])
+    assert [item["error"] for item in items] == [
+        None,
+        "Prompt is required.",
+        "Date must be formatted as YYYY-MM-DD.",
+        "Parent is not linked to a family",
+        "AI generation failed.",
+        None,
+    ]
+    assert [bool(item["tasks"]) for item in items] == [True, False, False, False, False, True]
+
+
+def test_oversized_and_empty_batches_are_rejected(client, make_user, providers):
+    provider = Counting()
+    providers(provider)
+    headers = make_user("alice")
+    too_many = [{"prompt": f"Task {n}", "date": DATE} for n in range(backend.AI_BATCH_MAX_ITEMS + 1)]
+
+    resp = batch(client, headers, too_many)
+    assert resp.status_code == 400
+    assert str(backend.AI_BATCH_MAX_ITEMS) in resp.get_json()["error"]
+    assert batch(client, headers, []).status_code == 400
+    assert client.post("/ai/tasks/batch", headers=headers, json={"items": "Homework"}).status_code == 400
+    assert provider.prompts == []
+
+    assert batch(client, headers, too_many[:-1]).status_code == 200
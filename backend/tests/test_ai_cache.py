@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import app as backend
+from ai_providers import Provider, ProviderError
+
+TASK = {"title": "Breakfast", "steps": ["Eat"], "startTime": "7:00", "endTime": "7:30", "period": "AM"}
+
+
+class Remote(Provider):
+    def __init__(self, name: str, model: str, *, down: bool = False):
+        super().__init__()
+        self.name, self.model, self.down = name, model, down
+
+    def generate(self, prompt: str, **context) -> list[dict]:
+        if self.down:
+            raise ProviderError(f"{self.name} is down")
+        return [dict(TASK, title=f"{TASK['title']} ({self.name})")]
+
+
+def ask(client, headers) -> dict:
+    resp = client.post("/ai/tasks", headers=headers, json={"prompt": "Morning routine"})
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def test_a_fallback_answer_is_not_cached_over_the_primary(client, make_user, providers):
+    headers = make_user("parent1")
+    groq, local = Remote("groq", "llama-3.1-8b-instant", down=True), Remote("local", "qwen")
+    providers(groq, local)
+    assert ask(client, headers)["tasks"][0]["title"] == "Breakfast (local)"
+
+    groq.down = False
+    first, second = ask(client, headers), ask(client, headers)
+    assert first["tasks"][0]["title"] == "Breakfast (groq)"
+    assert second["cached"] is True
+
+
+def test_changing_the_primary_model_misses_the_cache(client, make_user, providers):
+    headers = make_user("parent1")
+    providers(Remote("groq", "llama-3.1-8b-instant"))
+    ask(client, headers)
+    assert ask(client, headers)["cached"] is True
+
+    providers(Remote("groq", "llama-3.3-70b"))
+    assert ask(client, headers)["cached"] is False
+    assert backend._ai_cache_key("morning routine") == ("groq", "llama-3.3-70b", "morning routine")
@@ -0,0 +1,112 @@
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import requests
+
+import codec
+from ai_providers import CircuitBreaker, HeuristicProvider, OpenAICompatibleProvider, Provider, ProviderChain
+
+TASKS = [{"title": "Breakfast"}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Canned(Provider):
+    def __init__(self, name: str, *, delay: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.delay = delay
+        self.started = threading.Event()
+
+    def generate(self, prompt: str, **context) -> list[dict]:
+        self.started.set()
+        time.sleep(self.delay)
+        return list(TASKS)
+
+    async def agenerate(self, prompt: str, *, client=None, **context) -> list[dict]:
+        self.started.set()
+        await asyncio.sleep(self.delay)
+        return list(TASKS)
+
+
+def half_open_provider(name: str) -> Canned:
+    clock = Clock()
+    provider = Canned(name, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock))
+    provider.breaker.record_failure()
+    clock.now = 11
+    assert provider.breaker.state == "half_open"
+    return provider
+
+
+def heuristic() -> HeuristicProvider:
+    return HeuristicProvider(lambda prompt, **context: list(TASKS))
+
+
+def test_half_open_provider_behind_a_faster_one_keeps_its_trial():
+    first, second = Canned("first"), half_open_provider("second")
+    chain = ProviderChain([first, second, heuristic()])
+    assert chain.generate("plan my day") == (TASKS, "first")
+    assert not second.started.is_set()
+    # The unused trial is still available: the circuit can close again.
+    assert second.breaker.allow()
+
+
+def test_half_open_provider_keeps_its_trial_under_asyncio():
+    first, second = Canned("first"), half_open_provider("second")
+    chain = ProviderChain([first, second, heuristic()])
+    assert asyncio.run(chain.agenerate("plan my day")) == (TASKS, "first")
+    assert second.breaker.allow()
+
+
+def test_client_disconnecting_mid_trial_does_not_wedge_the_breaker():
+    provider = half_open_provider("groq")
+    stream = ProviderChain([provider, heuristic()]).stream("plan my day")
+    assert next(stream) == (TASKS[0], "groq")
+    stream.close()
+    # Tasks reached the client before it left, so the trial succeeded.
+    assert provider.breaker.state == "closed"
+    assert provider.breaker.allow()
+    assert provider.failures == 0
+
+
+def test_sync_deadline_overrun_counts_as_one_failure_when_it_happens():
+    slow = Canned("slow", delay=0.3, deadline=0.05)
+    chain = ProviderChain([slow, heuristic()])
+    assert chain.generate("plan my day") == (TASKS, "heuristic")
+    assert slow.failures == 1
+    time.sleep(0.4)  # the abandoned call finishes late; it must not be counted again
+    assert slow.failures == 1
+    assert len(slow.latency) == 0
+
+
+def test_openai_compatible_provider_encodes_and_decodes_through_the_codec(monkeypatch):
+    sent = []
+
+    def post(url, *, headers, data, **kwargs):
+        sent.append((headers, data, kwargs))
+        content = codec.dumps({"tasks": [{"title": "Breakfast", "note": "pain au chocolat \u00e9"}]})
+        return SimpleNamespace(status_code=200, text=codec.dumps({"choices": [{"message": {"content": content}}]}))
+
+    monkeypatch.setattr(requests, "post", post)
+    provider = OpenAICompatibleProvider(
+        "groq", url="https://llm.test/v1/chat/completions", model="m", system_instruction="Plan.",
+        sanitize=lambda parsed: parsed["tasks"],
+    )
+    assert provider.generate("Morning") == [{"title": "Breakfast", "note": "pain au chocolat \u00e9"}]
+    [(headers, data, kwargs)] = sent
+    assert headers["Content-Type"] == "application/json"
+    assert "json" not in kwargs
+    assert isinstance(data, bytes)
+    body = codec.loads(data)
+    assert body["model"] == "m"
+    assert body["messages"][1] == {"role": "user", "content": "Morning"}
+
@@ -0,0 +1,35 @@
+from __future__ import annotations
+import json
+
+import app as backend
+from ai_providers import Provider, ProviderError
+from conftest import sse_events
+
+TASK = {"title": "Breakfast", "steps": ["Eat"], "startTime": "7:00", "endTime": "7:30", "period": "AM"}
+
+
+class FailsAfterFirstTask(Provider):
+    name = "flaky"
+
+    def stream(self, prompt: str, **context):
+        yield dict(TASK)
+        raise ProviderError("upstream dropped the connection")
+
+
+def test_stream_failure_after_first_task_ends_with_error_and_done(client, make_user, providers):
+    providers(FailsAfterFirstTask())
+    headers = make_user("parent1")
+    resp = client.post("/ai/tasks/stream", headers=headers, json={"prompt": "morning routine"})
+    assert resp.status_code == 200
+    events = sse_events(resp.get_data(as_text=True))
+    assert [name for name, _ in events] == ["task", "error", "done"]
+    assert json.loads(events[0][1])["title"] == "Breakfast"
+    assert json.loads(events[-1][1]) == {"count": 1, "source": "flaky", "partial": True}
+    assert backend.AI_TASK_CACHE.get(backend._ai_cache_key("morning routine")) is None
+
+
+def test_stats_does_not_build_the_provider_chain(client, monkeypatch):
+    monkeypatch.setattr(backend, "_AI_PROVIDERS", None)
+    resp = client.get("/stats")
+    assert resp.get_json()["ai_providers"] == {"initialized": False}
+    assert backend._AI_PROVIDERS is None
@@ -0,0 +1,145 @@
+from __future__ import annotations
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import app as backend
+import asgi
+from ai_providers import OpenAICompatibleProvider, ProviderError
+from conftest import sse_events
+from test_ai_stream import FailsAfterFirstTask
+
+LLM_URL = "https://llm.test/v1/chat/completions"
+JSON = {"Content-Type": "application/json"}
+
+
+def call(application, method: str, path: str, *, headers: dict, body: bytes = b"") -> tuple[int, bytes]:
+    scope = {
+        "type": "http", "method": method, "path": path, "raw_path": path.encode(), "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in {**headers, "Content-Length": str(len(body))}.items()],
+        "server": ("testserver", 80), "client": ("127.0.0.1", 5000), "scheme": "http",
+        "http_version": "1.1", "root_path": "",
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    return status, b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+
+
+def test_streamed_body_runs_inside_the_request_context(flask_app, make_user, providers):
+    providers(FailsAfterFirstTask())
+    headers = dict(make_user("parent1"), **{"Content-Type": "application/json"})
+    application = asgi.AsgiApp(flask_app, threads=2)
+    try:
+        status, body = call(application, "POST", "/ai/tasks/stream", headers=headers,
+                            body=json.dumps({"prompt": "morning routine"}).encode())
+    finally:
+        application.executor.shutdown()
+    assert status == 200
+    events = sse_events(body.decode())
+    assert [name for name, _ in events] == ["task", "error", "done"]
+    assert json.loads(events[-1][1])["partial"] is True
+
+
+@pytest.fixture
+def served(flask_app):
+    """served(handler) -> an AsgiApp whose outbound httpx calls go to `handler`."""
+    apps = []
+
+    def serve(handler) -> asgi.AsgiApp:
+        application = asgi.AsgiApp(flask_app, threads=2)
+        application.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        apps.append(application)
+        return application
+    yield serve
+    for application in apps:
+        application.executor.shutdown()
+
+
+def test_google_sign_in_awaits_tokeninfo_and_resumes_the_view(served, flask_app, monkeypatch):
+    monkeypatch.setattr(backend, "GOOGLE_CLIENT_IDS", {"web-client"})
+    seen = []
+
+    def google(req: httpx.Request) -> httpx.Response:
+        seen.append((req.url.host, req.url.params.get("id_token")))
+        return httpx.Response(200, json={
+            "aud": "web-client", "email": "Sam@example.com", "email_verified": "true", "name": "Sam",
+        })
+
+    status, body = call(served(google), "POST", "/login/google", headers=JSON,
+                        body=json.dumps({"id_token": "tok-1", "preferred_role": "parent"}).encode())
+    assert status == 200, body
+    assert seen == [("oauth2.googleapis.com", "tok-1")]
+    assert json.loads(body)["token"]
+    with flask_app.app_context():
+        assert backend.User.query.filter_by(email="sam@example.com").one().auth_provider == "google"
+
+
+def test_google_sign_in_answers_401_when_tokeninfo_is_unreachable(served, monkeypatch):
+    monkeypatch.setattr(backend, "GOOGLE_CLIENT_IDS", {"web-client"})
+
+    def down(req: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("connection refused", request=req)
+
+    status, body = call(served(down), "POST", "/login/google", headers=JSON,
+                        body=json.dumps({"id_token": "tok-1"}).encode())
+    assert status == 401
+    assert json.loads(body)["error"] == "Invalid Google token"
+
+
+def test_ai_tasks_awaits_the_model_with_no_connection_checked_out(served, flask_app, make_user, providers):
+    providers(OpenAICompatibleProvider(
+        "groq", url=LLM_URL, model="test-model", system_instruction="Plan.", sanitize=backend._sanitize_model_tasks,
+    ))
+    headers = dict(make_user("parent1"), **JSON)
+    with flask_app.app_context():
+        pool = backend.db.engine.pool
+    checked_out = []
+
+    def llm(req: httpx.Request) -> httpx.Response:
+        # The view read the user before yielding; that connection must be back in the pool.
+        checked_out.append(pool.checkedout())
+        content = json.dumps({"tasks": [{"title": "Pack school bag", "steps": ["Books"]}]})
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    status, body = call(served(llm), "POST", "/ai/tasks", headers=headers,
+                        body=json.dumps({"prompt": "school morning"}).encode())
+    assert status == 200, body
+    answer = json.loads(body)
+    assert (answer["source"], [t["title"] for t in answer["tasks"]]) == ("groq", ["Pack school bag"])
+    assert checked_out == [0]
+
+
+def test_a_failed_step_is_raised_inside_the_view(served, flask_app, make_user, monkeypatch):
+    flask_app.config["PROPAGATE_EXCEPTIONS"] = False
+    headers = dict(make_user("parent1"), **JSON)
+
+    async def fails(*args, **kwargs):
+        raise ProviderError("model unavailable")
+    monkeypatch.setattr(backend, "_ai_generate_tasks_async", fails)
+    thrown = []
+    real_resume = asgi._Exchange.resume
+
+    def resume(self, result=None, exc=None):
+        thrown.append(exc)
+        return real_resume(self, result, exc)
+    monkeypatch.setattr(asgi._Exchange, "resume", resume)
+
+    application = served(lambda req: httpx.Response(500))
+    status, _ = call(application, "POST", "/ai/tasks", headers=headers,
+                     body=json.dumps({"prompt": "school morning"}).encode())
+    assert status == 500
+    assert [type(exc) for exc in thrown] == [ProviderError]
+    # The failed request was torn down: the next one on the same app is served normally.
+    status, _ = call(application, "POST", "/ai/tasks", headers=headers, body=json.dumps({}).encode())
+    assert status == 400
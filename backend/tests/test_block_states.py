@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import pytest
+
+import app as backend
+
+DATE = "2030-01-01"
+
+
+@pytest.fixture(autouse=True)
+def saved_on_return(monkeypatch):
+    monkeypatch.setattr(backend, "PROFILE_WRITE_ASYNC", False)
+
+
+def schedule(client, headers) -> list[tuple[str, bool, bool]]:
+    blocks = client.get(f"/profile?date={DATE}", headers=headers).get_json()["schedule_blocks"]
+    return [(blk["title"], blk["completed"], blk["hidden"]) for blk in blocks]
+
+
+def rewrite_while_toggling(flask_app, username: str, toggles: list[tuple[int, str, dict]], change) -> None:
+    """Run `change` as a buffered edit; `toggles` are saved after it read the profile, as a client's would be."""
+    with flask_app.test_request_context():
+        user_id = backend.User.query.filter_by(username=username).first().id
+
+        def edit(prof: dict) -> tuple[dict, int]:
+            for index, title, flags in toggles:
+                backend._save_block_state(user_id, DATE, f"pos:{index}", title, flags)
+            change(prof["schedule_blocks"])
+            return {}, 200
+
+        backend._apply_profile_edits(user_id, [backend._ProfileEdit(edit, flask_app)])
+
+
+def add_blocks(client, headers, *titles: str) -> None:
+    for title in titles:
+        block = {"title": title, "start": "09:00", "end": "10:00"}
+        assert client.post("/profile/block/add", headers=headers, json={"block": block, "date": DATE}).status_code == 200
+
+
+def test_toggle_saved_during_a_delete_follows_its_block(flask_app, client, make_user):
+    headers = make_user("parent1")
+    add_blocks(client, headers, "A", "B")
+    rewrite_while_toggling(flask_app, "parent1", [(1, "B", {"completed": True})], lambda blocks: blocks.pop(0))
+    assert schedule(client, headers) == [("B", True, False)]
+    with flask_app.app_context():
+        assert [row.block_key for row in backend.BlockState.query.all()] == ["pos:0"]
+
+
+def test_toggles_on_blocks_that_swap_places_are_both_kept(flask_app, client, make_user):
+    headers = make_user("parent1")
+    add_blocks(client, headers, "A", "B")
+    toggles = [(0, "A", {"completed": True}), (1, "B", {"hidden": True})]
+    rewrite_while_toggling(flask_app, "parent1", toggles, lambda blocks: blocks.reverse())
+    assert schedule(client, headers) == [("B", False, True), ("A", True, False)]
+
+
+def test_toggle_on_a_block_the_rewrite_removed_is_dropped(flask_app, client, make_user):
+    headers = make_user("parent1")
+    add_blocks(client, headers, "A", "B")
+    rewrite_while_toggling(flask_app, "parent1", [(1, "B", {"completed": True})], lambda blocks: blocks.pop(1))
+    assert schedule(client, headers) == [("A", False, False)]
+    with flask_app.app_context():
+        assert backend.BlockState.query.count() == 0
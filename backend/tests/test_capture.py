@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import pytest
+
+import app as backend
+from capture import REDACTED, Pseudonymizer, TrafficRecorder, read_events
+from loadtest.replay import replay
+from planner import vocabulary
+
+SECRET = b"capture-test-secret"
+PASSWORD = "hunter2-hunter2"
+
+
+@pytest.fixture
+def capture_path(tmp_path, monkeypatch):
+    path = tmp_path / "capture.jsonl"
+    monkeypatch.setattr(backend, "CAPTURE", TrafficRecorder(str(path), secret=SECRET, keep_words=vocabulary()))
+    monkeypatch.setenv("CAPTURE_SECRET", SECRET.decode())
+    return path
+
+
+@pytest.fixture
+def flask_app(capture_path, flask_app):
+    # create_app only installs the capture hook when CAPTURE is enabled.
+    return flask_app
+
+
+def captured(path) -> tuple[str, list[dict]]:
+    for handler in backend.CAPTURE._logger.handlers:
+        handler.flush()
+    return path.read_text(), read_events([str(path)])
+
+
+def sign_up(client, username: str, display_name: str) -> dict:
+    assert client.post("/register", json={
+        "username": username, "display_name": display_name, "password": PASSWORD,
+    }).status_code == 200
+    token = client.post("/login", json={"username": username, "password": PASSWORD}).get_json()["token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def record_session(client) -> list[str]:
+    """Two users' traffic; returns every secret that must stay out of the capture."""
+    alice = sign_up(client, "alice", "Alice Liddell")
+    bob = sign_up(client, "bob", "Bob Marley")
+    assert client.post("/profile/block/add", headers=alice, json={"date": "2030-01-01", "block": {
+        "title": "Soccer practice with Dinah", "startTime": "4:00", "endTime": "5:00", "period": "PM",
+    }}).status_code == 200
+    assert client.get("/profile?date=2030-01-01", headers=alice).status_code == 200
+    assert client.get("/profile?date=2030-01-01", headers=bob).status_code == 200
+    return ["alice", "bob", "Alice", "Liddell", "Marley", "Dinah", PASSWORD,
+            alice["Authorization"].split()[1], bob["Authorization"].split()[1]]
+
+
+def test_capture_keeps_usernames_tokens_and_passwords_out(client, capture_path):
+    secrets_ = record_session(client)
+    text, events = captured(capture_path)
+    assert len(events) == 7
+    for secret in secrets_:
+        assert secret not in text
+    assert events[0]["b"]["password"] == REDACTED
+    # Words the planner reacts to and times survive, so prompts still exercise the same paths.
+    block = events[4]["b"]["block"]
+    assert block["title"].split()[0] == "Soccer"
+    assert (block["startTime"], block["period"]) == ("4:00", "PM")
+
+
+def test_each_user_always_gets_the_same_pseudonym(client, capture_path):
+    record_session(client)
+    _, events = captured(capture_path)
+    alice = Pseudonymizer(SECRET).identity("alice")
+    bob = Pseudonymizer(SECRET).identity("bob")
+    assert alice != bob
+    assert [e["u"] for e in events] == [alice, alice, bob, bob, alice, alice, bob]
+    # The username in the sign-up body maps to the same pseudonym as the request's user.
+    assert events[0]["b"]["username"] == alice
+
+
+def test_secret_payload_keys_are_redacted():
+    payload = Pseudonymizer(SECRET).payload({
+        "id_token": "google-id-token", "access_token": "google-access-token", "email": "a@example.com",
+        "target_child": "alice", "current_password": PASSWORD,
+    })
+    assert payload == {
+        "id_token": REDACTED, "access_token": REDACTED, "email": REDACTED,
+        "target_child": Pseudonymizer(SECRET).identity("alice"), "current_password": REDACTED,
+    }
+
+
+def test_replay_sends_the_captured_requests_in_order(client, capture_path, tmp_path, loadtest_server):
+    record_session(client)
+    _, events = captured(capture_path)
+    # Replay into an empty database: the captured sign-ups recreate the pseudonymous users.
+    with client.application.app_context():
+        backend.db.drop_all()
+        backend.db.create_all()
+    loadtest_server.sent.clear()
+
+    recorder, _ = replay(loadtest_server.url, events, password=PASSWORD, speed=0, clients=1)
+
+    expected = [(e["m"], e["p"]) for e in events]
+    sent = iter(loadtest_server.sent)
+    assert all(request in sent for request in expected)  # in order; token fetches may come between
+    samples = [s for group in recorder.samples.values() for s in group]
+    assert len(samples) == len(events)
+    assert all(s.ok for s in samples)
+    with client.application.app_context():
+        owner = backend.User.query.filter_by(username=events[0]["u"]).one()
+        titles = [b["title"] for b in backend._user_profile(owner)["schedule_blocks"]]
+    assert titles == [events[4]["b"]["block"]["title"]]
@@ -0,0 +1,83 @@
+from __future__ import annotations
+import dataclasses
+import importlib
+import math
+from datetime import date, datetime, timezone
+
+import pytest
+from flask import Flask
+
+import codec
+
+orjson_installed = importlib.util.find_spec("orjson") is not None
+
+
+@pytest.fixture(params=["stdlib", pytest.param("auto", marks=pytest.mark.skipif(
+    not orjson_installed, reason="orjson is not installed"))])
+def backend(request, monkeypatch):
+    """The codec module re-imported with JSON_CODEC set to the param."""
+    monkeypatch.setenv("JSON_CODEC", request.param)
+    importlib.reload(codec)
+    assert codec.NAME == ("stdlib" if request.param == "stdlib" else "orjson")
+    yield codec
+    monkeypatch.undo()
+    importlib.reload(codec)
+
+
+@dataclasses.dataclass
+class Step:
+    title: str
+    done: bool = False
+
+
+def provider_app(codec_module) -> Flask:
+    app = Flask(__name__)
+    app.json = codec_module.CodecJSONProvider(app)
+    return app
+
+
+def test_non_ascii_text_is_written_as_utf8(backend):
+    assert backend.dumps({"title": "Café ☕"}) == '{"title":"Café ☕"}'
+    assert backend.dumps_bytes({"title": "Café ☕"}) == '{"title":"Café ☕"}'.encode()
+    assert backend.loads('{"title":"Café ☕"}'.encode()) == {"title": "Café ☕"}
+
+
+def test_lone_surrogates_are_kept_as_escapes(backend):
+    assert backend.dumps({"title": "\ud83d"}) == '{"title":"\\ud83d"}'
+    assert backend.dumps_bytes(["\udfff"]) == b'["\\udfff"]'
+    assert backend.loads('{"title":"\\ud83d"}') == {"title": "\ud83d"}
+
+
+def test_integers_past_64_bits_round_trip(backend):
+    big = 2 ** 70
+    assert backend.dumps({"n": big, "m": -big}) == f'{{"n":{big},"m":{-big}}}'
+    assert backend.loads(f'[{big}]') == [big]
+
+
+def test_nan_in_legacy_rows_still_loads(backend):
+    row = backend.loads('{"score": NaN, "high": Infinity}')
+    assert math.isnan(row["score"]) and row["high"] == math.inf
+
+
+def test_sort_keys_and_non_string_keys(backend):
+    assert backend.dumps({"b": 1, "a": {"d": 2, "c": 3}}, sort_keys=True) == '{"a":{"c":3,"d":2},"b":1}'
+    assert backend.dumps({1: "one"}) == '{"1":"one"}'
+
+
+def test_response_bodies_are_compact_sorted_and_newline_terminated(backend):
+    app = provider_app(backend)
+    with app.test_request_context():
+        resp = app.json.response({"title": "Café", "b": None, "a": [1, 2]})
+    assert resp.mimetype == "application/json"
+    assert resp.get_data() == b'{"a":[1,2],"b":null,"title":"Caf\xc3\xa9"}\n'
+
+
+def test_default_handles_datetimes_dates_and_dataclasses_like_flask(backend):
+    app = provider_app(backend)
+    when = datetime(2030, 1, 15, 7, 30, tzinfo=timezone.utc)
+    assert app.json.dumps({"when": when, "day": date(2030, 1, 15), "step": Step("Eat")}) == (
+        '{"day":"Tue, 15 Jan 2030 00:00:00 GMT","step":{"done":false,"title":"Eat"},'
+        '"when":"Tue, 15 Jan 2030 07:30:00 GMT"}'
+    )
+    with pytest.raises(TypeError):
+        app.json.dumps({"unknown": object()})
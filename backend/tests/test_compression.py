@@ -0,0 +1,91 @@
+from __future__ import annotations
+import gzip
+import json
+
+import pytest
+
+import app as backend
+import compression
+
+BLOCKS = [
+    {"title": f"Homework {i}", "steps": ["Open the book", "Do the exercises"], "startTime": "4:00",
+     "endTime": "5:00", "period": "PM", "date": "2030-01-01"}
+    for i in range(30)
+]
+PROFILE = "/profile?date=2030-01-01"
+
+
+@pytest.fixture
+def gzip_only(monkeypatch):
+    monkeypatch.setattr(backend, "COMPRESS_ENCODINGS", ("gzip",))
+    backend.COMPRESSED_BODIES.clear()
+    calls = []
+    real = compression.compress
+
+    def counted(data: bytes, encoding: str, level: int | None = None) -> bytes:
+        calls.append(encoding)
+        return real(data, encoding, level)
+    monkeypatch.setattr(compression, "compress", counted)
+    yield calls
+    backend.COMPRESSED_BODIES.clear()
+
+
+@pytest.fixture
+def headers(make_user):
+    return make_user("parent1", profile_data=json.dumps({"schedule_blocks": BLOCKS}))
+
+
+def test_negotiate_picks_the_highest_q_value_offered():
+    offered = ("zstd", "br", "gzip")
+    assert compression.negotiate("gzip, br;q=0.5", offered) == "gzip"
+    assert compression.negotiate("gzip, br", offered) == "br"
+    assert compression.negotiate("x-gzip", offered) == "gzip"
+    assert compression.negotiate("*", offered) == "zstd"
+    assert compression.negotiate("gzip;q=0, identity", offered) is None
+    assert compression.negotiate(None, offered) is None
+
+
+def test_a_large_body_is_gzipped_when_the_client_accepts_it(client, headers, gzip_only):
+    plain = client.get(PROFILE, headers=headers)
+    packed = client.get(PROFILE, headers={**headers, "Accept-Encoding": "br;q=0.9, gzip"})
+
+    assert "Content-Encoding" not in plain.headers
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in packed.headers["Vary"]
+    assert len(packed.data) < len(plain.data)
+    assert gzip.decompress(packed.data) == plain.data
+
+
+def test_a_body_under_the_threshold_is_sent_as_is(client, headers, gzip_only, monkeypatch):
+    monkeypatch.setattr(backend, "COMPRESS_MIN_BYTES", 1 << 20)
+    resp = client.get(PROFILE, headers={**headers, "Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in resp.headers
+    assert gzip_only == []
+
+
+def test_identity_and_gzip_share_a_weak_etag_and_answer_304(client, headers, gzip_only):
+    plain = client.get(PROFILE, headers=headers)
+    packed = client.get(PROFILE, headers={**headers, "Accept-Encoding": "gzip"})
+    etag = plain.headers["ETag"]
+    assert etag.startswith('W/"') and packed.headers["ETag"] == etag
+
+    again = client.get(PROFILE, headers={**headers, "Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+
+
+def test_an_unchanged_body_is_compressed_once(client, headers, gzip_only):
+    first = client.get(PROFILE, headers={**headers, "Accept-Encoding": "gzip"})
+    second = client.get(PROFILE, headers={**headers, "Accept-Encoding": "gzip"})
+    assert first.data == second.data
+    assert gzip_only == ["gzip"]
+
+
+def test_a_body_compression_does_not_shrink_is_not_compressed_again(client, make_user, gzip_only, monkeypatch):
+    monkeypatch.setattr(backend, "COMPRESS_MIN_BYTES", 1)
+    headers = make_user("parent1")
+    for _ in range(3):
+        resp = client.get("/favorites", headers={**headers, "Accept-Encoding": "gzip"})
+        assert resp.status_code == 200
+        assert "Content-Encoding" not in resp.headers
+    assert gzip_only == ["gzip"]
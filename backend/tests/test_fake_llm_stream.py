@@ -0,0 +1,108 @@
+from __future__ import annotations
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+import requests
+from werkzeug.serving import make_server
+
+import app as backend
+from ai_providers import OpenAICompatibleProvider, ProviderError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+import fake_llm_server  # noqa: E402
+
+
+def running(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def fake_llm():
+    """fake_llm(**handler options) -> the URL of a running tools/fake_llm_server.py."""
+    servers = []
+
+    def start(**options) -> str:
+        server = running(fake_llm_server.serve("127.0.0.1", 0, **options))
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def live_app(flask_app):
+    """Base URL of `flask_app` served over real HTTP, so SSE chunks arrive as the client would see them."""
+    server = running(make_server("127.0.0.1", 0, flask_app, threaded=True))
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def fake_provider(url: str) -> OpenAICompatibleProvider:
+    return OpenAICompatibleProvider(
+        "fake", url=url, model="fake", system_instruction=backend._AI_SYSTEM_INSTRUCTION,
+        sanitize=backend._sanitize_model_tasks, deadline=10,
+    )
+
+
+def read_events(base_url: str, headers: dict, prompt: str) -> list[tuple[str, dict, float]]:
+    """(event, data, seconds since the request) for every SSE event, read as it arrives."""
+    started = time.monotonic()
+    events = []
+    with requests.post(f"{base_url}/ai/tasks/stream", headers=headers, json={"prompt": prompt}, stream=True, timeout=10) as resp:
+        assert resp.status_code == 200
+        assert resp.headers["Content-Type"].startswith("text/event-stream")
+        name = None
+        for line in resp.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                name = line[7:]
+            elif line.startswith("data: "):
+                events.append((name, json.loads(line[6:]), time.monotonic() - started))
+    return events
+
+
+def test_tasks_arrive_while_the_completion_is_still_streaming(live_app, make_user, providers, fake_llm):
+    # The canned reply is ~30 deltas, so the completion takes about a second to finish.
+    providers(fake_provider(fake_llm(token_delay=0.03, first_token_delay=0.05, chunk_size=24)))
+    events = read_events(live_app, make_user("parent1"), "school morning")
+    names = [name for name, _, _ in events]
+    assert names == ["task"] * len(fake_llm_server.CANNED_TASKS["tasks"]) + ["done"]
+    assert events[-1][1] == {"count": 4, "source": "fake"}
+    first_task_at, done_at = events[0][2], events[-1][2]
+    assert first_task_at < done_at - 0.4
+    assert events[0][1]["title"] == "Wake up and stretch"
+
+
+def test_partial_upstream_failure_ends_with_error_and_done(live_app, make_user, providers, fake_llm):
+    # 8 deltas of 24 characters close the first task but not the second.
+    providers(fake_provider(fake_llm(token_delay=0.0, first_token_delay=0.0, chunk_size=24, fail_after=8)))
+    events = read_events(live_app, make_user("parent1"), "school morning")
+    assert [name for name, _, _ in events] == ["task", "error", "done"]
+    assert events[-1][1] == {"count": 1, "source": "fake", "partial": True}
+    assert backend.AI_TASK_CACHE.get(backend._ai_cache_key("school morning")) is None
+
+
+
+def test_provider_that_stalls_mid_stream_fails_at_its_deadline(fake_llm):
+    # ~0.8s of deltas, then 1.1s of silence: each read stays under the 1.2s read
+    # timeout, but together they run well past the 1.2s deadline.
+    url = fake_llm(token_delay=0.05, first_token_delay=0.0, chunk_size=24, stall_after=16, stall=1.1)
+    provider = OpenAICompatibleProvider(
+        "fake", url=url, model="fake", system_instruction=backend._AI_SYSTEM_INSTRUCTION,
+        sanitize=backend._sanitize_model_tasks, deadline=1.2,
+    )
+    started = time.monotonic()
+    tasks = []
+    with pytest.raises(ProviderError, match="deadline"):
+        for task in provider.call_stream("school morning"):
+            tasks.append(task)
+    assert time.monotonic() - started < 1.6
+    assert tasks and tasks[0]["title"] == "Wake up and stretch"
+    assert provider.failures == 1
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from keywords import KeywordAutomaton
+from planner import TIME_RE
+
+
+def keywords(text: str, *pairs: tuple[str, object]) -> list[tuple[str, object]]:
+    return [(text[h.start:h.end], h.value) for h in KeywordAutomaton(pairs).scan(text) if h.kind == "keyword"]
+
+
+def test_keywords_only_match_whole_words():
+    assert keywords("Tidy the bathroom", ("bath", "bath")) == []
+    assert keywords("Birdbath repairs", ("bath", "bath")) == []
+    assert keywords("Take a bath.", ("bath", "bath")) == [("bath", "bath")]
+
+
+def test_allowed_suffixes_extend_a_match():
+    assert keywords("Cleaning the garage", ("clean", 1)) == [("Cleaning", 1)]
+    assert keywords("Weekly chores", ("chore", 1)) == [("chores", 1)]
+    assert keywords("Cleaned already", ("clean", 1)) == []
+    assert KeywordAutomaton([("clean", 1)], suffixes=()).scan("cleaning") == []
+
+
+def test_phrases_match_across_spaces_and_case():
+    assert keywords("Then GO TO BED", ("go to bed", 1), ("bed", 2)) == [("GO TO BED", 1), ("BED", 2)]
+
+
+def test_first_payload_for_a_repeated_keyword_wins():
+    assert keywords("homework", ("homework", "generic"), ("Homework", "catalog")) == [("homework", "generic")]
+
+
+def test_time_expressions_are_reported_separately():
+    hits = KeywordAutomaton([("soccer", 1)]).scan("Soccer at 4:30pm", time_re=TIME_RE)
+    assert [(h.kind, h.start, h.end) for h in hits] == [("keyword", 0, 6), ("time", 10, 16)]
+    assert hits[1].value.group("minute") == "30"
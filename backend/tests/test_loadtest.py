@@ -0,0 +1,88 @@
+from __future__ import annotations
+import json
+from datetime import datetime
+
+from loadtest.dataset import DatasetConfig, generate
+from loadtest.report import PERCENTILES, build_report, compare, percentile
+from loadtest.runner import Client, Recorder, Tokens
+
+NOW = datetime(2030, 1, 15, 12, 0)
+SMALL = DatasetConfig(families=2, years=0.05, templates=2, routines=2)
+
+
+def tables(cfg: DatasetConfig, now: datetime = NOW) -> dict:
+    out: dict = {}
+    for table, rows in generate(cfg, now=now):
+        if table == "manifest":
+            out[table] = rows
+        else:
+            out.setdefault(table, []).extend(rows)
+    return out
+
+
+def test_dataset_is_deterministic_for_a_seed():
+    first = tables(SMALL)
+    assert tables(SMALL) == first
+    assert tables(DatasetConfig(**{**SMALL.__dict__, "seed": 2})) != first
+
+    manifest = first["manifest"]
+    assert [f["family_id"] for f in manifest["families"]] == ["LT000000", "LT000001"]
+    assert len(first["users"]) == 2 * (SMALL.parents + SMALL.children + 1)
+    assert len(first["task_templates"]) == 2 * SMALL.templates
+    assert len(first["routine_templates"]) == 2 * SMALL.routines
+
+
+def test_family_blocks_are_shared_by_the_master_and_children():
+    users = {u["username"]: json.loads(u["profile_data"])["schedule_blocks"] for u in tables(SMALL)["users"]}
+    master, child = users["lt0_parent0"], users["lt0_child0"]
+    days = int(SMALL.years * 365) + 31
+    assert len(master) == len(child) == days * SMALL.blocks_per_day
+    tagged = [b["family_tag"] for b in master if b["family_tag"]]
+    assert len(tagged) == days
+    assert tagged == [b["family_tag"] for b in child if b["family_tag"]]
+    assert users["lt0_parent1"] == users["lt0_free"] == []
+    # Only days before `now` have completed blocks.
+    assert not any(b["completed"] for b in master if b["date"] >= NOW.date().isoformat())
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(n) for n in range(1, 11)]
+    assert [percentile(values, p) for p in (50, 90, 95, 99, 100)] == [5.0, 9.0, 10.0, 10.0, 10.0]
+    assert percentile([], 95) == 0.0
+    assert percentile([7.0], 50) == 7.0
+
+
+def test_report_counts_requests_errors_and_percentiles(client, make_user, loadtest_server):
+    client.post("/register", json={"username": "alice", "display_name": "Alice", "password": "loadtest-pass"})
+    recorder = Recorder()
+    http = Client(loadtest_server.url, recorder)
+    token = Tokens("loadtest-pass").get(http, "alice")
+    assert token
+    for _ in range(5):
+        assert http.call("GET", "/profile", token=token, params={"date": "2030-01-01"}) is not None
+    assert http.call("GET", "/profile", label="GET /profile") is None  # no token: 401
+    assert http.call("GET", "/no-such-route", expect=(404,)) == {}
+
+    report = build_report(recorder, 2.0, {"label": "test"})
+
+    assert report["meta"]["label"] == "test"
+    assert report["meta"]["elapsed_s"] == 2.0
+    profile = report["endpoints"]["GET /profile"]
+    assert (profile["count"], profile["errors"], profile["error_rate"]) == (6, 1, round(1 / 6, 4))
+    assert profile["status"] == {"200": 5, "401": 1}
+    assert profile["rps"] == 3.0
+    ladder = [profile[f"p{p}_ms"] for p in PERCENTILES] + [profile["max_ms"]]
+    assert ladder == sorted(ladder) and ladder[0] > 0
+    total = report["total"]
+    assert (total["count"], total["errors"]) == (8, 1)
+    assert set(report["endpoints"]) == {"GET /profile", "POST /login", "GET /no-such-route"}
+
+
+def test_compare_flags_slower_endpoints_with_enough_samples():
+    def run(p95: float, count: int = 50) -> dict:
+        endpoint = {"p95_ms": p95, "count": count}
+        return {"meta": {"commit": "abc"}, "total": {"rps": 10.0}, "endpoints": {"GET /profile": endpoint}}
+
+    assert compare(run(10.0), run(12.0))[1] == ["GET /profile"]
+    assert compare(run(10.0), run(10.5))[1] == []
+    assert compare(run(10.0, count=5), run(50.0, count=5))[1] == []
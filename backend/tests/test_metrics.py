@@ -0,0 +1,65 @@
+from __future__ import annotations
+import os
+
+import metrics
+
+DEAD_PID = 2 ** 22 + 12345  # above Linux's default pid_max, so never a live process
+
+
+def worker(tmp_path) -> metrics.Registry:
+    registry = metrics.Registry(multiprocess_dir=str(tmp_path))
+    registry.counter("jobs_total", "Jobs.", ("kind",))
+    registry.gauge("busy", "Busy workers.")
+    registry.histogram("job_seconds", "Job time.", buckets=(1.0,))
+    return registry
+
+
+def exited_worker(tmp_path, pid: int, jobs: int) -> None:
+    """Leave the snapshot a worker with `pid` would have flushed before exiting."""
+    registry = worker(tmp_path)
+    registry._metrics["jobs_total"].labels("a").inc(jobs)
+    registry._metrics["busy"].set(1)
+    registry._metrics["job_seconds"].observe(0.5)
+    metrics._write_json(registry._path(pid), registry.snapshot())
+
+
+def sample(text: str, name: str) -> str | None:
+    return next((line.split()[-1] for line in text.splitlines() if line.startswith(name + " ")), None)
+
+
+def test_dead_worker_is_folded_into_the_aggregate(tmp_path):
+    exited_worker(tmp_path, DEAD_PID, jobs=3)
+    scraper = worker(tmp_path)
+    scraper._metrics["jobs_total"].labels("a").inc(2)
+    before = scraper.render()
+
+    scraper.mark_process_dead(DEAD_PID)
+
+    assert not os.path.exists(scraper._path(DEAD_PID))
+    assert os.path.exists(os.path.join(tmp_path, metrics.AGGREGATE_FILE))
+    after = scraper.render()
+    assert sample(after, 'jobs_total{kind="a"}') == sample(before, 'jobs_total{kind="a"}') == "5"
+    assert sample(after, "job_seconds_count") == "1"
+    assert sample(after, "busy") is None  # a dead worker's gauges are dropped
+
+
+def test_reused_pid_does_not_send_counters_backwards(tmp_path):
+    exited_worker(tmp_path, DEAD_PID, jobs=10)
+    scraper = worker(tmp_path)
+    scraper.mark_process_dead(DEAD_PID)
+    # The OS hands the pid to a new worker, which has done one job so far.
+    exited_worker(tmp_path, DEAD_PID, jobs=1)
+    assert sample(scraper.render(), 'jobs_total{kind="a"}') == "11"
+    scraper.mark_process_dead(DEAD_PID)
+    assert sample(scraper.render(), 'jobs_total{kind="a"}') == "11"
+    assert sorted(os.listdir(tmp_path)) == [metrics.AGGREGATE_FILE, "metrics.lock"]
+
+
+def test_exiting_worker_folds_itself_and_stops_flushing(tmp_path):
+    registry = worker(tmp_path)
+    registry._metrics["jobs_total"].labels("a").inc(4)
+    registry.flush()
+    registry.mark_process_dead()
+    registry.flush()  # a late periodic or atexit flush must not bring the snapshot back
+    assert not os.path.exists(registry._path(os.getpid()))
+    assert sample(worker(tmp_path).render(), 'jobs_total{kind="a"}') == "4"
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from planner import (
+    CATALOG_RULES, DAY_MINUTES, KEYWORD_RULES, block_interval, busy_intervals, match_rule, plan_tasks,
+)
+
+
+def generic(keyword: str):
+    return next(rule for rule in KEYWORD_RULES if keyword in rule.keywords)
+
+
+def catalog(keyword: str):
+    return next(rule for rule in CATALOG_RULES if keyword in rule.keywords)
+
+
+def block(start: str, end: str, period: str) -> dict:
+    return {"title": "Busy", "startTime": start, "endTime": end, "period": period}
+
+
+def spans(tasks: list[dict]) -> list[tuple[int, int]]:
+    return [block_interval(task) for task in tasks]
+
+
+def assert_disjoint(*groups: list[tuple[int, int]]) -> None:
+    ordered = sorted(span for group in groups for span in group)
+    for (_, end), (start, _) in zip(ordered, ordered[1:]):
+        assert end <= start, ordered
+
+
+def test_tasks_that_reach_midnight_do_not_wrap_into_the_morning():
+    tasks = plan_tasks("Tonight: homework. Read a chapter. Tidy the bedroom. Laundry. Dinner",
+                       [block("6:00", "11:00", "PM")])
+    assert tasks
+    for start, end in spans(tasks):
+        assert 18 * 60 <= start < end <= DAY_MINUTES
+    assert_disjoint(spans(tasks), [(18 * 60, 23 * 60)])
+
+
+def test_later_tasks_never_start_before_earlier_ones():
+    tasks = plan_tasks("Evening: homework. Read a chapter. Tidy the bedroom. Laundry. Dinner. Shower")
+    starts = [start for start, _ in spans(tasks)]
+    assert starts == sorted(starts)
+    assert all(end <= DAY_MINUTES for _, end in spans(tasks))
+
+
+def test_pinned_task_moves_off_a_taken_slot():
+    existing = [block("4:00", "5:00", "PM")]
+    tasks = plan_tasks("Soccer practice at 4pm", existing)
+    assert len(tasks) == 1
+    assert spans(tasks)[0][0] == 17 * 60
+    assert_disjoint(spans(tasks), busy_intervals(existing))
+
+
+def test_pinned_task_keeps_a_free_slot():
+    tasks = plan_tasks("Soccer practice at 4pm", [block("3:00", "4:00", "PM")])
+    assert spans(tasks)[0][0] == 16 * 60
+
+
+def test_pinned_tasks_do_not_overlap_each_other():
+    tasks = plan_tasks("Soccer practice at 4pm. Piano lesson at 4pm")
+    assert len(tasks) == 2
+    assert_disjoint(spans(tasks))
+
+
+def test_pinned_task_late_at_night_is_cut_at_midnight():
+    tasks = plan_tasks("Read a chapter at 11:45pm")
+    assert spans(tasks) == [(23 * 60 + 45, DAY_MINUTES)]
+
+
+def test_pinned_task_with_no_room_left_is_dropped():
+    tasks = plan_tasks("Soccer practice at 11pm", [block("11:00", "11:59", "PM")])
+    assert tasks == []
+
+
+def test_keywords_match_whole_words_only():
+    # "bath" is a keyword, "bathroom" is not; the chore rule wins on "tidy".
+    assert match_rule("Tidy the bathroom") is generic("tidy")
+    assert match_rule("Bathroom") is None
+
+
+def test_keywords_match_with_an_allowed_suffix():
+    assert match_rule("Cleaning the garage") is generic("clean")
+    assert match_rule("Readings for class") is generic("read")
+
+
+def test_generic_rule_keeps_a_keyword_the_catalog_repeats():
+    assert catalog("shower").weight > generic("shower").weight
+    assert match_rule("Shower") is generic("shower")
+    # A longer catalog phrase is a different keyword and outranks the generic match.
+    assert match_rule("Homework block") is catalog("homework block")
+
+
+def test_earliest_keyword_wins_a_tie():
+    assert generic("dinner").weight == generic("breakfast").weight
+    assert match_rule("Dinner then breakfast prep") is generic("dinner")
+    assert match_rule("Breakfast then dinner prep") is generic("breakfast")
+
+
+def test_times_do_not_pick_steps_or_stay_in_titles():
+    [task] = plan_tasks("Call grandma at 4pm")
+    assert task["title"] == "Call Grandma"
+    assert task["steps"] == [
+        "Plan what is needed for call grandma",
+        "Work through the main part of call grandma",
+        "Review progress and clean up after call grandma",
+    ]
+    [task] = plan_tasks("Soccer at 4pm")
+    assert (task["title"], task["startTime"], task["period"]) == ("Soccer", "4:00", "PM")
+    assert task["steps"] == list(generic("soccer").steps)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+import json
+
+import pytest
+from sqlalchemy import update
+
+import app as backend
+import profile_blob
+
+PROFILE = {
+    "schedule_blocks": [
+        {"title": "Breakfast", "startTime": "7:00", "endTime": "7:30", "period": "AM", "date": "2030-01-01"},
+        {"date": "2030-01-01", "title": "Reading", "steps": ["Pick a book", "Read 20 min"], "completed": True},
+        {"title": "Breakfast", "startTime": "7:00", "endTime": "7:30", "period": "AM", "date": "2030-01-02"},
+        {"title": "Café ☕", "family_tag": "fam-1", "date": "2030-01-02", "hidden": None},
+    ],
+    "preferences": {"theme": "dark"},
+    "favorites": {"templates": ["t1"], "routines": []},
+}
+VARIANTS = [("json", 0), ("columnar", 0), ("json", 1), ("columnar", 1)]
+
+
+@pytest.mark.parametrize("fmt, compress_min_bytes", VARIANTS)
+def test_every_format_round_trips_keys_order_and_values(fmt, compress_min_bytes):
+    blob = profile_blob.encode(PROFILE, fmt=fmt, compress_min_bytes=compress_min_bytes)
+    decoded = profile_blob.decode(blob)
+    assert decoded == PROFILE
+    assert [list(block) for block in decoded["schedule_blocks"]] == [list(block) for block in PROFILE["schedule_blocks"]]
+    assert profile_blob.describe(blob) == ("compressed" if compress_min_bytes else fmt)
+
+
+@pytest.mark.parametrize("fmt, compress_min_bytes", VARIANTS)
+def test_an_empty_schedule_round_trips(fmt, compress_min_bytes):
+    doc = {"schedule_blocks": [], "preferences": {"theme": "system"}}
+    assert profile_blob.decode(profile_blob.encode(doc, fmt=fmt, compress_min_bytes=compress_min_bytes)) == doc
+
+
+def test_columnar_writes_each_block_shape_once():
+    blob = profile_blob.encode(PROFILE, fmt="columnar")
+    assert blob.startswith(profile_blob.COLUMNAR_TAG)
+    assert len(json.loads(blob[len(profile_blob.COLUMNAR_TAG):])["shapes"]) == 3
+
+
+def test_a_schedule_with_non_dict_blocks_is_stored_as_plain_json():
+    doc = {"schedule_blocks": [{"title": "Breakfast"}, "not a block", None]}
+    blob = profile_blob.encode(doc, fmt="columnar")
+    assert profile_blob.describe(blob) == "json"
+    assert profile_blob.decode(blob) == doc
+
+
+def test_rows_written_before_versioned_formats_still_decode():
+    legacy = json.dumps(PROFILE)
+    assert profile_blob.describe(legacy) == "json"
+    assert profile_blob.decode(legacy) == PROFILE
+    assert profile_blob.decode(legacy.encode("utf-8")) == PROFILE
+
+
+@pytest.mark.parametrize("damaged", ["z1:not base64!", "z1:" + "QUJD" * 4])
+def test_a_damaged_compressed_blob_raises_value_error(damaged):
+    with pytest.raises(ValueError):
+        profile_blob.decode(damaged)
+
+
+def test_block_fields_projects_columnar_blocks_in_the_order_asked():
+    blob = profile_blob.encode(PROFILE, fmt="columnar", compress_min_bytes=1)
+    blocks = profile_blob.decode(blob, block_fields=["title", "date", "steps"])["schedule_blocks"]
+    assert [list(block.items()) for block in blocks] == [
+        [("title", "Breakfast"), ("date", "2030-01-01")],
+        [("title", "Reading"), ("date", "2030-01-01"), ("steps", ["Pick a book", "Read 20 min"])],
+        [("title", "Breakfast"), ("date", "2030-01-02")],
+        [("title", "Café ☕"), ("date", "2030-01-02")],
+    ]
+
+
+def test_convert_profiles_rewrites_rows_and_leaves_rows_changed_meanwhile(flask_app, make_user, monkeypatch):
+    for name in ("parent1", "parent2"):
+        make_user(name, profile_data=json.dumps(PROFILE))
+    make_user("parent3", profile_data="z1:damaged")
+    concurrent = json.dumps({"schedule_blocks": [{"title": "Written meanwhile", "date": "2030-01-01"}]})
+    dump = backend._dump_profile
+
+    def dump_while_parent2_is_edited(profile: dict, fmt: str | None = None) -> str:
+        # Another writer saves parent2 between the converter's read and its write.
+        backend.db.session.execute(
+            update(backend.User.__table__).where(backend.User.username == "parent2").values(profile_data=concurrent)
+        )
+        return dump(profile, fmt)
+    monkeypatch.setattr(backend, "_dump_profile", dump_while_parent2_is_edited)
+
+    result = flask_app.test_cli_runner().invoke(args=["convert-profiles", "--format", "columnar", "--pause", "0"])
+    assert result.exit_code == 0, result.output
+    assert "3 rows {'json': 2, 'compressed': 1}; 1 rewritten, 1 unreadable" in result.output
+
+    with flask_app.app_context():
+        stored = {u.username: u.profile_data for u in backend.User.query.all()}
+    assert profile_blob.describe(stored["parent1"]) == "columnar"
+    assert profile_blob.decode(stored["parent1"]) == PROFILE
+    assert stored["parent2"] == concurrent
+    assert stored["parent3"] == "z1:damaged"
@@ -0,0 +1,84 @@
+from __future__ import annotations
+import json
+
+import pytest
+
+import app as backend
+
+DAY = "2030-01-01"
+BLOCKS = [
+    {"title": "Breakfast", "steps": ["Eat", "Clear plate"], "startTime": "7:00", "endTime": "7:30",
+     "period": "AM", "hidden": False, "completed": False, "family_tag": "", "date": DAY},
+    {"title": "Other day", "steps": [], "startTime": "8:00", "endTime": "9:00", "period": "AM", "date": "2030-01-02"},
+    {"title": "Homework", "steps": ["Math", "Reading", "Spelling"], "startTime": "4:00", "endTime": "5:00",
+     "period": "PM", "hidden": False, "completed": True, "family_tag": "fam-1", "date": DAY},
+    {"title": "Free play", "startTime": "5:00", "endTime": "6:00", "period": "PM", "date": DAY},
+]
+
+
+@pytest.fixture(params=["json", "columnar"])
+def headers(request, make_user):
+    blob = backend._dump_profile({"schedule_blocks": BLOCKS, "preferences": {"theme": "dark"}}, request.param)
+    return make_user("parent1", profile_data=blob)
+
+
+def get(client, headers, query: str):
+    return client.get(f"/profile?date={DAY}&{query}", headers=headers)
+
+
+def test_fields_keeps_only_the_named_sections_and_block_fields(client, headers):
+    body = get(client, headers, "fields=title,completed,preferences").get_json()
+    assert set(body) == {"schedule_blocks", "preferences", "selected_date"}
+    assert body["schedule_blocks"] == [
+        {"title": "Breakfast", "completed": False, "index": 0},
+        {"title": "Homework", "completed": True, "index": 2},
+        {"title": "Free play", "index": 3},
+    ]
+
+
+def test_full_view_keeps_the_stored_block_shape(client, headers):
+    body = get(client, headers, "").get_json()
+    assert set(body) == {"schedule_blocks", "preferences", "favorites", "selected_date"}
+    assert body["schedule_blocks"] == [b for b in BLOCKS if b["date"] == DAY]
+
+
+def test_unknown_fields_and_views_are_rejected(client, headers):
+    assert get(client, headers, "fields=title,password").status_code == 400
+    assert get(client, headers, "view=grid").status_code == 400
+
+
+def test_list_view_counts_steps_instead_of_sending_them(client, headers):
+    blocks = get(client, headers, "view=list").get_json()["schedule_blocks"]
+    assert [(b["title"], b["step_count"], b["index"]) for b in blocks] == [
+        ("Breakfast", 2, 0), ("Homework", 3, 2), ("Free play", 0, 3),
+    ]
+    assert not any("steps" in b for b in blocks)
+    assert blocks[1]["family_tag"] == "fam-1"
+
+
+def test_list_view_with_fields_counts_steps_only_when_asked(client, headers):
+    blocks = get(client, headers, "view=list&fields=title").get_json()["schedule_blocks"]
+    assert blocks[0] == {"title": "Breakfast", "index": 0}
+    blocks = get(client, headers, "view=list&fields=title,steps").get_json()["schedule_blocks"]
+    assert blocks[0] == {"title": "Breakfast", "step_count": 2, "index": 0}
+
+
+def test_block_by_index_returns_every_field(client, headers):
+    resp = client.get(f"/profile/block/2?date={DAY}&title=Homework", headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json() == {"block": BLOCKS[2], "index": 2}
+
+
+def test_block_by_index_answers_409_when_the_schedule_moved(client, headers):
+    assert client.get(f"/profile/block/2?date={DAY}&title=Breakfast", headers=headers).status_code == 409
+    assert client.get("/profile/block/2?date=2030-01-02", headers=headers).status_code == 409
+    assert client.get("/profile/block/9", headers=headers).status_code == 404
+
+
+def test_projected_columnar_blocks_never_hold_the_counted_steps():
+    blob = backend._dump_profile({"schedule_blocks": BLOCKS}, "columnar")
+    blocks = backend._safe_profile_dict(blob, ["title"], {"steps": "step_count"})["schedule_blocks"]
+    assert [json.dumps(b, sort_keys=True) for b in blocks[:2]] == [
+        '{"date": "2030-01-01", "step_count": 2, "title": "Breakfast"}',
+        '{"date": "2030-01-02", "step_count": 0, "title": "Other day"}',
+    ]
@@ -0,0 +1,124 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as backend
+
+
+def saved_titles(username: str) -> list[str]:
+    user = backend.User.query.filter_by(username=username).first()
+    backend.db.session.refresh(user)
+    return [blk.get("title") for blk in backend._user_profile(user)["schedule_blocks"]]
+
+
+def add(title: str):
+    def change(prof: dict) -> tuple[dict, int]:
+        prof["schedule_blocks"].append({"title": title, "date": "2030-01-01"})
+        return {"message": "Block add successful"}, 200
+    return change
+
+
+def test_an_edit_that_fails_halfway_is_not_saved_with_the_rest_of_its_batch(flask_app, make_user):
+    make_user("parent1")
+
+    def half_then_fail(prof: dict) -> tuple[dict, int]:
+        prof["schedule_blocks"].append({"title": "Half", "date": "2030-01-01"})
+        raise RuntimeError("boom")
+
+    with flask_app.app_context():
+        user_id = backend.User.query.filter_by(username="parent1").first().id
+        edits = [backend._ProfileEdit(change, flask_app) for change in (add("Before"), half_then_fail, add("After"))]
+        results = backend._apply_profile_edits(user_id, edits)
+        assert [status for _, status in results] == [200, 500, 200]
+        assert saved_titles("parent1") == ["Before", "After"]
+
+
+@pytest.mark.parametrize("queued", [False, True], ids=["sync", "async"])
+def test_family_adds_and_single_adds_to_one_child_are_all_kept(flask_app, make_user, monkeypatch, queued):
+    monkeypatch.setattr(backend, "PROFILE_WRITE_ASYNC", queued)
+    parent = make_user("parent1", family_id="FAM1")
+    make_user("child1", account_type="child", family_id="FAM1")
+    with flask_app.app_context():
+        backend.db.session.add(backend.Family(family_id="FAM1", name="Smiths", password="x", creator_username="parent1"))
+        backend.db.session.commit()
+
+    def post(title: str) -> int:
+        target = {"apply_to_family": True} if title.startswith("Family") else {"target_child": "child1"}
+        block = {"title": title, "start": "09:00", "end": "10:00"}
+        return flask_app.test_client().post(
+            "/profile/block/add", headers=parent, json={"block": block, "date": "2030-01-01", **target},
+        ).status_code
+
+    titles = [f"{kind} {i}" for i in range(8) for kind in ("Family", "Single")]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert set(pool.map(post, titles)) <= {200, 202}
+
+    with flask_app.test_request_context():
+        child = backend.User.query.filter_by(username="child1").first()
+        # Edits to one user run in order, so this returns once the queued ones are saved.
+        backend._submit_profile_edit(child, lambda prof: ({}, 200), wait=True)
+        assert sorted(saved_titles("child1")) == sorted(titles)
+
+
+def family_of(flask_app, make_user, *children: str) -> dict:
+    parent = make_user("parent1", family_id="FAM1")
+    for child in children:
+        make_user(child, account_type="child", family_id="FAM1")
+    with flask_app.app_context():
+        backend.db.session.add(backend.Family(family_id="FAM1", name="Smiths", password="x", creator_username="parent1"))
+        backend.db.session.commit()
+    return parent
+
+
+def fail_on_dump(monkeypatch, nth: int) -> None:
+    dump, calls = backend._dump_profile, []
+
+    def flaky(profile: dict, fmt: str | None = None) -> str:
+        calls.append(fmt)
+        if len(calls) == nth:
+            raise RuntimeError("disk full")
+        return dump(profile, fmt)
+    monkeypatch.setattr(backend, "_dump_profile", flaky)
+
+
+def test_a_family_add_that_fails_for_one_child_changes_no_schedule(flask_app, make_user, monkeypatch):
+    parent = family_of(flask_app, make_user, "child1", "child2")
+    fail_on_dump(monkeypatch, 3)
+    block = {"title": "Chores", "start": "09:00", "end": "10:00"}
+    with pytest.raises(RuntimeError):
+        flask_app.test_client().post(
+            "/profile/block/add", headers=parent, json={"block": block, "date": "2030-01-01", "apply_to_family": True},
+        )
+
+    with flask_app.app_context():
+        assert [saved_titles(name) for name in ("parent1", "child1", "child2")] == [[], [], []]
+
+
+def test_a_failed_master_transfer_leaves_schedule_and_master_in_place(flask_app, make_user, monkeypatch):
+    parent = family_of(flask_app, make_user)
+    make_user("parent2", family_id="FAM1")
+    with flask_app.app_context():
+        user = backend.User.query.filter_by(username="parent1").first()
+        backend._apply_profile_edits(user.id, [backend._ProfileEdit(add("Dinner"), flask_app)])
+    fail_on_dump(monkeypatch, 2)
+    with pytest.raises(RuntimeError):
+        flask_app.test_client().post("/family/master/transfer", headers=parent, json={"username": "parent2"})
+
+    with flask_app.app_context():
+        assert saved_titles("parent1") == ["Dinner"]
+        assert saved_titles("parent2") == []
+        assert backend.Family.query.filter_by(family_id="FAM1").first().creator_username == "parent1"
+
+
+def test_a_batch_deploy_that_fails_for_one_child_saves_nothing(flask_app, make_user, monkeypatch, providers):
+    providers()
+    parent = family_of(flask_app, make_user, "child1", "child2")
+    fail_on_dump(monkeypatch, 2)
+    items = [{"child": child, "prompt": "homework and reading", "date": "2030-01-01"} for child in ("child1", "child2")]
+    resp = flask_app.test_client().post("/ai/tasks/batch", headers=parent, json={"items": items, "deploy": True})
+
+    assert resp.status_code == 500
+    assert not any(item.get("deployed") for item in resp.get_json()["items"])
+    with flask_app.app_context():
+        assert [saved_titles(name) for name in ("child1", "child2")] == [[], []]
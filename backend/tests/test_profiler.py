@@ -0,0 +1,129 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+import app as backend
+from profiler import ProfileStore, StackSampler, collapsed
+
+TOKEN = "profile-me"
+
+
+@pytest.fixture
+def profiles(tmp_path, monkeypatch):
+    directory = tmp_path / "profiles"
+    monkeypatch.setattr(backend, "PROFILER_TOKEN", TOKEN)
+    monkeypatch.setattr(backend, "PROFILER_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(backend, "PROFILER_INTERVAL", 0.001)
+    monkeypatch.setattr(backend, "PROFILE_STORE", ProfileStore(str(directory), fmt="collapsed"))
+    return directory
+
+
+@pytest.fixture
+def flask_app(profiles, flask_app):
+    # create_app only installs the profiler hooks when a token or sample rate is set.
+    return flask_app
+
+
+def saved(directory, name: str) -> str:
+    """Contents of a profile; it is written on a background thread after the response."""
+    path = directory / name
+    deadline = time.monotonic() + 5
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    for thread in threading.enumerate():
+        if thread.name == "profile-writer":
+            thread.join(5)
+    return path.read_text()
+
+
+@pytest.mark.parametrize("header", [None, "", "wrong-token", TOKEN + "x"])
+def test_requests_without_the_token_are_not_profiled(client, make_user, profiles, header):
+    headers = make_user("alice")
+    if header is not None:
+        headers["X-Profile"] = header
+    resp = client.get("/profile", headers=headers)
+    assert resp.status_code == 200
+    assert "X-Profile-Id" not in resp.headers
+    assert not profiles.exists()
+
+
+def test_request_with_the_token_writes_collapsed_stacks(client, make_user, profiles, monkeypatch):
+    parse = backend._safe_profile_dict
+
+    def slow_parse(*args, **kwargs):
+        time.sleep(0.05)
+        return parse(*args, **kwargs)
+
+    monkeypatch.setattr(backend, "_safe_profile_dict", slow_parse)
+    headers = {**make_user("alice"), "X-Profile": TOKEN}
+    resp = client.get("/profile", headers=headers)
+    assert resp.status_code == 200
+    name = resp.headers["X-Profile-Id"]
+    assert name.endswith(".collapsed.txt")
+    lines = saved(profiles, name).splitlines()
+    assert any("slow_parse (test_profiler.py:" in line for line in lines)
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert stack and int(count) > 0
+
+
+def spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(100))
+
+
+def test_sampler_collapses_the_target_threads_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,))
+    worker.start()
+    sampler = StackSampler(worker.ident, interval=0.001).start()
+    time.sleep(0.1)
+    samples = sampler.stop()
+    stop.set()
+    worker.join()
+
+    assert sum(samples.values()) > 5
+    lines = collapsed(samples).splitlines()
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == sum(samples.values())
+    # Root first, leaf last, one frame per `;`-separated label.
+    frames = lines[0].rsplit(" ", 1)[0].split(";")
+    assert frames[0].startswith("_bootstrap (threading.py:")
+    assert any(f.startswith("spin (test_profiler.py:") for f in frames)
+
+
+def sampler_with(samples: int) -> StackSampler:
+    sampler = StackSampler()
+    sampler.samples = Counter({(("work", "app.py", 1), ("leaf", "app.py", n)): 1 for n in range(samples)})
+    return sampler
+
+
+def save_all(store: ProfileStore, count: int, samples: int = 10) -> list[str]:
+    names = []
+    for i in range(count):
+        names.append(store.filename(f"GET /profile {i}"))
+        store.save(names[-1], sampler_with(samples), name="GET /profile")
+    return names
+
+
+def test_rotation_keeps_the_newest_max_files(tmp_path):
+    store = ProfileStore(str(tmp_path), fmt="collapsed", max_files=3)
+    names = save_all(store, 5)
+    assert sorted(os.listdir(tmp_path)) == sorted(names[-3:])
+
+
+def test_rotation_keeps_the_newest_that_fit_in_max_bytes(tmp_path):
+    probe = ProfileStore(str(tmp_path / "probe"), fmt="collapsed")
+    size = os.path.getsize(probe.save("one", sampler_with(10), name="x"))
+    store = ProfileStore(str(tmp_path / "out"), fmt="collapsed", max_files=50, max_bytes=size * 2 + size // 2)
+    names = save_all(store, 5)
+    assert sorted(os.listdir(tmp_path / "out")) == sorted(names[-2:])
+
+
+def test_rotation_keeps_the_latest_profile_even_if_it_is_too_big(tmp_path):
+    store = ProfileStore(str(tmp_path), fmt="collapsed", max_bytes=10)
+    names = save_all(store, 3, samples=50)
+    assert os.listdir(tmp_path) == [names[-1]]
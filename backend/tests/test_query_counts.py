@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import pytest
+
+import app as backend
+from sqlcount import assert_max_queries
+
+
+@pytest.fixture
+def family(flask_app, make_user):
+    """make family(children=N) -> (parent headers, [child headers]); every child has a pending invite and leave request."""
+    def make(children: int) -> tuple[dict, list[dict]]:
+        parent = make_user("parent1", family_id="FAM1")
+        kids = [make_user(f"child{i}", account_type="child") for i in range(children)]
+        with flask_app.app_context():
+            backend.db.session.add(backend.Family(family_id="FAM1", name="Smiths", password="x", creator_username="parent1"))
+            for i in range(children):
+                backend.db.session.add(backend.Family(family_id=f"OTHER{i}", name=f"Family {i}", password="x", creator_username="x"))
+                backend.db.session.add(backend.FamilyInvite(family_id=f"OTHER{i}", child_username="child0"))
+                backend.db.session.add(backend.FamilyLeaveRequest(family_id="FAM1", child_username=f"child{i}"))
+            backend.db.session.commit()
+        return parent, kids
+    return make
+
+
+@pytest.mark.parametrize("n", [1, 10])
+def test_invites_for_a_child_take_a_fixed_number_of_statements(client, family, n):
+    _, kids = family(n)
+    with assert_max_queries(3):
+        resp = client.get("/family/invite/my", headers=kids[0])
+    assert resp.status_code == 200
+    assert len(resp.get_json()["invites"]) == n
+
+
+@pytest.mark.parametrize("n", [1, 10])
+def test_leave_requests_take_a_fixed_number_of_statements(client, family, n):
+    parent, _ = family(n)
+    with assert_max_queries(4):
+        resp = client.get("/family/leave/requests", headers=parent)
+    assert resp.status_code == 200
+    assert [r["child_username"] for r in resp.get_json()["requests"]] == [f"child{i}" for i in range(n)]
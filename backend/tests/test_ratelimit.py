@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import app as backend
+from ratelimit import MemoryStore, RateLimiter
+
+SWEEP = MemoryStore.SWEEP_EVERY
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def limiter(clock: Clock, **store) -> RateLimiter:
+    limiter = RateLimiter(MemoryStore(**store), clock=clock)
+    limiter.rule("daily", "5/day")
+    return limiter
+
+
+def exhaust(limiter: RateLimiter, key: str) -> None:
+    while limiter.hit("daily", key).allowed:
+        pass
+
+
+def test_buckets_over_the_cap_are_forgotten_on_the_sweep_schedule():
+    clock = Clock()
+    rl = limiter(clock, max_keys=100)
+    for i in range(SWEEP - 1):
+        clock.now = float(i)
+        assert rl.hit("daily", f"ip:{i}").remaining == 4
+    clock.now = float(SWEEP)
+    # Hit number SWEEP still sees every bucket, then sweeps down to the 90 newest.
+    assert rl.hit("daily", "ip:0").remaining == 3
+    assert rl.hit("daily", "ip:1").remaining == 4
+    assert rl.hit("daily", f"ip:{SWEEP - 2}").remaining == 3
+
+
+def test_sweep_keeps_a_bucket_that_is_still_draining():
+    clock = Clock()
+    rl = limiter(clock)
+    exhaust(rl, "ip:busy")
+    # One interval later the bucket has a single token back.
+    clock.now = 86400.0 / 5
+    for i in range(SWEEP):
+        rl.hit("daily", f"ip:other{i}")
+    assert rl.hit("daily", "ip:busy").allowed
+    assert not rl.hit("daily", "ip:busy").allowed
+
+
+def test_ai_requests_over_the_user_limit_do_not_spend_the_ip_limit(client, make_user, providers, monkeypatch):
+    providers()
+    monkeypatch.setattr(backend.RATE_LIMITER, "enabled", True)
+    monkeypatch.setattr(backend.RATE_LIMITER, "store", MemoryStore())
+    headers = make_user("alice")
+
+    def counts() -> tuple[int, int]:
+        rules = backend.RATE_LIMITER.stats()["rules"]
+        return rules["ai_tasks_ip"]["allowed"], rules["ai_tasks_user"]["limited"]
+
+    before = counts()
+    statuses = [
+        client.post("/ai/tasks", json={"prompt": "homework"}, headers=headers).status_code
+        for _ in range(5)
+    ]
+    assert statuses == [200, 200, 200, 429, 429]
+    ip_allowed, user_limited = counts()
+    assert (ip_allowed - before[0], user_limited - before[1]) == (3, 2)
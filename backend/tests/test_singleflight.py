@@ -0,0 +1,152 @@
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from caching import AsyncSingleFlight, SingleFlight
+
+CALLERS = 8
+
+
+class Gate:
+    """A function that counts its calls and blocks until opened."""
+
+    def __init__(self, result="tasks", error: BaseException | None = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.open = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        assert self.open.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def run_callers(flight: SingleFlight, gate: Gate, count: int = CALLERS, **kwargs) -> list:
+    """Start `count` callers for one key, open the gate once they're all waiting, return outcomes."""
+    barrier = threading.Barrier(count + 1)
+
+    def call():
+        barrier.wait()
+        try:
+            return flight.do("prompt", gate, **kwargs)
+        except Exception as exc:
+            return exc
+
+    with ThreadPoolExecutor(count) as pool:
+        futures = [pool.submit(call) for _ in range(count)]
+        barrier.wait()
+        time.sleep(0.1)  # let every caller reach the flight before the leader finishes
+        gate.open.set()
+        return [f.result() for f in futures]
+
+
+def test_concurrent_callers_share_one_call():
+    flight, gate = SingleFlight(), Gate()
+    outcomes = run_callers(flight, gate)
+    assert gate.calls == 1
+    assert sorted(outcomes) == [("tasks", False)] + [("tasks", True)] * (CALLERS - 1)
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "shared": CALLERS - 1, "timeouts": 0, "failures": 0}
+
+
+def test_leader_error_reaches_every_waiter_and_the_next_call_retries():
+    flight, gate = SingleFlight(), Gate(error=ValueError("provider down"))
+    outcomes = run_callers(flight, gate)
+    assert gate.calls == 1
+    leader = [o for o in outcomes if isinstance(o, ValueError)]
+    followers = [o for o in outcomes if isinstance(o, RuntimeError)]
+    assert len(leader) == 1 and len(followers) == CALLERS - 1
+    assert all(f.__cause__ is leader[0] for f in followers)
+    assert flight.stats()["failures"] == 1
+
+    assert flight.do("prompt", lambda: "fresh") == ("fresh", False)
+
+
+def test_follower_timeout_does_not_poison_the_key():
+    flight, gate = SingleFlight(), Gate()
+    with ThreadPoolExecutor(1) as pool:
+        leader = pool.submit(flight.do, "prompt", gate)
+        while flight.in_flight() == 0:
+            time.sleep(0.001)
+        with pytest.raises(TimeoutError):
+            flight.do("prompt", lambda: "unused", timeout=0.05)
+        gate.open.set()
+        assert leader.result() == ("tasks", False)
+    assert flight.stats()["timeouts"] == 1
+    assert flight.in_flight() == 0
+    assert flight.do("prompt", lambda: "fresh") == ("fresh", False)
+
+
+class AsyncGate:
+    def __init__(self, result="tasks", error: BaseException | None = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.open = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.open.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def gather_callers(flight: AsyncSingleFlight, gate: AsyncGate, **kwargs) -> list:
+    tasks = [asyncio.ensure_future(flight.do("prompt", gate, **kwargs)) for _ in range(CALLERS)]
+    await asyncio.sleep(0)  # every caller joins the flight
+    gate.open.set()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_async_concurrent_callers_share_one_call():
+    async def scenario():
+        flight, gate = AsyncSingleFlight(), AsyncGate()
+        outcomes = await gather_callers(flight, gate)
+        assert gate.calls == 1
+        assert sorted(outcomes) == [("tasks", False)] + [("tasks", True)] * (CALLERS - 1)
+        assert flight.in_flight() == 0
+
+    asyncio.run(scenario())
+
+
+def test_async_leader_error_reaches_every_waiter_and_the_next_call_retries():
+    async def scenario():
+        flight, gate = AsyncSingleFlight(), AsyncGate(error=ValueError("provider down"))
+        outcomes = await gather_callers(flight, gate)
+        assert gate.calls == 1
+        assert isinstance(outcomes[0], ValueError)
+        assert all(isinstance(o, RuntimeError) and o.__cause__ is outcomes[0] for o in outcomes[1:])
+        assert flight.stats()["failures"] == 1
+
+        async def fresh():
+            return "fresh"
+        assert await flight.do("prompt", fresh) == ("fresh", False)
+
+    asyncio.run(scenario())
+
+
+def test_async_follower_timeout_does_not_poison_the_key():
+    async def scenario():
+        flight, gate = AsyncSingleFlight(), AsyncGate()
+        leader = asyncio.ensure_future(flight.do("prompt", gate))
+        await asyncio.sleep(0)
+        with pytest.raises(TimeoutError):
+            await flight.do("prompt", gate, timeout=0.01)
+        # The timed-out follower did not cancel the shared call; later followers still get it.
+        follower = asyncio.ensure_future(flight.do("prompt", gate))
+        await asyncio.sleep(0)
+        gate.open.set()
+        assert await leader == ("tasks", False)
+        assert await follower == ("tasks", True)
+        assert gate.calls == 1
+        assert flight.stats()["timeouts"] == 1
+        assert flight.in_flight() == 0
+
+    asyncio.run(scenario())
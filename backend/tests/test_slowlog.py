@@ -0,0 +1,87 @@
+from __future__ import annotations
+import json
+import logging
+import threading
+
+import pytest
+
+import app as backend
+from slowlog import BackgroundQueueHandler, JsonFormatter, structured_logger
+
+
+@pytest.fixture
+def slow_log(tmp_path, monkeypatch):
+    path = tmp_path / "slow.jsonl"
+    logger = structured_logger("stepsync.slow.test", path=str(path))
+    monkeypatch.setattr(backend, "SLOW_LOG", logger)
+    monkeypatch.setattr(backend, "SLOW_QUERY_SECONDS", 0)
+
+    def lines() -> list[dict]:
+        for handler in logger.handlers:
+            handler.flush()
+        return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+    return lines
+
+
+def test_requests_under_the_threshold_are_not_logged(client, make_user, slow_log, monkeypatch):
+    monkeypatch.setattr(backend, "SLOW_REQUEST_SECONDS", 60.0)
+    headers = make_user("alice")
+    assert client.get("/profile", headers=headers).status_code == 200
+    assert slow_log() == []
+
+
+def test_slow_request_writes_one_record(client, make_user, slow_log, monkeypatch):
+    monkeypatch.setattr(backend, "SLOW_REQUEST_SECONDS", 1e-9)
+    headers = make_user("alice")
+    assert client.get("/profile", headers=headers).status_code == 200
+    [record] = slow_log()
+    assert record["event"] == "slow_request"
+    assert record["level"] == "WARNING"
+    assert (record["method"], record["route"], record["status"]) == ("GET", "/profile", 200)
+    assert record["duration_ms"] > 0
+    assert record["user"] == "alice"
+    assert record["db_statements"] >= 1
+    assert record["db_statements"] >= len(record["slowest_sql"]) > 0
+    for key in ("user_id", "family_id", "db_time_ms", "http_time_ms", "profile_bytes_read", "profile_bytes_written"):
+        assert key in record
+
+
+def test_failed_request_status_is_logged(client, slow_log, monkeypatch):
+    monkeypatch.setattr(backend, "SLOW_REQUEST_SECONDS", 1e-9)
+    assert client.post("/login", json={"username": "nobody", "password": "whatever1"}).status_code == 401
+    [record] = slow_log()
+    assert (record["route"], record["status"], record["user"]) == ("/login", 401, None)
+
+
+class Stalled(logging.Handler):
+    """A log sink that doesn't return until released, like a full disk or a stuck pipe."""
+
+    def __init__(self):
+        super().__init__()
+        self.unblock = threading.Event()
+        self.records: list[str] = []
+        self.setFormatter(JsonFormatter())
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.unblock.wait(10)
+        self.records.append(self.format(record))
+
+
+def test_a_stalled_log_sink_does_not_hold_up_requests(client, make_user, monkeypatch):
+    sink = Stalled()
+    logger = logging.getLogger("stepsync.slow.stalled")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.handlers[:] = [BackgroundQueueHandler(sink)]
+    monkeypatch.setattr(backend, "SLOW_LOG", logger)
+    monkeypatch.setattr(backend, "SLOW_QUERY_SECONDS", 0)
+    monkeypatch.setattr(backend, "SLOW_REQUEST_SECONDS", 1e-9)
+    headers = make_user("alice")
+
+    for _ in range(3):
+        assert client.get("/profile", headers=headers).status_code == 200
+    assert sink.records == []  # all three are still queued behind the stalled write
+
+    sink.unblock.set()
+    logger.handlers[0].flush()
+    assert [json.loads(r)["event"] for r in sink.records] == ["slow_request"] * 3
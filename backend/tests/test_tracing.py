@@ -0,0 +1,114 @@
+from __future__ import annotations
+import json
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import app as backend
+from tracing import FileExporter, Tracer
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+TRACEPARENT = f"00-{TRACE_ID}-{PARENT_ID}-01"
+
+
+class Exported:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans) -> None:
+        self.spans.extend(span.to_dict() for span in spans)
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    exporter = Exported()
+    monkeypatch.setattr(backend, "TRACER", Tracer(exporter, flush_interval=3600))
+    return exporter
+
+
+@pytest.fixture
+def flask_app(exported, flask_app):
+    # create_app only installs the tracing hooks when TRACER is enabled.
+    return flask_app
+
+
+def finished(exported) -> list[dict]:
+    backend.TRACER.flush()
+    return exported.spans
+
+
+def server_span(spans: list[dict]) -> dict:
+    [span] = [s for s in spans if s["kind"] == "server"]
+    return span
+
+
+def test_incoming_traceparent_is_continued(client, make_user, exported):
+    headers = make_user("alice")
+    resp = client.get("/profile", headers={**headers, "traceparent": TRACEPARENT})
+    assert resp.status_code == 200
+    spans = finished(exported)
+    server = server_span(spans)
+    assert (server["trace_id"], server["parent_id"]) == (TRACE_ID, PARENT_ID)
+    assert server["attributes"]["http.status_code"] == 200
+    assert resp.headers["traceresponse"] == f"00-{TRACE_ID}-{server['span_id']}-01"
+    # Child spans (SQL, profile parsing) hang off the request span.
+    children = [s for s in spans if s is not server]
+    assert children
+    assert {s["trace_id"] for s in children} == {TRACE_ID}
+    assert any(s["parent_id"] == server["span_id"] for s in children)
+
+
+@pytest.mark.parametrize("header", ["garbage", f"ff-{TRACE_ID}-{PARENT_ID}-01", f"00-{'0' * 32}-{PARENT_ID}-01"])
+def test_malformed_traceparent_starts_a_new_trace(client, make_user, exported, header):
+    headers = make_user("alice")
+    assert client.get("/profile", headers={**headers, "traceparent": header}).status_code == 200
+    server = server_span(finished(exported))
+    assert server["parent_id"] is None
+    assert server["trace_id"] not in (TRACE_ID, "0" * 32)
+    assert len(server["trace_id"]) == 32
+
+
+def test_outbound_ai_requests_carry_the_trace(client, make_user, exported, providers, monkeypatch):
+    sent = []
+
+    def post(url, *, headers, **kwargs):
+        sent.append(headers)
+        content = json.dumps({"tasks": [{"title": "Pack school bag", "steps": ["Books"]}]})
+        return SimpleNamespace(status_code=200, text=json.dumps({"choices": [{"message": {"content": content}}]}))
+
+    monkeypatch.setattr(requests, "post", post)
+    monkeypatch.setattr(backend, "GROQ_API_KEY", "test-key")
+    monkeypatch.setenv("AI_PROVIDERS", "groq,heuristic")
+    monkeypatch.setattr(backend, "_AI_PROVIDERS", backend._build_ai_providers())
+    headers = make_user("alice")
+
+    resp = client.post("/ai/tasks", headers={**headers, "traceparent": TRACEPARENT}, json={"prompt": "School night"})
+    assert resp.get_json()["source"] == "groq"
+    [outbound] = sent
+    trace_id, parent_id = outbound["traceparent"].split("-")[1:3]
+    assert trace_id == TRACE_ID
+    assert parent_id == server_span(finished(exported))["span_id"]
+
+
+def test_finished_spans_reach_the_file_exporter(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    tracer = Tracer(FileExporter(str(path)), flush_interval=3600)
+    root = tracer.start_trace("GET /profile", TRACEPARENT)
+    token = tracer.activate(root)
+    with tracer.span("profile.parse", size=12):
+        pass
+    tracer.finish(root, token)
+    assert tracer.current() is None
+    tracer.flush()
+
+    child, parent = (json.loads(line) for line in path.read_text().splitlines())
+    assert (parent["name"], parent["parent_id"], parent["trace_id"]) == ("GET /profile", PARENT_ID, TRACE_ID)
+    assert (child["name"], child["parent_id"], child["attributes"]) == ("profile.parse", parent["span_id"], {"size": 12})
+    assert parent["duration_ms"] is not None
+
+
+def test_unsampled_parent_is_not_traced():
+    tracer = Tracer(Exported())
+    assert tracer.start_trace("GET /profile", f"00-{TRACE_ID}-{PARENT_ID}-00") is None
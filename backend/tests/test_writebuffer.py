@@ -0,0 +1,69 @@
+from __future__ import annotations
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from writebuffer import WriteCoalescer
+
+
+def test_an_edit_queued_without_waiting_behind_a_waiting_one_is_saved():
+    applied, started, release = [], threading.Event(), threading.Event()
+
+    def apply(key, ops):
+        if "first" in ops:
+            started.set()
+            release.wait()
+        applied.extend(ops)
+        return list(ops)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        buffer = WriteCoalescer(apply, executor=pool)
+        first = threading.Thread(target=buffer.submit, args=("user", "first"))
+        first.start()
+        started.wait()
+        buffer.submit("user", "second", wait=False)
+        release.set()
+        first.join()
+
+        # The key must not stay busy on "second", which nobody is waiting to lead.
+        third = threading.Thread(target=buffer.submit, args=("user", "third"), daemon=True)
+        third.start()
+        third.join(timeout=5)
+        assert not third.is_alive()
+    assert applied == ["first", "second", "third"]
+
+
+def test_held_keys_run_earlier_writes_first_and_later_ones_after_the_hold():
+    applied, started, release = [], threading.Event(), threading.Event()
+
+    def apply(key, ops):
+        if "first" in ops:
+            started.set()
+            release.wait()
+        applied.extend((key, op) for op in ops)
+        return list(ops)
+
+    buffer = WriteCoalescer(apply)
+    first = threading.Thread(target=buffer.submit, args=("b", "first"))
+    first.start()
+    started.wait()
+    held, waiting_during_hold = threading.Event(), []
+
+    def hold_both():
+        with buffer.hold(["b", "a"]):
+            applied.append("held")
+            held.set()
+            later.start()
+            later.join(timeout=0.2)
+            waiting_during_hold.append(later.is_alive())
+
+    later = threading.Thread(target=buffer.submit, args=("a", "later"))
+    holder = threading.Thread(target=hold_both)
+    holder.start()
+    assert not held.wait(timeout=0.1)
+    release.set()
+    holder.join(timeout=5)
+    later.join(timeout=5)
+    first.join(timeout=5)
+    assert waiting_during_hold == [True]
+    assert applied == [("b", "first"), "held", ("a", "later")]
+    assert buffer.stats()["pending"] == 0
@@ -0,0 +1,71 @@
+from __future__ import annotations
+import gc
+import importlib
+import os
+import runpy
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import app as backend
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def built(monkeypatch, tmp_path):
+    """Apps built by create_app() while the test runs; the default app starts out unset."""
+    apps = []
+    create_app = backend.create_app
+
+    def recording(config=None):
+        app = create_app(config or {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'wsgi.db'}",
+            "JWT_SECRET_KEY": "test-secret-key-long-enough-for-hs256",
+        })
+        apps.append(app)
+        return app
+
+    monkeypatch.setattr(backend, "create_app", recording)
+    monkeypatch.setattr(backend, "_default_app", None)
+    monkeypatch.delitem(sys.modules, "wsgi", raising=False)
+    monkeypatch.setattr(gc, "freeze", lambda: None)  # keep the test process's heap collectable
+    yield apps
+    for app in apps:
+        with app.app_context():
+            backend.db.engine.dispose()
+
+
+@pytest.fixture
+def gunicorn_conf() -> dict:
+    return runpy.run_path(os.path.join(BACKEND, "gunicorn.conf.py"))
+
+
+def test_wsgi_application_is_the_default_app_from_create_app(built):
+    wsgi = importlib.import_module("wsgi")
+
+    assert built == [wsgi.application]
+    assert backend._default_app is wsgi.application
+    assert wsgi.application.test_client().get("/profile").status_code == 401
+
+
+def test_post_fork_resets_the_default_app(built, gunicorn_conf, monkeypatch):
+    reset = []
+    monkeypatch.setattr(backend, "reset_after_fork", reset.append)
+    worker = SimpleNamespace(pid=12345)
+
+    gunicorn_conf["post_fork"](None, worker)
+    assert reset == []  # nothing built yet, nothing inherited
+
+    application = importlib.import_module("wsgi").application
+    gunicorn_conf["post_fork"](None, worker)
+    assert reset == [application]
+
+
+def test_reset_after_fork_replaces_the_connection_pool(flask_app):
+    with flask_app.app_context():
+        pool = backend.db.engine.pool
+    backend.reset_after_fork(flask_app)
+    with flask_app.app_context():
+        assert backend.db.engine.pool is not pool
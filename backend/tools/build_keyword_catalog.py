@@ -0,0 +1,102 @@
+"""
+Regenerate data/keyword_catalog.json from the app's premade task and routine catalogs.
+
+    python tools/build_keyword_catalog.py
+
+Every premade template and routine task becomes a planner rule keyed on its
+title (plus a variant without filler words such as "your" or "the"), with the
+template's steps and a duration taken from its start/end times. Run it after
+editing lib/data/premade_templates.dart or lib/data/premade_routines.dart.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import re
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+SOURCES = (
+    os.path.join(REPO_DIR, "lib", "data", "premade_templates.dart"),
+    os.path.join(REPO_DIR, "lib", "data", "premade_routines.dart"),
+)
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, "data", "keyword_catalog.json")
+
+_FILLER_WORDS = {"a", "an", "the", "your", "my", "for", "and", "or", "of", "minutes", "minute"}
+_ENTRY_RE = re.compile(r"\b(?:TaskTemplate|Task)\((?P<body>(?:[^()]|\([^()]*\))*)\)", re.DOTALL)
+_STRING = r"'((?:[^'\\]|\\.)*)'"
+
+
+def _field(body: str, *names: str) -> str | None:
+    for name in names:
+        match = re.search(rf"\b{name}:\s*{_STRING}", body)
+        if match:
+            return match.group(1).replace("\\'", "'")
+    return None
+
+
+def _steps(body: str) -> list[str]:
+    match = re.search(r"\bsteps:\s*\[(.*?)\]", body, re.DOTALL)
+    if not match:
+        return []
+    return [step.replace("\\'", "'") for step in re.findall(_STRING, match.group(1))]
+
+
+def _minutes(start: str | None, end: str | None) -> int | None:
+    if not start or not end:
+        return None
+    sh, sm = (int(part) for part in start.split(":"))
+    eh, em = (int(part) for part in end.split(":"))
+    minutes = (eh * 60 + em) - (sh * 60 + sm)
+    if minutes <= 0:
+        minutes += 12 * 60
+    return minutes if 0 < minutes <= 6 * 60 else None
+
+
+def _keywords(title: str) -> list[str]:
+    words = re.findall(r"[a-z0-9']+", title.lower().replace("&", " and "))
+    variants = [" ".join(words)]
+    trimmed = [w for w in words if w not in _FILLER_WORDS and not w.isdigit()]
+    if trimmed and trimmed != words:
+        variants.append(" ".join(trimmed))
+    return variants
+
+
+def build_catalog(paths=SOURCES) -> list[dict]:
+    entries: list[dict] = []
+    seen: set[str] = set()
+    for path in paths:
+        with open(path, encoding="utf-8") as fh:
+            source = fh.read()
+        for match in _ENTRY_RE.finditer(source):
+            body = match.group("body")
+            title = _field(body, "title")
+            if not title:
+                continue
+            keywords = [kw for kw in _keywords(title) if kw not in seen]
+            if not keywords:
+                continue
+            seen.update(keywords)
+            entries.append({
+                "title": title,
+                "keywords": keywords,
+                "steps": _steps(body),
+                "minutes": _minutes(_field(body, "start", "startTime"), _field(body, "end", "endTime")),
+            })
+    return entries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+    entries = build_catalog()
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(entries, fh, indent=2)
+        fh.write("\n")
+    print(f"Wrote {len(entries)} entries to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Local stand-in for an OpenAI-compatible chat completions API (Groq, llama.cpp, vLLM...).
+
+    python tools/fake_llm_server.py --port 8089 --token-delay 0.02
+    GROQ_API_KEY=dev GROQ_API_URL=http://127.0.0.1:8089/v1/chat/completions flask run
+
+Both plain and `"stream": true` requests are answered with the same canned
+task list, split into small deltas so streaming behaviour can be observed.
+"""
+from __future__ import annotations
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_TASKS = {
+    "tasks": [
+        {"title": "Wake up and stretch", "steps": ["Open curtains", "Stretch for 5 minutes"], "startTime": "7:00", "endTime": "7:15", "period": "AM"},
+        {"title": "Breakfast", "steps": ["Set the table", "Eat breakfast", "Clear dishes"], "startTime": "7:15", "endTime": "7:45", "period": "AM"},
+        {"title": "Get dressed", "steps": ["Pick clothes", "Get dressed", "Brush teeth"], "startTime": "7:45", "endTime": "8:00", "period": "AM"},
+        {"title": "Pack school bag", "steps": ["Check homework", "Pack lunch", "Grab water bottle"], "startTime": "8:00", "endTime": "8:15", "period": "AM"},
+    ]
+}
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    token_delay = 0.02
+    first_token_delay = 0.2
+    chunk_size = 12
+    fail_every = 0
+    fail_after = 0  # streamed replies send an error event after this many deltas (0: never)
+    stall_after = 0  # streamed replies go silent for `stall` seconds after this many deltas (0: never)
+    stall = 0.0
+    _served = 0
+
+    def log_message(self, fmt, *args):  # keep benchmark output readable
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            body = {}
+        type(self)._served += 1
+        if self.fail_every and self._served % self.fail_every == 0:
+            self._send_json(503, {"error": {"message": "fake upstream overloaded"}})
+            return
+        content = json.dumps(CANNED_TASKS)
+        if body.get("stream"):
+            self._stream(content, body.get("model") or "fake")
+        else:
+            time.sleep(self.first_token_delay + self.token_delay * (len(content) / self.chunk_size))
+            self._send_json(200, {
+                "model": body.get("model") or "fake",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            })
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, content: str, model: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        time.sleep(self.first_token_delay)
+        for n, start in enumerate(range(0, len(content), self.chunk_size)):
+            if self.fail_after and n == self.fail_after:
+                self.wfile.write(f"data: {json.dumps({'error': {'message': 'fake upstream failed mid-stream'}})}\n\n".encode())
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            if self.stall_after and n == self.stall_after:
+                time.sleep(self.stall)
+            delta = content[start:start + self.chunk_size]
+            event = {"model": model, "choices": [{"index": 0, "delta": {"content": delta}}]}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def serve(host: str = "127.0.0.1", port: int = 8089, **options) -> ThreadingHTTPServer:
+    handler = type("ConfiguredFakeLLMHandler", (FakeLLMHandler,), options)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed deltas")
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every Nth request with HTTP 503")
+    parser.add_argument("--fail-after", type=int, default=0, help="end streamed replies with an error after N deltas")
+    parser.add_argument("--stall-after", type=int, default=0, help="go silent mid-stream after N deltas")
+    parser.add_argument("--stall", type=float, default=60.0, help="seconds to stay silent with --stall-after")
+    args = parser.parse_args()
+    server = serve(
+        args.host, args.port,
+        token_delay=args.token_delay,
+        first_token_delay=args.first_token_delay,
+        fail_every=args.fail_every,
+        fail_after=args.fail_after,
+        stall_after=args.stall_after,
+        stall=args.stall,
+    )
+    print(f"Fake LLM listening on http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
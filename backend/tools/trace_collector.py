@@ -0,0 +1,154 @@
+"""
+Local stand-in for an OTLP/HTTP trace collector, plus a viewer for the spans it stores.
+
+    python tools/trace_collector.py serve --port 4318 --output traces.jsonl
+    TRACE_EXPORT=http://127.0.0.1:4318/v1/traces flask run
+
+    python tools/trace_collector.py show traces.jsonl --route /profile/block/edit --slowest
+
+`serve` accepts OTLP JSON on /v1/traces and appends each span as one JSON line
+(the same format TRACE_EXPORT=<file> writes directly). `show` prints one trace
+as an indented tree with per-span durations.
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_KINDS = {1: "internal", 2: "server", 3: "client"}
+
+
+def _attr_value(value: dict):
+    for key in ("stringValue", "boolValue", "doubleValue"):
+        if key in value:
+            return value[key]
+    if "intValue" in value:
+        return int(value["intValue"])
+    return None
+
+
+def spans_from_otlp(payload: dict) -> list[dict]:
+    spans = []
+    for resource in payload.get("resourceSpans") or []:
+        for scope in resource.get("scopeSpans") or []:
+            for span in scope.get("spans") or []:
+                start, end = int(span["startTimeUnixNano"]), int(span["endTimeUnixNano"])
+                status = span.get("status") or {}
+                spans.append({
+                    "name": span.get("name"),
+                    "trace_id": span.get("traceId"),
+                    "span_id": span.get("spanId"),
+                    "parent_id": span.get("parentSpanId") or None,
+                    "kind": _KINDS.get(span.get("kind"), "internal"),
+                    "start_ns": start,
+                    "end_ns": end,
+                    "duration_ms": round((end - start) / 1e6, 3),
+                    "attributes": {a["key"]: _attr_value(a.get("value") or {}) for a in span.get("attributes") or []},
+                    "error": status.get("message") if status.get("code") == 2 else None,
+                })
+    return spans
+
+
+def serve(host: str, port: int, output: str) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/v1/traces":
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                spans = spans_from_otlp(json.loads(self.rfile.read(length) or b"{}"))
+            except (ValueError, KeyError) as exc:
+                self.send_error(400, str(exc))
+                return
+            with open(output, "a", encoding="utf-8") as fh:
+                for span in spans:
+                    fh.write(json.dumps(span, separators=(",", ":")) + "\n")
+            body = b"{}"
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def load_traces(path: str) -> dict[str, list[dict]]:
+    traces: dict[str, list[dict]] = defaultdict(list)
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def format_trace(spans: list[dict]) -> str:
+    by_parent: dict[str | None, list[dict]] = defaultdict(list)
+    ids = {s["span_id"] for s in spans}
+    for span in spans:
+        parent = span["parent_id"] if span["parent_id"] in ids else None
+        by_parent[parent].append(span)
+    lines: list[str] = []
+
+    def walk(parent: str | None, depth: int) -> None:
+        for span in sorted(by_parent.get(parent, []), key=lambda s: s["start_ns"]):
+            detail = span["attributes"].get("db.statement") or span["attributes"].get("http.url") or ""
+            error = f"  ERROR {span['error']}" if span.get("error") else ""
+            lines.append(f"{span['duration_ms']:>10.3f} ms  {'  ' * depth}{span['name']}  {detail[:80]}{error}".rstrip())
+            walk(span["span_id"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_cmd = sub.add_parser("serve")
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=4318)
+    serve_cmd.add_argument("--output", default="traces.jsonl")
+    show_cmd = sub.add_parser("show")
+    show_cmd.add_argument("path")
+    show_cmd.add_argument("--trace-id")
+    show_cmd.add_argument("--route", help="only traces whose root span is for this route template")
+    show_cmd.add_argument("--slowest", action="store_true", help="pick the slowest matching trace instead of the latest")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = serve(args.host, args.port, args.output)
+        print(f"Collecting OTLP traces on http://{args.host}:{args.port}/v1/traces -> {args.output}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    traces = load_traces(args.path)
+    candidates = []
+    for trace_id, spans in traces.items():
+        roots = [s for s in spans if s["kind"] == "server"]
+        if args.trace_id and trace_id != args.trace_id:
+            continue
+        if args.route and not any(s["attributes"].get("http.route") == args.route for s in roots):
+            continue
+        root = roots[0] if roots else min(spans, key=lambda s: s["start_ns"])
+        candidates.append((root, spans))
+    if not candidates:
+        sys.exit("No matching trace.")
+    key = (lambda c: c[0]["duration_ms"] or 0) if args.slowest else (lambda c: c[0]["start_ns"])
+    root, spans = max(candidates, key=key)
+    print(f"trace {root['trace_id']}")
+    print(format_trace(spans))
+
+
+if __name__ == "__main__":
+    main()
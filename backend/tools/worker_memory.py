@@ -0,0 +1,99 @@
+"""
+Per-worker memory of a running gunicorn server, for sizing nodes (Linux only).
+
+    WEB_PIDFILE=/tmp/stepsync.pid gunicorn -c gunicorn.conf.py wsgi:application
+    python tools/worker_memory.py --pidfile /tmp/stepsync.pid
+    python tools/worker_memory.py --pid 4242 --warm http://127.0.0.1:8000/metrics --requests 2000 --project 8,16
+
+RSS counts shared pages once per process and overstates the total; PSS splits
+shared pages between the processes mapping them; USS (private pages) is what
+each extra worker really costs. Measure after warming up with realistic
+traffic (e.g. `python -m loadtest run`), since workers grow as they serve.
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import urllib.request
+
+
+def _children(pid: int) -> list[int]:
+    kids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children", encoding="ascii") as fh:
+            kids.extend(int(p) for p in fh.read().split())
+    return sorted(kids)
+
+
+def usage(pid: int) -> dict[str, int]:
+    """RSS, PSS, USS and shared sizes in bytes, from /proc/<pid>/smaps_rollup."""
+    fields: dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": uss,
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def warm(url: str, count: int) -> None:
+    for _ in range(count):
+        try:
+            with urllib.request.urlopen(url, timeout=10) as resp:
+                resp.read()
+        except OSError:
+            pass
+
+
+def _mib(value: float) -> str:
+    return f"{value / 1048576:9.1f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--pid", type=int, help="gunicorn master pid")
+    target.add_argument("--pidfile")
+    parser.add_argument("--warm", metavar="URL", help="GET this URL --requests times before measuring")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--project", default="", help="comma-separated worker counts to estimate totals for")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("Needs Linux 4.14+ (/proc/<pid>/smaps_rollup).")
+    if args.pidfile:
+        with open(args.pidfile, encoding="ascii") as fh:
+            args.pid = int(fh.read().strip())
+    if args.warm:
+        warm(args.warm, args.requests)
+
+    master = usage(args.pid)
+    workers = {pid: usage(pid) for pid in _children(args.pid)}
+    if not workers:
+        sys.exit(f"No workers found under pid {args.pid}.")
+    print(f"{'process':<16}{'RSS MiB':>9}{'PSS MiB':>9}{'USS MiB':>9}{'shared':>9}")
+    print(f"{'master ' + str(args.pid):<16}{_mib(master['rss'])}{_mib(master['pss'])}"
+          f"{_mib(master['uss'])}{_mib(master['shared'])}")
+    for pid, mem in workers.items():
+        print(f"{'worker ' + str(pid):<16}{_mib(mem['rss'])}{_mib(mem['pss'])}{_mib(mem['uss'])}{_mib(mem['shared'])}")
+
+    total_pss = master["pss"] + sum(m["pss"] for m in workers.values())
+    mean_uss = sum(m["uss"] for m in workers.values()) / len(workers)
+    mean_rss = sum(m["rss"] for m in workers.values()) / len(workers)
+    shared = mean_rss - mean_uss
+    print(f"\ntotal PSS {total_pss / 1048576:.1f} MiB for {len(workers)} workers; "
+          f"each worker adds ~{mean_uss / 1048576:.1f} MiB private, shares ~{shared / 1048576:.1f} MiB")
+    for count in filter(None, (c.strip() for c in args.project.split(","))):
+        # The master's RSS holds the shared pages once; each worker adds its private pages.
+        estimate = master["rss"] + int(count) * mean_uss
+        print(f"  {int(count):>3} workers: ~{estimate / 1048576:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
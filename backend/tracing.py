@@ -0,0 +1,268 @@
+from __future__ import annotations
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Iterator
+
+# Minimal tracer with W3C trace-context propagation. Spans are handed to a
+# background thread in batches and exported either as JSON lines to a file or
+# as OTLP/HTTP JSON to a collector (see tools/trace_collector.py for a local
+# stand-in). When the tracer is disabled, span() and @traced cost one check.
+
+_TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_current: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("current_span", default=None)
+
+
+def parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+    """(trace_id, parent_span_id, sampled) from a `traceparent` header, or None if invalid."""
+    match = _TRACEPARENT_RE.match((header or "").strip().lower())
+    if not match or match.group(1) == "ff":
+        return None
+    trace_id, span_id, flags = match.group(2), match.group(3), int(match.group(4), 16)
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(flags & 1)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error", "kind")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, *, kind: str = "internal",
+                 start_ns: int | None = None, attributes: dict | None = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns: int | None = None
+        self.attributes = attributes or {}
+        self.error: str | None = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class FileExporter:
+    """Appends finished spans as JSON lines."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: list[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as fh:
+            for span in spans:
+                fh.write(json.dumps(span.to_dict(), default=str, separators=(",", ":")) + "\n")
+
+
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPHttpExporter:
+    """POSTs spans to an OTLP/HTTP collector using the JSON encoding (`/v1/traces`)."""
+
+    def __init__(self, endpoint: str, *, service_name: str = "stepsync-backend", timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def payload(self, spans: list[Span]) -> dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "stepsync.tracing"},
+                "spans": [{
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    "parentSpanId": s.parent_id or "",
+                    "name": s.name,
+                    "kind": _OTLP_KINDS.get(s.kind, 1),
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                    "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+                } for s in spans],
+            }],
+        }]}
+
+    def export(self, spans: list[Span]) -> None:
+        import requests
+
+        requests.post(self.endpoint, json=self.payload(spans), timeout=self.timeout)
+
+
+class Tracer:
+    def __init__(self, exporter=None, *, sample_rate: float = 1.0, batch_size: int = 256, flush_interval: float = 2.0):
+        self.exporter = exporter
+        self.enabled = exporter is not None
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue[Span] = queue.Queue(maxsize=10000)
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    # ---- span lifecycle ----
+    def current(self) -> Span | None:
+        return _current.get()
+
+    def start_trace(self, name: str, traceparent: str | None = None, **attributes) -> Span | None:
+        """Root span for an incoming request, continuing the caller's trace when `traceparent` is valid."""
+        if not self.enabled:
+            return None
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = os.urandom(16).hex(), None, random.random() < self.sample_rate
+        if not sampled:
+            return None
+        return Span(name, trace_id, parent_id, kind="server", attributes=attributes)
+
+    def inject(self, headers: dict) -> dict:
+        """Add a `traceparent` naming the current span to outbound `headers`, so the callee joins the trace."""
+        span = _current.get()
+        if span is not None:
+            headers["traceparent"] = span.traceparent
+        return headers
+
+    def activate(self, span: Span | None) -> contextvars.Token:
+        return _current.set(span)
+
+    def finish(self, span: Span, token: contextvars.Token | None = None) -> None:
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:  # finished from another context, e.g. after a streamed response
+                pass
+        span.end_ns = time.time_ns()
+        self._submit(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span | None]:
+        parent = _current.get()
+        if parent is None:
+            yield None
+            return
+        span = Span(name, parent.trace_id, parent.span_id, attributes=attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            self.finish(span, token)
+
+    def record(self, name: str, duration: float, *, kind: str = "internal", error: str | None = None, **attributes) -> None:
+        """Add an already-finished child span that ended now and lasted `duration` seconds."""
+        parent = _current.get()
+        if parent is None:
+            return
+        end_ns = time.time_ns()
+        span = Span(name, parent.trace_id, parent.span_id, kind=kind,
+                    start_ns=end_ns - int(duration * 1e9), attributes=attributes)
+        span.end_ns = end_ns
+        span.error = error
+        self._submit(span)
+
+    def traced(self, name: str):
+        """Decorator form of span()."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return fn(*args, **kwargs)
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # ---- export ----
+    def _submit(self, span: Span) -> None:
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_worker(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=10000)
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="trace-export", daemon=True).start()
+            atexit.register(self.flush)
+
+    def _drain(self) -> list[Span]:
+        batch: list[Span] = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self) -> None:
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            try:
+                self.exporter.export(batch)
+            except Exception:
+                self.dropped += len(batch)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+def tracer_from_env(target: str | None, **kwargs) -> Tracer:
+    """`target` is an http(s) OTLP endpoint, a file path, or empty to disable tracing."""
+    if not target:
+        return Tracer(None)
+    if target.startswith(("http://", "https://")):
+        return Tracer(OTLPHttpExporter(target), **kwargs)
+    return Tracer(FileExporter(target), **kwargs)
@@ -0,0 +1,182 @@
+from __future__ import annotations
+import threading
+import time
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from typing import Any, Callable, Hashable, Iterable, Iterator, Sequence
+
+# Group commit for read-modify-write updates that share a key (one user's profile).
+# Writes for a key are applied strictly in the order submit() was called, one batch
+# at a time; everything that queued up while a batch was being applied goes into the
+# next one, so a burst of N writes costs a handful of rounds instead of N.
+
+# Queue entry for hold(): batches stop in front of it, and it leads nothing.
+_HOLD = object()
+
+
+class _Pending:
+    __slots__ = ("op", "waiting", "wake", "lead", "result", "error")
+
+    def __init__(self, op: Any, waiting: bool):
+        self.op = op
+        self.waiting = waiting
+        self.wake = threading.Event()
+        self.lead = False
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class WriteCoalescer:
+    """
+    `apply(key, ops)` applies a batch in order and returns one result per op; if it
+    raises, every op in the batch fails with that error.
+
+    submit() waits for its batch to be applied and returns its result. The first
+    caller for an idle key applies the batch in its own thread (after `window`
+    seconds, to let a burst gather); callers that arrive meanwhile wait, and the
+    oldest of them applies the next batch. submit(..., wait=False) returns at once
+    and leaves the batch to `executor`.
+
+    hold(keys) keeps batches for several keys from running while the caller rewrites
+    them itself, e.g. in one transaction.
+    """
+
+    def __init__(self, apply: Callable[[Hashable, Sequence[Any]], Sequence[Any]], *,
+                 window: float = 0.0, max_batch: int = 64, executor: Executor | None = None):
+        self._apply = apply
+        self.window = max(0.0, float(window))
+        self.max_batch = max(1, int(max_batch))
+        self._executor = executor
+        self._queues: dict[Hashable, list[_Pending]] = {}
+        self._active: set[Hashable] = set()
+        self._lock = threading.Lock()
+        self.ops = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.failures = 0
+
+    def submit(self, key: Hashable, op: Any, *, wait: bool = True) -> Any:
+        item = _Pending(op, wait)
+        with self._lock:
+            self._queues.setdefault(key, []).append(item)
+            leader = key not in self._active
+            if leader:
+                self._active.add(key)
+        if not wait:
+            if leader:
+                self._executor.submit(self._drain, key)
+            return None
+        if not leader:
+            item.wake.wait()
+            if not item.lead:
+                return self._outcome(item)
+        if self.window:
+            time.sleep(self.window)
+        self._run(key, self._take(key))
+        self._hand_off(key)
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    @contextmanager
+    def hold(self, keys: Iterable[Hashable]) -> Iterator[None]:
+        """
+        Own `keys` until the block exits: writes submitted earlier are applied first,
+        later ones wait for the block. Keys are taken in sorted order, so two holders
+        with overlapping keys can't deadlock.
+        """
+        held = []
+        try:
+            for key in sorted(set(keys)):
+                self._acquire(key)
+                held.append(key)
+            yield
+        finally:
+            for key in reversed(held):
+                self._hand_off(key)
+
+    def _acquire(self, key: Hashable) -> None:
+        item = _Pending(_HOLD, True)
+        with self._lock:
+            self._queues.setdefault(key, []).append(item)
+            leader = key not in self._active
+            if leader:
+                self._active.add(key)
+        if not leader:
+            item.wake.wait()
+        with self._lock:
+            self._queues[key].remove(item)
+
+    def _drain(self, key: Hashable) -> None:
+        """Background batches for wait=False: keep going until the key's queue is empty or held."""
+        while True:
+            if self.window:
+                time.sleep(self.window)
+            self._run(key, self._take(key))
+            with self._lock:
+                queue = self._queues.get(key)
+                if queue and queue[0].op is not _HOLD:
+                    continue
+            self._hand_off(key)
+            return
+
+    def _take(self, key: Hashable) -> list[_Pending]:
+        with self._lock:
+            queue = self._queues[key]
+            end = 0
+            while end < min(len(queue), self.max_batch) and queue[end].op is not _HOLD:
+                end += 1
+            batch, self._queues[key] = queue[:end], queue[end:]
+            return batch
+
+    def _hand_off(self, key: Hashable) -> None:
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                self._queues.pop(key, None)
+                self._active.discard(key)
+                return
+            nxt = queue[0]
+        if not nxt.waiting:
+            # Nobody is waiting to lead a wait=False edit; the executor takes over.
+            self._executor.submit(self._drain, key)
+            return
+        nxt.lead = True
+        nxt.wake.set()
+
+    def _run(self, key: Hashable, batch: list[_Pending]) -> None:
+        try:
+            results = self._apply(key, [item.op for item in batch])
+        except BaseException as exc:
+            results = None
+            for item in batch:
+                item.error = exc
+        with self._lock:
+            self.ops += len(batch)
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(batch))
+            if results is None:
+                self.failures += 1
+        for item, result in zip(batch, results or ()):
+            item.result = result
+        for item in batch:
+            if not item.lead:
+                item.wake.set()
+
+    @staticmethod
+    def _outcome(item: _Pending) -> Any:
+        if item.error is not None:
+            raise RuntimeError(f"Batched write failed: {item.error}") from item.error
+        return item.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": sum(item.op is not _HOLD for q in self._queues.values() for item in q),
+                "ops": self.ops,
+                "batches": self.batches,
+                "merged": self.ops - self.batches,
+                "merge_ratio": round(self.ops / self.batches, 3) if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "failures": self.failures,
+            }
@@ -0,0 +1,25 @@
+"""
+Production entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+With `preload_app` (on in gunicorn.conf.py) this module runs once in the master:
+the app is built, migrated and warmed up, then every object that exists so far
+is moved out of the garbage collector's reach with gc.freeze(). Forked workers
+then share those memory pages instead of copying them the first time a
+collection touches their reference counts.
+"""
+from __future__ import annotations
+import gc
+
+from app import app as application, db, warmup
+
+warmup(application)
+
+# The master never serves requests; close the connection warmup opened so no
+# worker inherits a socket or SQLite handle it shares with its siblings.
+with application.app_context():
+    db.engine.dispose()
+
+gc.collect()
+gc.freeze()
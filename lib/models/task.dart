@@ -9,6 +9,7 @@ class Task {
     this.completed = false,
     this.familyTag,
     this.scheduledDate,
+    this.serverIndex,
   });
 
   String title;
@@ -20,4 +21,5 @@ class Task {
   bool completed;
   String? familyTag;
   String? scheduledDate; // YYYY-MM-DD
+  int? serverIndex;       // position in the stored schedule, as GET /profile returns it
 }
@@ -63,7 +63,11 @@ class _ChildHomePageState extends State<ChildHomePage> {
 
   Future<void> _loadFromServer() async {
     try {
-      final res = await http.get(Uri.parse('$_base/profile'), headers: _jsonHeaders);
+      // Naming the block fields also gets each block's `index`, used to address toggles.
+      final res = await http.get(
+        Uri.parse('$_base/profile?fields=title,startTime,endTime,period,steps,hidden,completed,family_tag,date'),
+        headers: _jsonHeaders,
+      );
       if (res.statusCode != 200) {
         _toast('Failed to load profile: ${res.statusCode}');
         return;
@@ -85,6 +89,7 @@ class _ChildHomePageState extends State<ChildHomePage> {
             completed: (m['completed'] is bool) ? m['completed'] as bool : false,
             familyTag: ((m['family_tag'] ?? '').toString().isEmpty ? null : m['family_tag'].toString()),
             scheduledDate: dateString.isEmpty ? null : dateString,
+            serverIndex: (m['index'] is int) ? m['index'] as int : null,
           ),
         );
       }
@@ -165,8 +170,29 @@ class _ChildHomePageState extends State<ChildHomePage> {
     return true;
   }
 
-  // (Optional) persist toggle as an edit
+  // Persist a toggle through the narrow completion endpoint; fall back to a full edit
+  // when the task has no family tag or server position to address it by.
   Future<void> _persistToggle(Task before, Task after) async {
+    final date = after.scheduledDate;
+    final tag = after.familyTag;
+    if (date != null && (tag != null || after.serverIndex != null)) {
+      try {
+        final res = await http.post(
+          Uri.parse('$_base/profile/block/complete'),
+          headers: _jsonHeaders,
+          body: json.encode({
+            'date': date,
+            if (tag != null) 'family_tag': tag else 'index': after.serverIndex,
+            if (tag == null) 'title': after.title,
+            'completed': after.completed,
+          }),
+        );
+        if (res.statusCode != 200) _toast('Server toggle failed (${res.statusCode})');
+      } catch (e) {
+        _toast('Toggle error: $e');
+      }
+      return;
+    }
     try {
       final res = await http.post(
         Uri.parse('$_base/profile/block/edit'),
@@ -177,7 +203,7 @@ class _ChildHomePageState extends State<ChildHomePage> {
           'date': before.scheduledDate,
         }),
       );
-      if (res.statusCode != 200) _toast('Server toggle failed (${res.statusCode})');
+      if (res.statusCode != 200 && res.statusCode != 202) _toast('Server toggle failed (${res.statusCode})');
     } catch (e) {
       _toast('Toggle error: $e');
     }
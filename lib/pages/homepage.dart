@@ -278,7 +278,8 @@ class _HomePageState extends State<HomePage> {
           }
         } catch (_) {}
         return true;
-      } else if (res.statusCode == 200) {
+      } else if (res.statusCode == 200 || res.statusCode == 202) {
+        // 202: queued by a server running PROFILE_WRITE_MODE=async.
         return true;
       } else {
         _toast('Server add failed (${res.statusCode})');
@@ -310,7 +311,7 @@ class _HomePageState extends State<HomePage> {
           ),
         ),
       );
-      if (res.statusCode != 200) _toast('Server edit failed (${res.statusCode})');
+      if (res.statusCode != 200 && res.statusCode != 202) _toast('Server edit failed (${res.statusCode})');
     } catch (e) {
       _toast('Edit error: $e');
     }
@@ -336,7 +337,7 @@ class _HomePageState extends State<HomePage> {
         await _loadFromServer();
         return;
       }
-      if (res.statusCode != 200) {
+      if (res.statusCode != 200 && res.statusCode != 202) {
         _toast('Server delete failed (${res.statusCode})');
       }
     } catch (e) {